@@ -25,15 +25,47 @@ def level_order_traversal(root):
         result.append(level_nodes)
 
     return result
-# 构建一个简单的树
-root = TreeNode(1)
-child1 = TreeNode(2)
-child2 = TreeNode(3)
-child3 = TreeNode(4)
-root.children = [child1, child2, child3]
-child1.children = [TreeNode(5), TreeNode(6)]
-child3.children = [TreeNode(7)]
-
-# 执行遍历
-print(level_order_traversal(root))
-# 输出: [[1], [2, 3, 4], [5, 6, 7]]
+
+
+def iter_levels(root):
+    """Yield one generation at a time instead of building the full result first."""
+    level = [root] if root else []
+    while level:
+        yield [node.val for node in level]
+        level = [child for node in level for child in node.children]
+
+
+def iter_preorder(root):
+    """Depth-first, parent before children (iterative, safe for very deep trees)."""
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        yield node.val
+        stack.extend(reversed(node.children))
+
+
+def iter_postorder(root):
+    """Depth-first, children before parent."""
+    stack = [(root, False)] if root else []
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node.val
+            continue
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(node.children))
+
+
+if __name__ == "__main__":
+    # 构建一个简单的树
+    root = TreeNode(1)
+    child1 = TreeNode(2)
+    child2 = TreeNode(3)
+    child3 = TreeNode(4)
+    root.children = [child1, child2, child3]
+    child1.children = [TreeNode(5), TreeNode(6)]
+    child3.children = [TreeNode(7)]
+
+    # 执行遍历
+    print(level_order_traversal(root))
+    # 输出: [[1], [2, 3, 4], [5, 6, 7]]
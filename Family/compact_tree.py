@@ -0,0 +1,322 @@
+"""Compact, array-backed family tree.
+
+`TreeNode` in a.py costs one Python object plus one list per person and
+level_order_traversal chases a pointer per node. CompactTree stores the same
+tree as flat arrays in breadth-first (BFS) order:
+
+- values[i]        person value of node i
+- parents[i]       BFS id of the parent (-1 for roots)
+- first_child[i]   children of i are the consecutive ids
+                   first_child[i] .. first_child[i + 1] - 1
+- level_offsets    generation g is the id range
+                   level_offsets[g] .. level_offsets[g + 1] - 1
+
+Because of the BFS numbering a level-order traversal is just a slice per
+generation. Building from an arbitrary parent array does the BFS one whole
+frontier at a time (a vectorized CSR gather with NumPy, plain array slicing
+without it).
+
+Benchmark against TreeNode:
+    python compact_tree.py --nodes 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from array import array
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # optional, only speeds up from_parents
+    np = None
+
+from a import TreeNode, level_order_traversal
+
+
+class SlotTreeNode:
+    """Drop-in TreeNode with __slots__ (no per-instance __dict__)."""
+
+    __slots__ = ("val", "children")
+
+    def __init__(self, val):
+        self.val = val
+        self.children = []
+
+
+def _id_array(n: int, values=()) -> array:
+    return array("i" if n < 2**31 else "q", values)
+
+
+def _value_store(values):
+    values = list(values)
+    if values and all(type(v) is int for v in values):
+        try:
+            return array("q", values)
+        except OverflowError:
+            pass
+    return values
+
+
+class CompactTree:
+    __slots__ = ("values", "parents", "first_child", "level_offsets")
+
+    def __init__(self, values, parents, first_child, level_offsets):
+        self.values = values
+        self.parents = parents
+        self.first_child = first_child
+        self.level_offsets = level_offsets
+
+    # -- construction ---------------------------------------------------------
+
+    @classmethod
+    def from_treenode(cls, root) -> "CompactTree":
+        """Flatten a TreeNode (or SlotTreeNode) tree."""
+        if root is None:
+            return cls([], _id_array(0), _id_array(0, [0]), _id_array(0, [0]))
+        values = []
+        parents = _id_array(0)
+        first_child = _id_array(0, [1])
+        level_offsets = _id_array(0, [0])
+        next_id = 1
+        level = [(root, -1)]
+        while level:
+            level_offsets.append(level_offsets[-1] + len(level))
+            nxt = []
+            for node, parent in level:
+                node_id = len(values)
+                values.append(node.val)
+                parents.append(parent)
+                next_id += len(node.children)
+                first_child.append(next_id)
+                nxt.extend((child, node_id) for child in node.children)
+            level = nxt
+        return cls(_value_store(values), parents, first_child, level_offsets)
+
+    @classmethod
+    def from_parents(cls, parents, values=None) -> "CompactTree":
+        """Build from a parent array (parents[i] = index of i's parent, -1 for roots).
+
+        Nodes may be in any order; the result is renumbered in BFS order.
+        Multiple roots (a forest) share generation 0.
+        """
+        n = len(parents)
+        if values is None:
+            values = range(n)
+        if np is not None:
+            order, level_offsets, counts = cls._bfs_numpy(parents)
+        else:
+            order, level_offsets, counts = cls._bfs_array(parents)
+        if len(order) != n:
+            raise ValueError("parent array contains a cycle or a dangling parent id")
+
+        new_id = _id_array(n, bytes(4 if n < 2**31 else 8) * n)
+        for k, old in enumerate(order):
+            new_id[old] = k
+        bfs_parents = _id_array(n, (new_id[parents[old]] if parents[old] >= 0 else -1 for old in order))
+        bfs_values = _value_store(values[old] for old in order)
+
+        first_child = _id_array(n, [level_offsets[1] if len(level_offsets) > 1 else 0])
+        for old in order:
+            first_child.append(first_child[-1] + counts[old])
+        return cls(bfs_values, bfs_parents, first_child, _id_array(n, level_offsets))
+
+    @staticmethod
+    def _csr(parents):
+        """Children grouped by parent (counting sort): offsets, child ids, counts."""
+        n = len(parents)
+        counts = [0] * n
+        for p in parents:
+            if p >= 0:
+                counts[p] += 1
+        offsets = [0] * (n + 1)
+        for i in range(n):
+            offsets[i + 1] = offsets[i] + counts[i]
+        fill = offsets[:-1]
+        children = [0] * offsets[-1]
+        for child, p in enumerate(parents):
+            if p >= 0:
+                children[fill[p]] = child
+                fill[p] += 1
+        return offsets, children, counts
+
+    @classmethod
+    def _bfs_array(cls, parents):
+        offsets, children, counts = cls._csr(parents)
+        frontier = [i for i, p in enumerate(parents) if p < 0]
+        order = []
+        level_offsets = [0]
+        while frontier:
+            order.extend(frontier)
+            level_offsets.append(len(order))
+            nxt = []
+            for node in frontier:
+                nxt.extend(children[offsets[node]:offsets[node + 1]])
+            frontier = nxt
+        return order, level_offsets, counts
+
+    @staticmethod
+    def _bfs_numpy(parents):
+        p = np.asarray(parents, dtype=np.int64)
+        n = len(p)
+        has_parent = p >= 0
+        counts = np.bincount(p[has_parent], minlength=n)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        # Stable sort by parent == CSR child list.
+        children = np.nonzero(has_parent)[0][np.argsort(p[has_parent], kind="stable")]
+
+        frontier = np.nonzero(~has_parent)[0]
+        chunks = []
+        level_offsets = [0]
+        while len(frontier):
+            chunks.append(frontier)
+            level_offsets.append(level_offsets[-1] + len(frontier))
+            starts = offsets[frontier]
+            lengths = offsets[frontier + 1] - starts
+            total = int(lengths.sum())
+            if total == 0:
+                break
+            # Gather every child slice of the frontier in one shot.
+            base = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            frontier = children[base + np.arange(total)]
+        order = np.concatenate(chunks).tolist() if chunks else []
+        return order, level_offsets, counts.tolist()
+
+    # -- queries --------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def children(self, i: int) -> range:
+        return range(self.first_child[i], self.first_child[i + 1])
+
+    def iter_levels(self):
+        """Yield one generation's values at a time."""
+        lv = self.level_offsets
+        for g in range(len(lv) - 1):
+            yield list(self.values[lv[g]:lv[g + 1]])
+
+    def iter_preorder_ids(self):
+        """Node ids depth-first, parent before children."""
+        fc = self.first_child
+        stack = list(range(self.level_offsets[1] - 1, -1, -1)) if len(self) else []
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(range(fc[node + 1] - 1, fc[node] - 1, -1))
+
+    def iter_postorder_ids(self):
+        """Node ids depth-first, children before parent."""
+        fc = self.first_child
+        stack = [(r, False) for r in range(self.level_offsets[1] - 1, -1, -1)] if len(self) else []
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                yield node
+                continue
+            stack.append((node, True))
+            stack.extend((c, False) for c in range(fc[node + 1] - 1, fc[node] - 1, -1))
+
+    def iter_preorder(self):
+        values = self.values
+        return (values[i] for i in self.iter_preorder_ids())
+
+    def iter_postorder(self):
+        values = self.values
+        return (values[i] for i in self.iter_postorder_ids())
+
+    def level_order(self) -> list:
+        """Same result as a.level_order_traversal, one slice per generation."""
+        lv = self.level_offsets
+        return [list(self.values[lv[g]:lv[g + 1]]) for g in range(len(lv) - 1)]
+
+    def nbytes(self) -> int:
+        total = 0
+        for arr in (self.parents, self.first_child, self.level_offsets):
+            total += arr.itemsize * len(arr)
+        if isinstance(self.values, array):
+            total += self.values.itemsize * len(self.values)
+        return total
+
+
+# -- benchmark ----------------------------------------------------------------
+
+def random_parents(n: int, max_children: int, seed: int) -> list:
+    """Genealogy-like tree: each person has 0..max_children children, generation by generation."""
+    rng = random.Random(seed)
+    parents = [-1]
+    queue = deque([0])
+    while len(parents) < n:
+        node = queue.popleft() if queue else rng.randrange(len(parents))
+        for _ in range(rng.randint(1 if not queue else 0, max_children)):
+            if len(parents) >= n:
+                break
+            queue.append(len(parents))
+            parents.append(node)
+    return parents
+
+
+def build_nodes(parents, node_cls):
+    nodes = [node_cls(i) for i in range(len(parents))]
+    for i, p in enumerate(parents):
+        if p >= 0:
+            nodes[p].children.append(nodes[i])
+    return nodes
+
+
+def measure(fn):
+    """Run `fn` twice: once under tracemalloc for retained bytes, once untraced for time."""
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start, current
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Memory/throughput of TreeNode vs __slots__ vs CompactTree")
+    ap.add_argument("--nodes", type=int, default=1_000_000, help="Number of people in the tree")
+    ap.add_argument("--max-children", type=int, default=4, help="Max children per person")
+    ap.add_argument("--seed", type=int, default=1, help="RNG seed")
+    args = ap.parse_args()
+
+    parents = random_parents(args.nodes, args.max_children, args.seed)
+    n = len(parents)
+    print(f"nodes={n} numpy={'yes' if np is not None else 'no'}")
+
+    rows = []
+    for label, node_cls in (("TreeNode", TreeNode), ("SlotTreeNode", SlotTreeNode)):
+        nodes, build_s, mem = measure(lambda: build_nodes(parents, node_cls))
+        start = time.perf_counter()
+        levels = level_order_traversal(nodes[0])
+        trav_s = time.perf_counter() - start
+        rows.append((label, mem, build_s, trav_s))
+        if node_cls is TreeNode:
+            expected = levels
+        del nodes
+
+    compact, build_s, mem = measure(lambda: CompactTree.from_parents(parents))
+    start = time.perf_counter()
+    levels = compact.level_order()
+    trav_s = time.perf_counter() - start
+    rows.append(("CompactTree", mem, build_s, trav_s))
+    if levels != expected:
+        print("MISMATCH: CompactTree.level_order() differs from level_order_traversal()")
+        return 1
+
+    print(f"{'layout':<14}{'bytes/node':>12}{'build_s':>10}{'level_order_s':>15}{'nodes/s':>14}")
+    for label, mem, build_s, trav_s in rows:
+        print(f"{label:<14}{mem / n:>12.1f}{build_s:>10.3f}{trav_s:>15.3f}{n / trav_s if trav_s else 0:>14.0f}")
+    print(f"levels={len(expected)} (identical across layouts)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,232 @@
+"""Local stand-in for ADX inline ingestion of person.py output.
+
+parse_command() parses one `.set-or-append T <| datatable (...) [...]`
+command the way the engine has to: read the column schema, tokenize the
+literal list and convert every value to its declared type (guid -> UUID,
+datetime -> datetime, string -> str, long/int/real/bool as numbers), giving
+one Python list per column.
+
+The benchmark generates one dataset with person.py, writes it as inline KQL,
+CSV and Parquet, parses each back into typed columns and reports payload
+bytes per row and parse throughput, to compare formats before sending
+anything to a real cluster.
+
+Usage:
+    python kql_ingest_sim.py --rows 200000
+    python kql_ingest_sim.py --rows 1000000 --blob-bytes 256 --workers 4
+    python kql_ingest_sim.py --parse person.kql     # parse an existing script
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from person import MAX_COMMAND_BYTES, iter_batches, write_csv, write_kql, write_parquet
+
+_HEADER_RE = re.compile(
+    r"\s*\.(?:set-or-append|append|set|ingest\s+inline\s+into\s+table)\s+([\w.]+)\s*<\|\s*"
+    r"datatable\s*\((.*?)\)\s*\[",
+    re.S | re.I,
+)
+_COLUMN_RE = re.compile(r"\s*([\w]+)\s*:\s*(\w+)\s*")
+_VALUE_RE = re.compile(
+    r"""\s*(?:
+        guid\(\s*"?([0-9A-Fa-f-]+)"?\s*\)                  # 1 guid
+      | datetime\(\s*([^)]*?)\s*\)                         # 2 datetime
+      | "((?:[^"\\]|\\.)*)"                                # 3 "string"
+      | '((?:[^'\\]|\\.)*)'                                # 4 'string'
+      | (true|false|null|[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)  # 5 bare literal
+    )\s*([,\]])""",
+    re.X,
+)
+_ESCAPE_RE = re.compile(r"\\(.)", re.S)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0"}
+_COMMAND_SPLIT_RE = re.compile(r"\n\s*\n(?=\s*\.)")
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)), text)
+
+
+def _parse_datetime(text: str) -> datetime:
+    value = datetime.fromisoformat(text.replace(" ", "T"))
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _convert(kind: str, m: re.Match):
+    if m.group(5) == "null":
+        return None
+    if kind == "guid":
+        return uuid.UUID(m.group(1) or _unescape(m.group(3) or m.group(4) or ""))
+    if kind == "datetime":
+        return _parse_datetime(m.group(2) if m.group(2) is not None else _unescape(m.group(3) or ""))
+    if kind == "string":
+        raw = m.group(3) if m.group(3) is not None else m.group(4)
+        return _unescape(raw) if raw is not None else m.group(5)
+    literal = m.group(5)
+    if kind == "bool":
+        return literal == "true"
+    if kind in ("long", "int"):
+        return int(literal)
+    if kind in ("real", "double", "decimal"):
+        return float(literal)
+    raise ValueError(f"unsupported column type {kind!r}")
+
+
+def parse_command(text: str) -> Tuple[str, List[Tuple[str, str]], Dict[str, list]]:
+    """Parse one datatable command into (table, [(column, type)], {column: values})."""
+    m = _HEADER_RE.match(text)
+    if not m:
+        raise ValueError("not a datatable ingestion command")
+    table = m.group(1)
+    columns = [(c.group(1), c.group(2).lower()) for c in map(_COLUMN_RE.fullmatch, m.group(2).split(",")) if c]
+    if not columns:
+        raise ValueError("datatable has no columns")
+    kinds = [kind for _, kind in columns]
+    data: List[list] = [[] for _ in columns]
+    ncols = len(columns)
+
+    pos = m.end()
+    if text[pos:].strip() == "]":
+        return table, columns, {name: [] for name, _ in columns}
+    i = 0
+    while True:
+        v = _VALUE_RE.match(text, pos)
+        if v is None:
+            raise ValueError(f"unexpected input at offset {pos}: {text[pos:pos + 40]!r}")
+        data[i % ncols].append(_convert(kinds[i % ncols], v))
+        i += 1
+        pos = v.end()
+        if v.group(6) == "]":
+            break
+    if i % ncols:
+        raise ValueError(f"{i} values is not a multiple of {ncols} columns")
+    return table, columns, {name: col for (name, _), col in zip(columns, data)}
+
+
+def iter_commands(text: str) -> Iterator[str]:
+    """Split a Kusto script into commands (separated by blank lines)."""
+    for command in _COMMAND_SPLIT_RE.split(text):
+        if command.strip():
+            yield command
+
+
+# ---------------------------------------------------------------------------
+# Format comparison
+# ---------------------------------------------------------------------------
+
+def parse_kql_file(path: Path) -> int:
+    rows = 0
+    for command in iter_commands(path.read_text(encoding="utf-8")):
+        _, _, data = parse_command(command)
+        rows += len(data["Id"])
+    return rows
+
+
+def parse_csv_files(paths: List[Path]) -> int:
+    rows = 0
+    for path in paths:
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            ids, dobs, strings = [], [], []
+            for rec in reader:
+                ids.append(uuid.UUID(rec[0]))
+                dobs.append(_parse_datetime(rec[4]))
+                strings.append(rec[1:4] + rec[5:])
+            rows += len(ids)
+    return rows
+
+
+def parse_parquet_file(path: Path) -> int:
+    import pyarrow.parquet as pq
+    table = pq.read_table(path)
+    ids = [uuid.UUID(s) for s in table.column("Id").to_pylist()]
+    table.column("DateOfBirth").to_pylist()
+    for name in ("FirstName", "LastName", "MiddleName", "PhotoUrl", "BlobData", "SampleData"):
+        table.column(name).to_pylist()
+    return len(ids)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Parse datatable ingestion commands and compare KQL/CSV/Parquet payloads")
+    ap.add_argument("--rows", type=int, default=200_000, help="Rows in the generated dataset")
+    ap.add_argument("--seed", type=int, default=0, help="person.py RNG seed")
+    ap.add_argument("--blob-bytes", type=int, default=0, help="person.py --blob-bytes")
+    ap.add_argument("--workers", type=int, default=1, help="person.py generator processes")
+    ap.add_argument("--max-command-bytes", type=int, default=MAX_COMMAND_BYTES, help="Size cap per KQL command")
+    ap.add_argument("--parse", type=Path, help="Only parse this KQL script and report throughput")
+    args = ap.parse_args()
+    if not args.parse and args.rows < 1:
+        ap.error("--rows must be at least 1")
+
+    if args.parse:
+        size = args.parse.stat().st_size
+        start = time.perf_counter()
+        rows = parse_kql_file(args.parse)
+        elapsed = time.perf_counter() - start
+        print(f"rows={rows} bytes={size} bytes_per_row={size / max(rows, 1):.1f} "
+              f"parse_s={elapsed:.2f} rows_per_s={rows / elapsed if elapsed else 0:.0f}")
+        return 0
+
+    try:
+        import pyarrow  # noqa: F401
+        have_parquet = True
+    except ImportError:
+        have_parquet = False
+
+    def batches():
+        return iter_batches(args.rows, seed=args.seed, blob_bytes=args.blob_bytes, workers=args.workers)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="kql_sim_") as tmp:
+        tmp = Path(tmp)
+
+        start = time.perf_counter()
+        write_kql(batches(), tmp / "person.kql", args.max_command_bytes)
+        write_s = time.perf_counter() - start
+        start = time.perf_counter()
+        rows = parse_kql_file(tmp / "person.kql")
+        results.append(("kql datatable", (tmp / "person.kql").stat().st_size, write_s,
+                        time.perf_counter() - start, rows))
+
+        start = time.perf_counter()
+        write_csv(batches(), tmp / "person.csv")
+        write_s = time.perf_counter() - start
+        start = time.perf_counter()
+        rows = parse_csv_files([tmp / "person.csv"])
+        results.append(("csv", (tmp / "person.csv").stat().st_size, write_s, time.perf_counter() - start, rows))
+
+        if have_parquet:
+            start = time.perf_counter()
+            write_parquet(batches(), tmp / "person.parquet")
+            write_s = time.perf_counter() - start
+            start = time.perf_counter()
+            rows = parse_parquet_file(tmp / "person.parquet")
+            results.append(("parquet (zstd)", (tmp / "person.parquet").stat().st_size, write_s,
+                            time.perf_counter() - start, rows))
+        else:
+            print("pyarrow not installed: skipping Parquet")
+
+    print(f"{'format':<16}{'bytes':>14}{'bytes/row':>11}{'write_s':>9}{'parse_s':>9}{'parse rows/s':>14}")
+    for label, size, write_s, parse_s, rows in results:
+        if rows != args.rows:
+            print(f"MISMATCH: {label} parsed {rows} rows, expected {args.rows}")
+            return 1
+        print(f"{label:<16}{size:>14}{size / rows:>11.1f}{write_s:>9.2f}{parse_s:>9.2f}"
+              f"{rows / parse_s if parse_s else 0:>14.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
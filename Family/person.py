@@ -1,43 +1,279 @@
-import uuid
+"""Synthetic Person rows for Kusto/ADX ingestion load tests.
+
+Rows are generated in fixed-size batches. Batch b is produced by its own
+RNG seeded from (seed, b), so for a given --seed and --batch-size the output
+is identical no matter how many worker processes generate it, and memory
+stays at a few batches regardless of --rows.
+
+Formats:
+- kql      `.set-or-append Person <| datatable(...)` commands, each kept under
+           --max-command-bytes (ADX rejects oversized control commands);
+           commands are separated by a blank line, as in a Kusto script
+- csv      one file, or a new file every --rows-per-file rows, with a header
+           row (ingest with ignoreFirstRecord=true)
+- parquet  one row group per batch (needs pyarrow)
+
+Usage:
+    python person.py                                   # 5 rows, one KQL command
+    python person.py --rows 1000000 --format kql --out person.kql
+    python person.py --rows 10000000 --format csv --out person.csv --rows-per-file 1000000 --workers 8
+    python person.py --rows 10000000 --format parquet --out person.parquet --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import csv
 import random
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
 
 # Sample data for names
-first_names = ["San", "Si", "Wu", "Liu", "Qi"]
-last_names = ["Zhao", "Qian", "Sun", "Li", "Zhou"]
-middle_names = ["Marie", "Lee", "Ann", "James", "Lynn"]
-
-# Generate 5 rows of data
-rows = []
-base_date = datetime(1980, 1, 1)
-for i in range(5):
-    guid_str = str(uuid.uuid4())
-    first = first_names[i]
-    last = last_names[i]
-    middle = middle_names[i]
-    dob = base_date + timedelta(days=random.randint(5000, 15000))
-    photo_url = f"https://example.com/photo{i+1}.jpg"
-    blob_data = f"blobdata{i+1}"
-    sample_data = f"sample data {i+1}"
-    row = f'    guid("{guid_str}"), "{first}", "{last}", "{middle}", datetime({dob.strftime("%Y-%m-%d")}), "{photo_url}", "{blob_data}", "{sample_data}"'
-    rows.append(row)
-
-# Construct the KQL statement
-kql_statement = """.set-or-append Person <|
-datatable (
-    Id: guid,
-    FirstName: string,
-    LastName: string,
-    MiddleName: string,
-    DateOfBirth: datetime,
-    PhotoUrl: string,
-    BlobData: string,
-    SampleData: string
-)
-[
-"""
-kql_statement += ",\n".join(rows)
-kql_statement += "\n]"
+first_names = ["San", "Si", "Wu", "Liu", "Qi", "Ming", "Hua", "Jun", "Lan", "Wei"]
+last_names = ["Zhao", "Qian", "Sun", "Li", "Zhou", "Wu", "Zheng", "Wang", "Feng", "Chen"]
+middle_names = ["Marie", "Lee", "Ann", "James", "Lynn", "Rose", "Grace", "Ray", "Jade", "Kai"]
+
+BASE_DATE = datetime(1980, 1, 1)
+MAX_COMMAND_BYTES = 1_000_000   # stay well below the ADX request size limit
+
+COLUMNS = [
+    ("Id", "guid"),
+    ("FirstName", "string"),
+    ("LastName", "string"),
+    ("MiddleName", "string"),
+    ("DateOfBirth", "datetime"),
+    ("PhotoUrl", "string"),
+    ("BlobData", "string"),
+    ("SampleData", "string"),
+]
+
+
+class Person(NamedTuple):
+    Id: str
+    FirstName: str
+    LastName: str
+    MiddleName: str
+    DateOfBirth: datetime
+    PhotoUrl: str
+    BlobData: str
+    SampleData: str
+
+
+# ---------------------------------------------------------------------------
+# Generation
+# ---------------------------------------------------------------------------
+
+def generate_batch(batch_index: int, batch_size: int, total: int, seed: int, blob_bytes: int) -> List[Person]:
+    """Rows batch_index * batch_size .. (exclusive) min(total, next batch start)."""
+    rng = random.Random(f"{seed}:{batch_index}")
+    start = batch_index * batch_size
+    rows = []
+    for i in range(start, min(total, start + batch_size)):
+        rows.append(Person(
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            rng.choice(first_names),
+            rng.choice(last_names),
+            rng.choice(middle_names),
+            BASE_DATE + timedelta(days=rng.randint(5000, 15000)),
+            f"https://example.com/photo{i + 1}.jpg",
+            base64.b64encode(rng.randbytes(blob_bytes)).decode("ascii") if blob_bytes else f"blobdata{i + 1}",
+            f"sample data {i + 1}",
+        ))
+    return rows
+
+
+def iter_batches(total: int, *, batch_size: int = 10_000, seed: int = 0, blob_bytes: int = 0,
+                 workers: int = 1) -> Iterator[List[Person]]:
+    """Yield batches in order; with workers > 1 at most 2 * workers batches are in flight."""
+    n_batches = (total + batch_size - 1) // batch_size
+    if workers <= 1:
+        for b in range(n_batches):
+            yield generate_batch(b, batch_size, total, seed, blob_bytes)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        next_batch = 0
+        while next_batch < n_batches or pending:
+            while next_batch < n_batches and len(pending) < 2 * workers:
+                pending.append(pool.submit(generate_batch, next_batch, batch_size, total, seed, blob_bytes))
+                next_batch += 1
+            yield pending.popleft().result()
+
+
+# ---------------------------------------------------------------------------
+# KQL
+# ---------------------------------------------------------------------------
+
+def kql_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def kql_row(p: Person) -> str:
+    return (f'    guid("{p.Id}"), {kql_string(p.FirstName)}, {kql_string(p.LastName)}, '
+            f'{kql_string(p.MiddleName)}, datetime({p.DateOfBirth.strftime("%Y-%m-%d")}), '
+            f'{kql_string(p.PhotoUrl)}, {kql_string(p.BlobData)}, {kql_string(p.SampleData)}')
+
+
+def kql_header(table: str = "Person") -> str:
+    columns = ",\n".join(f"    {name}: {kind}" for name, kind in COLUMNS)
+    return f".set-or-append {table} <|\ndatatable (\n{columns}\n)\n[\n"
+
+
+def iter_kql_commands(batches, *, table: str = "Person", max_bytes: int = MAX_COMMAND_BYTES) -> Iterator[str]:
+    """Pack rows from `batches` into datatable commands of at most max_bytes UTF-8 bytes."""
+    header = kql_header(table)
+    overhead = len(header.encode("utf-8")) + len("\n]")
+    rows: List[str] = []
+    size = overhead
+    for batch in batches:
+        for p in batch:
+            row = kql_row(p)
+            row_bytes = len(row.encode("utf-8")) + 2   # ",\n"
+            if overhead + row_bytes > max_bytes:
+                raise ValueError(f"a single row ({row_bytes} bytes) exceeds --max-command-bytes")
+            if rows and size + row_bytes > max_bytes:
+                yield header + ",\n".join(rows) + "\n]"
+                rows = []
+                size = overhead
+            rows.append(row)
+            size += row_bytes
+    if rows:
+        yield header + ",\n".join(rows) + "\n]"
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------
+
+def write_kql(batches, out: Optional[Path], max_bytes: int) -> int:
+    commands = 0
+    f = open(out, "w", encoding="utf-8", newline="\n") if out else sys.stdout
+    try:
+        for command in iter_kql_commands(batches, max_bytes=max_bytes):
+            if commands:
+                f.write("\n\n")
+            f.write(command)
+            commands += 1
+        f.write("\n")
+    finally:
+        if out:
+            f.close()
+    return commands
+
+
+def _csv_row(p: Person) -> list:
+    return [p.Id, p.FirstName, p.LastName, p.MiddleName, p.DateOfBirth.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            p.PhotoUrl, p.BlobData, p.SampleData]
+
+
+def write_csv(batches, out: Optional[Path], rows_per_file: int = 0) -> int:
+    """Write CSV; with rows_per_file, out becomes out.00000.csv, out.00001.csv, ..."""
+    files = 0
+    written = 0
+    f = None
+    writer = None
+    try:
+        for batch in batches:
+            for p in batch:
+                if writer is None or (out and rows_per_file and written == rows_per_file):
+                    if f is not None and out:
+                        f.close()
+                    if out is None:
+                        f = sys.stdout
+                    elif rows_per_file:
+                        f = open(out.with_name(f"{out.stem}.{files:05d}{out.suffix or '.csv'}"), "w",
+                                 encoding="utf-8", newline="")
+                    else:
+                        f = open(out, "w", encoding="utf-8", newline="")
+                    writer = csv.writer(f)
+                    writer.writerow([name for name, _ in COLUMNS])
+                    files += 1
+                    written = 0
+                writer.writerow(_csv_row(p))
+                written += 1
+    finally:
+        if f is not None and out:
+            f.close()
+    return files
+
+
+def write_parquet(batches, out: Path, compression: str = "zstd") -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("pyarrow is required for --format parquet (pip install pyarrow)")
+
+    schema = pa.schema([
+        ("Id", pa.string()),
+        ("FirstName", pa.string()),
+        ("LastName", pa.string()),
+        ("MiddleName", pa.string()),
+        ("DateOfBirth", pa.timestamp("us", tz="UTC")),
+        ("PhotoUrl", pa.string()),
+        ("BlobData", pa.string()),
+        ("SampleData", pa.string()),
+    ])
+    groups = 0
+    with pq.ParquetWriter(out, schema, compression=compression) as writer:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema))
+            groups += 1
+    return groups
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Generate Person rows as KQL datatable commands, CSV or Parquet")
+    ap.add_argument("--rows", type=int, default=5, help="Number of rows")
+    ap.add_argument("--seed", type=int, default=0, help="RNG seed (same seed => same rows)")
+    ap.add_argument("--batch-size", type=int, default=10_000, help="Rows per generated batch / Parquet row group")
+    ap.add_argument("--workers", type=int, default=1, help="Generator processes")
+    ap.add_argument("--blob-bytes", type=int, default=0,
+                    help="Random bytes (base64) per BlobData; 0 keeps the short 'blobdataN' placeholder")
+    ap.add_argument("--format", choices=("kql", "csv", "parquet"), default="kql", help="Output format")
+    ap.add_argument("--out", type=Path, help="Output file (default: stdout for kql/csv)")
+    ap.add_argument("--max-command-bytes", type=int, default=MAX_COMMAND_BYTES, help="Size cap per KQL command")
+    ap.add_argument("--rows-per-file", type=int, default=0, help="Split CSV output every N rows")
+    args = ap.parse_args()
+
+    if args.batch_size < 1:
+        ap.error("--batch-size must be at least 1")
+    if args.format == "parquet" and args.out is None:
+        ap.error("--format parquet needs --out")
+
+    batches = iter_batches(args.rows, batch_size=args.batch_size, seed=args.seed,
+                           blob_bytes=args.blob_bytes, workers=args.workers)
+    start = time.perf_counter()
+    if args.format == "kql":
+        count = write_kql(batches, args.out, args.max_command_bytes)
+        what = "commands"
+    elif args.format == "csv":
+        count = write_csv(batches, args.out, args.rows_per_file)
+        what = "files"
+    else:
+        count = write_parquet(batches, args.out)
+        what = "row_groups"
+    elapsed = time.perf_counter() - start
+
+    if args.out:
+        print(f"rows={args.rows} {what}={count} elapsed_s={elapsed:.2f} "
+              f"rows_per_s={args.rows / elapsed if elapsed else 0:.0f}", file=sys.stderr)
+    return 0
+
 
-# Output the final KQL
-print(kql_statement)
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,300 @@
+"""On-disk binary format for CompactTree, loaded with mmap.
+
+Everything after the header is a flat little-endian array, 8-byte aligned,
+so loading is an mmap plus a memoryview cast per section; nothing is parsed
+or copied until a node is actually read.
+
+    header   magic "FTRE", version, id width (4/8), flags,
+             nodes, generations, distinct names, string bytes
+    parents          nodes        BFS id of the parent, -1 for roots
+    first_child      nodes + 1    children of i: first_child[i] .. first_child[i+1]-1
+    level_offsets    gens + 1     generation g: level_offsets[g] .. level_offsets[g+1]-1
+    name_ids         nodes        index into the string table
+    string_offsets   names + 1    (int64) byte ranges in the string blob
+    person_ids       nodes * 16   optional raw UUID bytes (person.py Id)
+    strings          UTF-8 blob, each distinct name stored once
+
+load() returns a MappedTree, a CompactTree whose arrays are views into the
+mapping, so level_order / iter_preorder / TreeIndex work on it unchanged.
+
+Usage:
+    python tree_file.py build family.tree --rows 1000000          # from person.py rows
+    python tree_file.py build family.tree --csv person.00000.csv person.00001.csv
+    python tree_file.py info family.tree
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import mmap
+import random
+import struct
+import sys
+import time
+import uuid
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from compact_tree import CompactTree
+from person import Person, iter_batches
+
+MAGIC = b"FTRE"
+VERSION = 1
+FLAG_PERSON_IDS = 1
+_HEADER = struct.Struct("<4sHBBQQQQ")
+_ALIGN = 8
+
+
+def _pad(n: int) -> int:
+    return -n % _ALIGN
+
+
+class StringTable(Sequence):
+    """Node names decoded on access from the mapped string blob."""
+
+    def __init__(self, name_ids, offsets, blob):
+        self.name_ids = name_ids
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.name_ids)
+
+    def string(self, k: int) -> str:
+        return str(self.blob[self.offsets[k]:self.offsets[k + 1]], "utf-8")
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.string(self.name_ids[j]) for j in range(*i.indices(len(self)))]
+        return self.string(self.name_ids[i])
+
+
+class MappedTree(CompactTree):
+    __slots__ = ("person_ids", "_mm", "_file")
+
+    def person_id(self, i: int) -> Optional[uuid.UUID]:
+        if self.person_ids is None:
+            return None
+        return uuid.UUID(bytes=bytes(self.person_ids[i * 16:(i + 1) * 16]))
+
+    def close(self) -> None:
+        """Release the views and unmap; the tree is unusable afterwards."""
+        views = [self.parents, self.first_child, self.level_offsets, self.person_ids]
+        if isinstance(self.values, StringTable):
+            views += [self.values.name_ids, self.values.offsets, self.values.blob]
+        for view in views:
+            if isinstance(view, memoryview):
+                view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "MappedTree":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ---------------------------------------------------------------------------
+# Write / load
+# ---------------------------------------------------------------------------
+
+def save(tree: CompactTree, path: Path, person_ids: Optional[Sequence[bytes]] = None) -> int:
+    """Write `tree` (values are used as names) and optional 16-byte ids; returns bytes written."""
+    n = len(tree)
+    typecode = "i" if n < 2**31 else "q"
+    strings: Dict[str, int] = {}
+    name_ids = array(typecode, (strings.setdefault(str(v), len(strings)) for v in tree.values))
+    blob = bytearray()
+    offsets = array("q", [0])
+    for s in strings:
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+
+    sections = [
+        array(typecode, tree.parents),
+        array(typecode, tree.first_child),
+        array(typecode, tree.level_offsets),
+        name_ids,
+        offsets,
+    ]
+    if sys.byteorder == "big":
+        for arr in sections:
+            arr.byteswap()
+    payload = [arr.tobytes() for arr in sections]
+    if person_ids is not None:
+        payload.append(b"".join(person_ids))
+    payload.append(bytes(blob))
+
+    flags = FLAG_PERSON_IDS if person_ids is not None else 0
+    header = _HEADER.pack(MAGIC, VERSION, array(typecode).itemsize, flags,
+                          n, len(tree.level_offsets) - 1, len(strings), len(blob))
+    tmp = Path(path).with_suffix(Path(path).suffix + ".tmp")
+    written = 0
+    with open(tmp, "wb") as f:
+        for chunk in [header] + payload:
+            f.write(chunk)
+            f.write(b"\0" * _pad(len(chunk)))
+            written += len(chunk) + _pad(len(chunk))
+    tmp.replace(path)
+    return written
+
+
+def load(path: Path) -> MappedTree:
+    if sys.byteorder != "little":
+        raise ValueError("tree files are little-endian; zero-copy loading needs a little-endian host")
+    f = open(path, "rb")
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        f.close()
+        raise ValueError(f"{path}: empty file")
+    try:
+        magic, version, width, flags, n, gens, n_strings, blob_bytes = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a family tree file")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported version {version}")
+        fmt = {4: "i", 8: "q"}[width]
+
+        view = memoryview(mm)
+        pos = _HEADER.size + _pad(_HEADER.size)
+
+        def take(nbytes: int, cast: Optional[str]):
+            nonlocal pos
+            if pos + nbytes > len(mm):
+                raise ValueError(f"{path}: truncated")
+            section = view[pos:pos + nbytes]
+            pos += nbytes + _pad(nbytes)
+            return section.cast(cast) if cast else section
+
+        parents = take(n * width, fmt)
+        first_child = take((n + 1) * width, fmt)
+        level_offsets = take((gens + 1) * width, fmt)
+        name_ids = take(n * width, fmt)
+        offsets = take((n_strings + 1) * 8, "q")
+        person_ids = take(n * 16, None) if flags & FLAG_PERSON_IDS else None
+        blob = take(blob_bytes, None)
+        view.release()
+    except Exception:
+        mm.close()
+        f.close()
+        raise
+
+    tree = MappedTree(StringTable(name_ids, offsets, blob), parents, first_child, level_offsets)
+    tree.person_ids = person_ids
+    tree._mm = mm
+    tree._file = f
+    return tree
+
+
+# ---------------------------------------------------------------------------
+# Person rows -> tree
+# ---------------------------------------------------------------------------
+
+def full_name(p: Person) -> str:
+    return " ".join(part for part in (p.FirstName, p.MiddleName, p.LastName) if part)
+
+
+def genealogy_parents(rows: List[Person], seed: int = 0, min_gap_years: int = 16) -> List[int]:
+    """person.py rows carry no family links, so assign each person a parent.
+
+    The parent is a random person with the same LastName born at least
+    min_gap_years earlier; people with no such candidate become roots.
+    Deterministic for a given seed, O(n log n).
+    """
+    rng = random.Random(seed)
+    gap = timedelta(days=int(min_gap_years * 365.25))
+    by_family: Dict[str, List[int]] = {}
+    for i, p in enumerate(rows):
+        by_family.setdefault(p.LastName, []).append(i)
+
+    parents = [-1] * len(rows)
+    for members in by_family.values():
+        members.sort(key=lambda i: rows[i].DateOfBirth)
+        births = [rows[i].DateOfBirth for i in members]
+        for i in members:
+            k = bisect_right(births, rows[i].DateOfBirth - gap)
+            if k:
+                parents[i] = members[rng.randrange(k)]
+    return parents
+
+
+def tree_from_persons(rows: Iterable[Person], parents: Optional[Sequence[int]] = None,
+                      seed: int = 0) -> tuple:
+    """(CompactTree named by full name, person UUID bytes in BFS order) from Person rows.
+
+    `parents` gives each row's parent row index (-1 for roots); without it a
+    plausible genealogy is derived with genealogy_parents().
+    """
+    rows = list(rows)
+    if parents is None:
+        parents = genealogy_parents(rows, seed)
+    # Carry the row index as the value so ids can be reordered with the BFS numbering.
+    order_tree = CompactTree.from_parents(parents)
+    order = order_tree.values
+    names = [full_name(rows[i]) for i in order]
+    ids = [uuid.UUID(rows[i].Id).bytes for i in order]
+    tree = CompactTree(names, order_tree.parents, order_tree.first_child, order_tree.level_offsets)
+    return tree, ids
+
+
+def read_person_csv(paths: Iterable[Path]) -> Iterable[Person]:
+    """Person rows back from person.py --format csv files."""
+    for path in paths:
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for rec in reader:
+                rec[4] = datetime.fromisoformat(rec[4].replace("Z", "+00:00")).replace(tzinfo=None)
+                yield Person(*rec)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Build or inspect an mmap-able family tree file")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Convert person.py rows into a tree file")
+    b.add_argument("out", type=Path, help="Tree file to write")
+    b.add_argument("--rows", type=int, default=100_000, help="Generate this many rows with person.py")
+    b.add_argument("--seed", type=int, default=0, help="person.py / genealogy seed")
+    b.add_argument("--csv", type=Path, nargs="*", help="Read rows from person.py CSV files instead")
+    i = sub.add_parser("info", help="Load a tree file and print its shape")
+    i.add_argument("path", type=Path, help="Tree file")
+    i.add_argument("--show", type=int, default=3, help="Print this many nodes of each of the first generations")
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        start = time.perf_counter()
+        if args.csv:
+            rows = list(read_person_csv(args.csv))
+        else:
+            rows = [p for batch in iter_batches(args.rows, seed=args.seed) for p in batch]
+        tree, ids = tree_from_persons(rows, seed=args.seed)
+        size = save(tree, args.out, ids)
+        print(f"nodes={len(tree)} generations={len(tree.level_offsets) - 1} roots={tree.level_offsets[1]} "
+              f"bytes={size} bytes_per_node={size / max(len(tree), 1):.1f} "
+              f"build_s={time.perf_counter() - start:.2f}")
+        return 0
+
+    start = time.perf_counter()
+    tree = load(args.path)
+    load_ms = (time.perf_counter() - start) * 1000
+    with tree:
+        print(f"nodes={len(tree)} generations={len(tree.level_offsets) - 1} load_ms={load_ms:.2f}")
+        for g in range(min(args.show, len(tree.level_offsets) - 1)):
+            lo, hi = tree.level_offsets[g], tree.level_offsets[g + 1]
+            shown = ", ".join(f"{tree.values[i]} ({tree.person_id(i)})" for i in range(lo, min(hi, lo + args.show)))
+            print(f"  gen {g}: {hi - lo} people, e.g. {shown}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
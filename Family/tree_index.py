@@ -0,0 +1,189 @@
+"""Precomputed indexes over a CompactTree for fast genealogy queries.
+
+- depth[i]        generation of node i (from the BFS level offsets)
+- tin[i], tout[i] Euler-tour entry/exit times: j is a descendant of i
+                  iff tin[i] <= tin[j] <= tout[i]
+- up[k][i]        2**k-th ancestor of i (binary lifting, -1 past the root)
+
+Queries:
+- is_ancestor(a, b)             O(1)
+- kth_ancestor(x, k)            O(log n)
+- lca(x, y)                     O(log n)
+- ancestors(x)                  generator, O(1) per ancestor
+- descendants_at(x, k)          O(log n) to locate, returns an id range
+
+descendants_at works because in BFS numbering the descendants of x in any
+one generation are contiguous, and within a generation BFS order matches
+Euler-tour order, so both ends are found by binary search on tin.
+
+Benchmark against a BFS per query:
+    python tree_index.py --nodes 1000000 --queries 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from compact_tree import CompactTree, random_parents
+
+
+class TreeIndex:
+    __slots__ = ("tree", "depth", "tin", "tout", "up", "_ids")
+
+    def __init__(self, tree: CompactTree):
+        self.tree = tree
+        n = len(tree)
+        typecode = "i" if n < 2**31 else "q"
+
+        self.depth = array(typecode, bytes(array(typecode).itemsize) * n)
+        lv = tree.level_offsets
+        for g in range(len(lv) - 1):
+            for i in range(lv[g], lv[g + 1]):
+                self.depth[i] = g
+
+        # Euler tour (preorder entry, last-descendant exit).
+        self.tin = array(typecode, bytes(array(typecode).itemsize) * n)
+        self.tout = array(typecode, bytes(array(typecode).itemsize) * n)
+        for t, node in enumerate(tree.iter_preorder_ids()):
+            self.tin[node] = t
+        # Children have larger BFS ids than parents, so a reverse sweep sees
+        # every subtree before its root.
+        for node in range(n - 1, -1, -1):
+            last = tree.first_child[node + 1] - 1
+            self.tout[node] = self.tout[last] if last >= tree.first_child[node] else self.tin[node]
+
+        # Binary lifting table.
+        self.up = [array(typecode, tree.parents)]
+        levels = max(1, (len(lv) - 2).bit_length())
+        for _ in range(1, levels):
+            prev = self.up[-1]
+            self.up.append(array(typecode, (prev[p] if p >= 0 else -1 for p in prev)))
+
+        self._ids = None
+
+    # -- lookups --------------------------------------------------------------
+
+    def node(self, value) -> int:
+        """BFS id of the person with `value` (map built on first use)."""
+        if self._ids is None:
+            self._ids = {v: i for i, v in enumerate(self.tree.values)}
+        return self._ids[value]
+
+    # -- queries --------------------------------------------------------------
+
+    def is_ancestor(self, a: int, b: int) -> bool:
+        """True if a is b or an ancestor of b."""
+        return self.tin[a] <= self.tin[b] <= self.tout[a]
+
+    def kth_ancestor(self, x: int, k: int) -> int:
+        """Ancestor k generations above x, or -1."""
+        if k > self.depth[x]:
+            return -1
+        j = 0
+        while k and x >= 0:
+            if k & 1:
+                x = self.up[j][x]
+            k >>= 1
+            j += 1
+        return x
+
+    def lca(self, x: int, y: int) -> int:
+        """Lowest common ancestor, or -1 for nodes in different trees of a forest."""
+        if self.is_ancestor(x, y):
+            return x
+        if self.is_ancestor(y, x):
+            return y
+        for table in reversed(self.up):
+            a = table[x]
+            if a >= 0 and not self.is_ancestor(a, y):
+                x = a
+        return self.tree.parents[x]
+
+    def ancestors(self, x: int):
+        """Parent, grandparent, ... up to the root."""
+        parents = self.tree.parents
+        x = parents[x]
+        while x >= 0:
+            yield x
+            x = parents[x]
+
+    def descendants_at(self, x: int, k: int) -> range:
+        """Ids of x's descendants exactly k generations below x (k=0 is x itself)."""
+        g = self.depth[x] + k
+        lv = self.tree.level_offsets
+        if k < 0 or g >= len(lv) - 1:
+            return range(0)
+        lo, hi = lv[g], lv[g + 1]
+        first = bisect_left(self.tin, self.tin[x], lo, hi)
+        last = bisect_right(self.tin, self.tout[x], lo, hi)
+        return range(first, last)
+
+
+# -- benchmark ----------------------------------------------------------------
+
+def _bfs_descendants_at(tree: CompactTree, x: int, k: int) -> list:
+    level = [x]
+    for _ in range(k):
+        level = [c for node in level for c in tree.children(node)]
+    return level
+
+
+def _naive_lca(tree: CompactTree, x: int, y: int) -> int:
+    seen = {x}
+    a = x
+    while tree.parents[a] >= 0:
+        a = tree.parents[a]
+        seen.add(a)
+    while y not in seen and y >= 0:
+        y = tree.parents[y]
+    return y
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Genealogy query indexes vs per-query traversal")
+    ap.add_argument("--nodes", type=int, default=1_000_000, help="Number of people in the tree")
+    ap.add_argument("--max-children", type=int, default=4, help="Max children per person")
+    ap.add_argument("--queries", type=int, default=10_000, help="Random queries per kind")
+    ap.add_argument("--seed", type=int, default=1, help="RNG seed")
+    args = ap.parse_args()
+
+    tree = CompactTree.from_parents(random_parents(args.nodes, args.max_children, args.seed))
+    start = time.perf_counter()
+    index = TreeIndex(tree)
+    print(f"nodes={len(tree)} generations={len(tree.level_offsets) - 1} "
+          f"index_build_s={time.perf_counter() - start:.2f} lifting_levels={len(index.up)}")
+
+    rng = random.Random(args.seed)
+    n = len(tree)
+    pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(args.queries)]
+    roots = [rng.randrange(min(n, 1000)) for _ in range(args.queries)]
+
+    def timed(label, fn):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<28} {elapsed * 1e6 / args.queries:>10.2f} us/query")
+        return out
+
+    fast = timed("lca (binary lifting)", lambda: [index.lca(x, y) for x, y in pairs])
+    slow = timed("lca (walk to root)", lambda: [_naive_lca(tree, x, y) for x, y in pairs])
+    if fast != slow:
+        print("MISMATCH in lca")
+        return 1
+
+    fast = timed("descendants_at k=3 (index)", lambda: [list(index.descendants_at(x, 3)) for x in roots])
+    slow = timed("descendants_at k=3 (BFS)", lambda: [_bfs_descendants_at(tree, x, 3) for x in roots])
+    if fast != slow:
+        print("MISMATCH in descendants_at")
+        return 1
+
+    timed("kth_ancestor k=5", lambda: [index.kth_ancestor(x, 5) for x, _ in pairs])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
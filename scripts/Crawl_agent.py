@@ -1,16 +1,38 @@
 import os
+import argparse
 import asyncio
+import functools
 import json
+import posixpath
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pydantic import BaseModel, Field
 from typing import List
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, LLMConfig
 from crawl4ai.extraction_strategy import LLMExtractionStrategy
+from openai import AsyncOpenAI
+from crawl_cache import CrawlCache, schema_hash
+from kg_store import KnowledgeGraphStore
+from stream_extract import stream_knowledge_graph
 
 # 🔧 Configuration
 TARGET_URL = "https://baike.baidu.com/item/%E6%98%8E%E6%9C%9D%E5%B9%B4%E5%8F%B7/1680052"        # ← Replace with your starting URL
 MAX_DEPTH = 2                             # Controls how deep to crawl
+MAX_PAGES = 50                            # Hard cap on pages fetched per run
+FETCH_CONCURRENCY = 4                     # Concurrent crawler.arun tasks
+EXTRACT_CONCURRENCY = 8                   # Concurrent LLM extraction calls
+EXTRACT_QUEUE_SIZE = 32                   # Chunks buffered between fetch and extraction
+CHUNK_TOKEN_THRESHOLD = 5000              # Approx. tokens per extraction chunk
+CHARS_PER_TOKEN = 2.0                     # Conservative estimate for mixed CJK/Latin text
+PER_HOST_CONCURRENCY = 2                  # Concurrent requests to a single host
+PER_HOST_DELAY = 1.0                      # Min seconds between requests to a single host
 DEEPSEEK_API_URL = "http://40.83.55.66:8000/v1"  # Your self-hosted DeepSeek-compatible API endpoint
 DEEPSEEK_API_KEY = "123"         # If authentication is required; leave empty if not
+LLM_MODEL = "compatible"                  # Model name sent by the "openai/compatible" provider
+GRAPH_DB = "knowledge_graph.sqlite"       # Deduplicated graph merged across pages and runs (see kg_store.py)
+CACHE_DIR = ".crawl_cache"                # Persistent page/extraction cache (see crawl_cache.py)
 
 class Entity(BaseModel):
     name: str
@@ -27,44 +49,400 @@ class KnowledgeGraph(BaseModel):
     relationships: List[Relationship]
 
 
+# 🔗 URL frontier helpers
+_TRACKING_PARAMS = ("utm_", "spm", "fromModule", "fromtitle", "fromid")
+
+def normalize_url(url: str, base: str = "") -> str:
+    """Resolve against `base` and canonicalize so equivalent URLs dedup to one key."""
+    url, _ = urldefrag(urljoin(base, url.strip()))
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.startswith(_TRACKING_PARAMS)
+    ))
+    path = parts.path or "/"
+    if "/." in path:
+        # Collapse dot segments, keeping a trailing slash (directory URLs).
+        path = posixpath.normpath(path) + ("/" if path.endswith("/") else "")
+        path = path.replace("//", "/")
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def in_scope(url: str, allowed_hosts: set, allow_subdomains: bool) -> bool:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        return False
+    host = parts.netloc
+    if host in allowed_hosts:
+        return True
+    return allow_subdomains and any(host.endswith("." + h) for h in allowed_hosts)
+
+
+def extract_links(result) -> List[str]:
+    links = getattr(result, "links", None) or {}
+    hrefs = []
+    for kind in ("internal", "external"):
+        for link in links.get(kind, []):
+            href = link.get("href") if isinstance(link, dict) else link
+            if href:
+                hrefs.append(href)
+    return hrefs
+
+
+class HostLimiter:
+    """Per-host politeness: bounded concurrency plus a minimum delay between requests."""
+
+    def __init__(self, concurrency: int, delay: float):
+        self.concurrency = concurrency
+        self.delay = delay
+        self._sems = {}
+        self._locks = {}
+        self._last = {}
+
+    def _for(self, host: str):
+        if host not in self._sems:
+            self._sems[host] = asyncio.Semaphore(self.concurrency)
+            self._locks[host] = asyncio.Lock()
+            self._last[host] = 0.0
+        return self._sems[host], self._locks[host]
+
+    async def __call__(self, host: str, coro_fn):
+        sem, lock = self._for(host)
+        async with sem:
+            async with lock:
+                wait = self._last[host] + self.delay - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._last[host] = time.monotonic()
+            return await coro_fn()
+
+
+# 🧪 Offline fixture: serve a local directory of HTML files
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_directory(directory: str, port: int = 0) -> str:
+    handler = functools.partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
 # 🕸️ Crawling logic
-async def run():
+def build_llm_strategy():
+    # Chunking is done by the extraction stage (chunk_content), so every chunk
+    # becomes its own unit of work for the extractor pool.
+    return LLMExtractionStrategy(
+        llm_config = LLMConfig(provider="openai/compatible", api_token=DEEPSEEK_API_KEY, base_url=DEEPSEEK_API_URL),
+        schema=KnowledgeGraph.model_json_schema(),
+        extraction_type="schema",
+        instruction="Extract entities and relationships from the content. Return valid JSON.",
+        chunk_token_threshold=CHUNK_TOKEN_THRESHOLD,
+        overlap_rate=0.0,
+        apply_chunking=False,
+        input_format="html",   # or "html", "fit_markdown"
+        extra_args={"temperature": 0.0, "max_tokens": 8000}
+    )
+
+
+def extraction_schema_hash(llm_strategy, stream: bool = False) -> str:
+    """Everything that changes what the extractor would return for the same content."""
+    return schema_hash(
+        llm_strategy.schema, llm_strategy.instruction, llm_strategy.extraction_type,
+        llm_strategy.input_format, llm_strategy.extra_args, llm_strategy.chunk_token_threshold,
+        "stream" if stream else "batch",
+    )
+
+
+def page_content(result, input_format: str) -> str:
+    """Pick the same content crawl4ai would hand to the extraction strategy."""
+    markdown = getattr(result, "markdown", None)
+    if input_format == "html":
+        return result.html or ""
+    if input_format == "cleaned_html":
+        return result.cleaned_html or ""
+    if input_format == "fit_markdown":
+        return getattr(markdown, "fit_markdown", None) or str(markdown or "")
+    return getattr(markdown, "raw_markdown", None) or str(markdown or "")
+
+
+def chunk_content(text: str, token_threshold: int) -> List[str]:
+    """Split on line boundaries into chunks of roughly `token_threshold` tokens."""
+    max_chars = max(1, int(token_threshold * CHARS_PER_TOKEN))
+    chunks, buf, size = [], [], 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if buf:
+                chunks.append("".join(buf))
+                buf, size = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if size + len(line) > max_chars and buf:
+            chunks.append("".join(buf))
+            buf, size = [], 0
+        buf.append(line)
+        size += len(line)
+    if buf:
+        chunks.append("".join(buf))
+    return [c for c in chunks if c.strip()]
+
+
+class StageStats:
+    """Busy time and item counts for one pipeline stage."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+
+    def report(self, wall: float) -> str:
+        util = self.busy / (wall * self.workers) if wall > 0 and self.workers else 0.0
+        return f"{self.name}: items={self.items} busy={self.busy:.1f}s utilization={util:.0%}"
+
+
+async def crawl(start_url: str, *, max_depth: int, max_pages: int, fetch_concurrency: int,
+                extract_concurrency: int, extract_queue_size: int, per_host: int,
+                per_host_delay: float, allow_subdomains: bool, use_llm: bool,
+                cache: CrawlCache = None, refresh: bool = False, graph: KnowledgeGraphStore = None,
+                stream: bool = False):
+    """Breadth-first crawl from `start_url` up to `max_depth` link hops.
+
+    Two stages connected by a bounded queue: fetch workers render pages and
+    enqueue content chunks, extraction workers run the LLM on each chunk. A
+    full extraction queue blocks the fetchers (backpressure).
+
+    With a `cache`, pages the server confirms unchanged (304) are not rendered
+    again, and pages whose content hash already has an extraction for the
+    current schema skip the LLM stage entirely. Each page's extraction is
+    merged into `graph` as soon as it is complete; with `stream`, every entity
+    and relationship is merged as soon as the LLM has finished emitting it.
+    """
+    start_url = normalize_url(start_url)
+    allowed_hosts = {urlsplit(start_url).netloc}
+    llm_strategy = build_llm_strategy() if use_llm else None
+    input_format = llm_strategy.input_format if llm_strategy is not None else "html"
+    schema_key = extraction_schema_hash(llm_strategy, stream) if llm_strategy is not None else None
+    llm_client = AsyncOpenAI(base_url=DEEPSEEK_API_URL, api_key=DEEPSEEK_API_KEY or "none") if stream and use_llm else None
+    stream_stats = {"first_result_s": []}
+    models = {"entities": Entity, "relationships": Relationship}
+    # crawl4ai's own cache is bypassed; CrawlCache handles revalidation and extraction reuse.
+    crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
+
+    frontier: asyncio.Queue = asyncio.Queue()
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=extract_queue_size)
+    seen = {start_url}
+    frontier.put_nowait((start_url, 0))
+    limiter = HostLimiter(per_host, per_host_delay)
+    fetch_stats = StageStats("fetch", fetch_concurrency)
+    extract_stats = StageStats("extract", extract_concurrency if use_llm else 0)
+    pages = []
+    fetched = 0
+
     async with AsyncWebCrawler(verbose=True) as crawler:
-        
-        llm_strategy = LLMExtractionStrategy(
-            llm_config = LLMConfig(provider="openai/compatible", api_token=DEEPSEEK_API_KEY, base_url=DEEPSEEK_API_URL),
-            schema=KnowledgeGraph.model_json_schema(),
-            extraction_type="schema",
-            instruction="Extract entities and relationships from the content. Return valid JSON.",
-            chunk_token_threshold=5000,
-            overlap_rate=0.0,
-            apply_chunking=True,
-            input_format="html",   # or "html", "fit_markdown"
-            extra_args={"temperature": 0.0, "max_tokens": 8000}
-        )
-
-        crawl_config = CrawlerRunConfig(
-            extraction_strategy=llm_strategy,
-            cache_mode=CacheMode.BYPASS
-        )
-        result = await crawler.arun(
-            url=TARGET_URL,     
-            config= crawl_config
-        )
-
-        if result.success:
-            output_data = json.loads(result.extracted_content)
-
-            llm_strategy.show_usage();
-
-
-        with open("crawl_output.json", "w", encoding="utf-8") as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
-
-        print(f"✅ Crawl finished. Saved {len(output_data)} pages to crawl_output.json")
 
-# 🚀 Script entrypoint
-if __name__ == "__main__":
-    asyncio.run(run())
+        async def fetch_worker():
+            nonlocal fetched
+            while True:
+                url, depth = await frontier.get()
+                try:
+                    if fetched >= max_pages:
+                        continue
+                    fetched += 1
+                    content, links, digest = None, [], None
+                    host = urlsplit(url).netloc
+                    cached = cache.get_page(url, input_format) if cache is not None and not refresh else None
+                    if cached is not None and await limiter(
+                            host, lambda: asyncio.to_thread(cache.revalidate, url, cached)):
+                        content = cache.load_content(cached["content_hash"])
+                        links, digest = cached["links"], cached["content_hash"]
+                        cache.stats["revalidated"] += 1
+
+                    if content is None:
+                        started = time.perf_counter()
+                        result = await limiter(host, lambda: crawler.arun(url=url, config=crawl_config))
+                        fetch_stats.busy += time.perf_counter() - started
+                        fetch_stats.items += 1
+                        if not result.success:
+                            print(f"❌ {url}: {result.error_message}")
+                            continue
+                        content = page_content(result, input_format)
+                        links = extract_links(result)
+                        if cache is not None:
+                            digest = cache.put_page(url, content, input_format, links,
+                                                    getattr(result, "response_headers", None))
+                            cache.stats["refetched"] += 1
+
+                    page = {"url": url, "depth": depth, "data": []}
+                    pages.append(page)
+                    print(f"✅ fetched depth={depth} {url}")
+
+                    if depth < max_depth:
+                        for href in links:
+                            link = normalize_url(href, base=url)
+                            if link not in seen and in_scope(link, allowed_hosts, allow_subdomains):
+                                seen.add(link)
+                                frontier.put_nowait((link, depth + 1))
+
+                    if llm_strategy is not None:
+                        if digest is not None:
+                            reused = cache.get_extraction(digest, schema_key)
+                            if reused is not None:
+                                page["data"] = reused
+                                if graph is not None:
+                                    graph.ingest(reused, url)
+                                print(f"♻️ reused extraction {url}")
+                                continue
+                        parts = chunk_content(content, llm_strategy.chunk_token_threshold)
+                        page["chunks"] = len(parts)
+                        page["_results"] = [None] * len(parts)
+                        page["_pending"] = len(parts)
+                        page["_digest"] = digest
+                        page["_failed"] = False
+                        for ix, part in enumerate(parts):
+                            await chunks.put((page, ix, part))   # blocks while the LLM stage is behind
+                except Exception as e:
+                    print(f"❌ {url}: {e}")
+                finally:
+                    frontier.task_done()
+
+        async def extract_streaming(url: str, part: str, started: float) -> List[dict]:
+            block = {"entities": [], "relationships": []}
+            async for key, item in stream_knowledge_graph(
+                llm_client, model=LLM_MODEL, content=part, schema=llm_strategy.schema,
+                instruction=llm_strategy.instruction, models=models,
+                extra_args=llm_strategy.extra_args, stats=stream_stats,
+            ):
+                if not block["entities"] and not block["relationships"]:
+                    stream_stats["first_result_s"].append(time.perf_counter() - started)
+                block[key].append(item)
+                if graph is not None:
+                    graph.ingest({key: [item]}, url)
+            return [block]
+
+        async def extract_worker():
+            while True:
+                page, ix, part = await chunks.get()
+                try:
+                    started = time.perf_counter()
+                    if llm_client is not None:
+                        blocks = await extract_streaming(page["url"], part, started)
+                    else:
+                        blocks = await asyncio.to_thread(llm_strategy.extract, page["url"], ix, part)
+                    extract_stats.busy += time.perf_counter() - started
+                    extract_stats.items += 1
+                    page["_results"][ix] = blocks
+                except Exception as e:
+                    page["_failed"] = True
+                    print(f"❌ extract {page['url']}#{ix}: {e}")
+                finally:
+                    page["_pending"] -= 1
+                    if page["_pending"] == 0:
+                        merged = [b for blocks in page["_results"] for b in (blocks or [])]
+                        if graph is not None and llm_client is None:
+                            graph.ingest(merged, page["url"])
+                        if cache is not None and page["_digest"] and not page["_failed"]:
+                            cache.put_extraction(page["_digest"], schema_key, merged)
+                    chunks.task_done()
 
+        wall_start = time.perf_counter()
+        workers = [asyncio.create_task(fetch_worker()) for _ in range(fetch_concurrency)]
+        if llm_strategy is not None:
+            workers += [asyncio.create_task(extract_worker()) for _ in range(extract_concurrency)]
+        await frontier.join()
+        await chunks.join()
+        for w in workers:
+            w.cancel()
+        wall = time.perf_counter() - wall_start
 
+    for page in pages:
+        for blocks in page.pop("_results", []):
+            page["data"].extend(blocks or [])
+        for key in ("_pending", "_digest", "_failed"):
+            page.pop(key, None)
+
+    print(f"⏱️ wall={wall:.1f}s  {fetch_stats.report(wall)}  {extract_stats.report(wall)}")
+    if llm_client is not None:
+        firsts = stream_stats.pop("first_result_s")
+        avg_first = sum(firsts) / len(firsts) if firsts else 0.0
+        print(f"🌊 stream avg_time_to_first_result={avg_first:.2f}s "
+              + " ".join(f"{k}={v}" for k, v in stream_stats.items()))
+    if cache is not None:
+        print("🗄️ cache " + " ".join(f"{k}={v}" for k, v in cache.stats.items()))
+    if llm_strategy is not None and llm_client is None:
+        llm_strategy.show_usage()
+    return pages
+
+
+async def run(args):
+    start_url = args.url
+    if args.serve:
+        start_url = serve_directory(args.serve, args.serve_port) + (args.serve_index or "")
+        print(f"📂 Serving {args.serve} at {start_url}")
+
+    cache = None if args.no_cache else CrawlCache(args.cache_dir)
+    graph = None if args.no_llm else KnowledgeGraphStore(args.graph_db)
+    pages = await crawl(
+        start_url,
+        max_depth=args.max_depth,
+        max_pages=args.max_pages,
+        fetch_concurrency=args.fetch_concurrency,
+        extract_concurrency=args.extract_concurrency,
+        extract_queue_size=args.extract_queue,
+        per_host=args.per_host,
+        per_host_delay=args.per_host_delay,
+        allow_subdomains=args.allow_subdomains,
+        use_llm=not args.no_llm,
+        cache=cache,
+        refresh=args.refresh,
+        graph=graph,
+        stream=args.stream,
+    )
+    if cache is not None:
+        cache.close()
+
+    if graph is not None:
+        stats = graph.stats()
+        graph.close()
+        print(f"🧠 Graph {args.graph_db}: entities={stats['entities']} relationships={stats['relationships']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(pages, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Crawl finished. {len(pages)} pages" + (f", saved to {args.output}" if args.output else ""))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Breadth-first crawl with LLM knowledge-graph extraction")
+    p.add_argument("--url", default=TARGET_URL, help="Start URL")
+    p.add_argument("--max-depth", type=int, default=MAX_DEPTH, help="Max link hops from the start URL")
+    p.add_argument("--max-pages", type=int, default=MAX_PAGES, help="Max pages fetched")
+    p.add_argument("--fetch-concurrency", type=int, default=FETCH_CONCURRENCY, help="Concurrent crawler.arun tasks")
+    p.add_argument("--extract-concurrency", type=int, default=EXTRACT_CONCURRENCY, help="Concurrent LLM extraction calls")
+    p.add_argument("--extract-queue", type=int, default=EXTRACT_QUEUE_SIZE, help="Max chunks waiting for extraction")
+    p.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY, help="Concurrent requests per host")
+    p.add_argument("--per-host-delay", type=float, default=PER_HOST_DELAY, help="Min seconds between requests per host")
+    p.add_argument("--allow-subdomains", action="store_true", help="Also follow links to subdomains of the start host")
+    p.add_argument("--no-llm", action="store_true", help="Fetch and follow links only, skip LLM extraction")
+    p.add_argument("--stream", action="store_true", help="Stream LLM responses and emit entities/relationships as they complete")
+    p.add_argument("--serve", help="Serve this local directory over HTTP and crawl it, e.g. crawl_fixture (offline testing)")
+    p.add_argument("--serve-port", type=int, default=0, help="Port for --serve (0 = random; fix it to reuse the cache)")
+    p.add_argument("--serve-index", default="index.html", help="Start page inside --serve")
+    p.add_argument("--cache-dir", default=CACHE_DIR, help="Persistent page/extraction cache directory")
+    p.add_argument("--no-cache", action="store_true", help="Disable the persistent cache")
+    p.add_argument("--refresh", action="store_true", help="Re-render every page (extractions are still reused)")
+    p.add_argument("--graph-db", default=GRAPH_DB, help="Knowledge-graph SQLite store to merge extractions into")
+    p.add_argument("--output", help="Also dump the per-page extractions as JSON")
+    return p.parse_args()
+
+
+# 🚀 Script entrypoint
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
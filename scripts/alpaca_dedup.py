@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Near-duplicate and quality filtering for Alpaca items.
+
+qagen.py tells the model that "overlap is not a concern", so the same
+question comes back many times across (and within) documents. ItemFilter
+drops, in order:
+
+    bad_shape            not a dict with instruction/input/output
+    short_instruction    instruction shorter than --min-instruction-chars
+    short_output         output shorter than --min-output-chars
+    long_output          output longer than --max-output-chars (0 = no limit)
+    non_english          too few ASCII letters among the letters of the output
+                         (qagen asks for English only)
+    exact_duplicate      same normalized instruction as a kept item
+    near_duplicate       MinHash/LSH match on the instruction with estimated
+                         Jaccard similarity >= --threshold
+
+MinHash signatures use character 5-gram shingles of the normalized
+instruction and are computed a batch at a time (vectorized with NumPy when
+it is installed). LSH splits each signature into --bands bands; only items
+sharing a band bucket are compared, so the cost grows linearly with the
+number of items instead of quadratically. A kept item costs about
+4 * --num-perm bytes for its signature plus one dict entry per band.
+
+Usage:
+    python3 alpaca_dedup.py cleaned.json deduped.json
+    python3 alpaca_dedup.py cleaned.parquet deduped.parquet --threshold 0.7 --report report.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import unicodedata
+import zlib
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional, only speeds up signatures
+    np = None
+
+_PRIME = 4294967291          # largest prime below 2**32
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+_WS_RE = re.compile(r"\s+")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+_ASCII_LETTER_RE = re.compile(r"[A-Za-z]")
+_ALPACA_KEYS = ("instruction", "input", "output")
+
+
+def normalize_instruction(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _PUNCT_RE.sub(" ", text)
+    return _WS_RE.sub(" ", text).strip()
+
+
+def shingles(text: str, k: int = 5) -> List[int]:
+    """crc32 of the distinct character k-grams (the whole text if shorter)."""
+    if len(text) <= k:
+        return [zlib.crc32(text.encode("utf-8"))]
+    return list({zlib.crc32(text[i:i + k].encode("utf-8")) for i in range(len(text) - k + 1)})
+
+
+def ascii_letter_ratio(text: str) -> float:
+    letters = len(_LETTER_RE.findall(text))
+    if letters == 0:
+        return 1.0
+    return len(_ASCII_LETTER_RE.findall(text)) / letters
+
+
+class MinHasher:
+    """num_perm universal hashes h(x) = (a*x + b) mod p; identical with and without NumPy."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.randrange(1, 2**31) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, 2**31) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)[:, None]
+            self._b = np.array(self.b, dtype=np.uint64)[:, None]
+
+    def signatures(self, shingle_sets: List[List[int]]) -> List[bytes]:
+        """One signature (num_perm uint32, as bytes) per shingle set."""
+        if not shingle_sets:
+            return []
+        if np is None:
+            out = []
+            for sh in shingle_sets:
+                sig = array("I", (min((a * x + b) % _PRIME for x in sh) for a, b in zip(self.a, self.b)))
+                out.append(sig.tobytes())
+            return out
+        lengths = np.fromiter((len(sh) for sh in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+        flat = np.fromiter((x for sh in shingle_sets for x in sh), dtype=np.uint64, count=int(lengths.sum()))
+        hashed = (self._a * flat[None, :] + self._b) % _PRIME          # (num_perm, total shingles)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        mins = np.minimum.reduceat(hashed, starts, axis=1).astype(np.uint32)   # (num_perm, items)
+        return [mins[:, i].tobytes() for i in range(len(shingle_sets))]
+
+
+class ItemFilter:
+    def __init__(self, *, num_perm: int = 128, bands: int = 16, threshold: float = 0.8,
+                 min_instruction_chars: int = 10, min_output_chars: int = 20, max_output_chars: int = 0,
+                 min_ascii_ratio: float = 0.8, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("--num-perm must be a multiple of --bands")
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.band_bytes = 4 * num_perm // bands
+        self.threshold = threshold
+        self.min_instruction_chars = min_instruction_chars
+        self.min_output_chars = min_output_chars
+        self.max_output_chars = max_output_chars
+        self.min_ascii_ratio = min_ascii_ratio
+        self.exact: set = set()
+        self.buckets: Dict[tuple, List[int]] = {}   # (band, band hash) -> kept signature ids
+        self.signatures: List[bytes] = []
+        self.report: Counter = Counter()
+
+    # -- cheap checks -----------------------------------------------------------
+
+    def _reject(self, item) -> Optional[str]:
+        if not isinstance(item, dict) or not all(isinstance(item.get(k), str) for k in _ALPACA_KEYS):
+            return "bad_shape"
+        if len(item["instruction"].strip()) < self.min_instruction_chars:
+            return "short_instruction"
+        output = item["output"].strip()
+        if len(output) < self.min_output_chars:
+            return "short_output"
+        if self.max_output_chars and len(output) > self.max_output_chars:
+            return "long_output"
+        if self.min_ascii_ratio and ascii_letter_ratio(item["instruction"] + " " + output) < self.min_ascii_ratio:
+            return "non_english"
+        return None
+
+    # -- near duplicates --------------------------------------------------------
+
+    def _similarity(self, a: bytes, b: bytes) -> float:
+        sa = array("I", a)
+        sb = array("I", b)
+        return sum(x == y for x, y in zip(sa, sb)) / len(sa)
+
+    def _near_duplicate(self, sig: bytes) -> bool:
+        keys = [(band, hash(sig[band * self.band_bytes:(band + 1) * self.band_bytes])) for band in range(self.bands)]
+        checked = set()
+        for key in keys:
+            for other in self.buckets.get(key, ()):
+                if other in checked:
+                    continue
+                checked.add(other)
+                if self._similarity(sig, self.signatures[other]) >= self.threshold:
+                    return True
+        sig_id = len(self.signatures)
+        self.signatures.append(sig)
+        for key in keys:
+            self.buckets.setdefault(key, []).append(sig_id)
+        return False
+
+    def filter_batch(self, items: List) -> List[dict]:
+        """Kept items of one batch, in order; signatures for the batch are computed together."""
+        candidates = []
+        for item in items:
+            reason = self._reject(item)
+            if reason:
+                self.report[reason] += 1
+                continue
+            norm = normalize_instruction(item["instruction"])
+            if norm in self.exact:
+                self.report["exact_duplicate"] += 1
+                continue
+            self.exact.add(norm)
+            candidates.append((item, norm))
+
+        kept = []
+        sigs = self.hasher.signatures([shingles(norm) for _, norm in candidates])
+        for (item, _), sig in zip(candidates, sigs):
+            if self._near_duplicate(sig):
+                self.report["near_duplicate"] += 1
+                continue
+            self.report["kept"] += 1
+            kept.append(item)
+        return kept
+
+    def filter(self, items: Iterable, batch_size: int = 4096) -> Iterator[dict]:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield from self.filter_batch(batch)
+                batch = []
+        if batch:
+            yield from self.filter_batch(batch)
+
+    def summary(self) -> str:
+        total = sum(self.report.values())
+        parts = [f"input={total}"] + [f"{k}={v}" for k, v in sorted(self.report.items(), key=lambda kv: -kv[1])]
+        return " ".join(parts)
+
+
+def add_filter_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--num-perm", type=int, default=128, help="MinHash permutations")
+    p.add_argument("--bands", type=int, default=16, help="LSH bands (num-perm / bands rows each)")
+    p.add_argument("--threshold", type=float, default=0.8, help="Estimated Jaccard at or above which items are duplicates")
+    p.add_argument("--min-instruction-chars", type=int, default=10, help="Drop shorter instructions")
+    p.add_argument("--min-output-chars", type=int, default=20, help="Drop shorter outputs")
+    p.add_argument("--max-output-chars", type=int, default=0, help="Drop longer outputs (0 = no limit)")
+    p.add_argument("--min-ascii-ratio", type=float, default=0.8, help="Min ASCII share of letters (0 disables)")
+    p.add_argument("--dedup-batch", type=int, default=4096, help="Items per MinHash batch")
+    p.add_argument("--dedup-seed", type=int, default=1, help="Seed for the MinHash permutations")
+
+
+def filter_from_args(args) -> ItemFilter:
+    return ItemFilter(num_perm=args.num_perm, bands=args.bands, threshold=args.threshold,
+                      min_instruction_chars=args.min_instruction_chars, min_output_chars=args.min_output_chars,
+                      max_output_chars=args.max_output_chars, min_ascii_ratio=args.min_ascii_ratio,
+                      seed=args.dedup_seed)
+
+
+def main() -> int:
+    from clean_alpaca_json import parse_messy_file
+    from columnar import ColumnarDataset, is_columnar, write_alpaca
+
+    p = argparse.ArgumentParser(description="Drop near-duplicate and low-quality Alpaca items")
+    p.add_argument("input", type=Path, help="Alpaca JSON/JSONL/messy text, or .parquet/.arrow")
+    p.add_argument("output", type=Path, help="Output JSON array, or .parquet/.arrow")
+    p.add_argument("--report", type=Path, help="Write per-filter removal counts as JSON")
+    add_filter_args(p)
+    args = p.parse_args()
+
+    if is_columnar(args.input):
+        items = []
+        with ColumnarDataset(args.input) as ds:
+            for row in ds.iter_rows():
+                extra = row.pop("extra", None)
+                if extra:
+                    row.update(json.loads(extra))
+                items.append(row)
+    else:
+        items = parse_messy_file(args.input.read_text(encoding="utf-8", errors="replace"))
+
+    flt = filter_from_args(args)
+    kept = list(flt.filter(items, args.dedup_batch))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    if is_columnar(args.output):
+        write_alpaca(args.output, kept)
+    else:
+        args.output.write_text(json.dumps(kept, ensure_ascii=False, separators=(",", ":")) + "\n", encoding="utf-8")
+    if args.report:
+        args.report.write_text(json.dumps(dict(flt.report), indent=2) + "\n", encoding="utf-8")
+    print(flt.summary() + f" output={args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Streaming Markdown -> Alpaca JSONL pipeline.
+
+Runs the three hand-chained steps as one process:
+
+    scan      mdtotext.iter_md_files
+    prepare   read + optional _strip_markdown_basic / truncation / one-line
+              normalization, exactly as mdtotext.py does per document
+    generate  qagen.generate_alpaca (one LLM call per document)
+    clean     clean_alpaca_json.extract_json_objects + sanitize_json_text
+    write     one Alpaca item per line to --output
+
+Stages are connected by bounded queues, so at most --queue-size documents
+wait between two stages and nothing is materialized in full. Each stage has
+its own worker count (generation is I/O bound and wants many workers,
+the others need few). A progress line is printed every --progress seconds
+and a per-stage throughput table at the end.
+
+--trace writes a Chrome trace (chrome://tracing, Perfetto) with one span per
+scan step, read, strip, normalize, LLM call, JSON extraction, sanitize
+fallback and write, and prints a per-span summary; --profile N runs
+cProfile + tracemalloc on every Nth item of each stage.
+
+--schedule reads the whole file list first and sends documents in
+prompt_schedule.order_paths order (grouped by directory and first heading),
+so the server's prefix cache is reused across neighbouring requests.
+
+--dedup runs the alpaca_dedup.py filters in the (single-threaded) write
+stage, so near-duplicate questions never reach --output. Items are filtered
+DEDUP_BUFFER at a time (one vectorized MinHash batch each), and the rest
+when the pipeline drains.
+
+Usage:
+    python3 alpaca_pipeline.py --root Q:/src --output ads_alpaca.jsonl --gen-workers 16
+    python3 alpaca_pipeline.py --root docs --output out.jsonl --strip-markdown --min-chars 300 --max-chars 8000
+    python3 alpaca_pipeline.py --root docs --output out.jsonl --trace trace.json --profile 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+from alpaca_dedup import add_filter_args, filter_from_args
+from clean_alpaca_json import extract_json_objects, sanitize_json_text
+from mdtotext import _normalize_one_line, _strip_markdown_basic, iter_md_files
+from pipeline_trace import Profiler, Tracer
+from prompt_schedule import order_paths
+
+_DONE = object()
+DEDUP_BUFFER = 256    # items the write stage holds back for one --dedup MinHash batch
+
+
+class Stage:
+    """A pool of worker threads mapping items from `inq` to zero or more items on `outq`."""
+
+    def __init__(self, name: str, fn: Callable[[object], Iterable[object]], workers: int,
+                 inq: "queue.Queue", outq: Optional["queue.Queue"], profiler: Optional[Profiler] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inq = inq
+        self.outq = outq
+        self.profiler = profiler or Profiler()
+        self.lock = threading.Lock()
+        self.running = self.workers
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.started = 0.0
+        self.finished = 0.0
+        self.threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def _work(self) -> None:
+        while True:
+            item = self.inq.get()
+            if item is _DONE:
+                self.inq.put(_DONE)   # let sibling workers see it too
+                break
+            start = time.perf_counter()
+            produced = 0
+            try:
+                with self.profiler.sample(self.name):
+                    for out in self.fn(item):
+                        if self.outq is not None:
+                            self.outq.put(out)
+                        produced += 1
+            except Exception as e:  # noqa: BLE001
+                with self.lock:
+                    self.errors += 1
+                print(f"ERROR in {self.name} ({item if isinstance(item, Path) else type(item).__name__}): {e}",
+                      file=sys.stderr)
+            with self.lock:
+                self.items_in += 1
+                self.items_out += produced
+                self.busy_s += time.perf_counter() - start
+
+        with self.lock:
+            self.running -= 1
+            last = self.running == 0
+        if last:
+            self.finished = time.perf_counter()
+            if self.outq is not None:
+                self.outq.put(_DONE)
+
+    def join(self) -> None:
+        for t in self.threads:
+            t.join()
+
+    def summary(self) -> str:
+        wall = (self.finished or time.perf_counter()) - self.started
+        rate = self.items_in / wall if wall > 0 else 0.0
+        util = self.busy_s / (wall * self.workers) if wall > 0 else 0.0
+        return (f"{self.name:<10}{self.workers:>8}{self.items_in:>10}{self.items_out:>10}{self.errors:>8}"
+                f"{wall:>10.1f}{rate:>10.2f}{util:>8.0%}")
+
+
+def prepare_fn(args, tracer: Tracer) -> Callable[[Path], Iterable[tuple]]:
+    def prepare(md_path: Path):
+        with tracer.span("read", path=str(md_path)):
+            raw = md_path.read_text(encoding="utf-8", errors="ignore")
+        tracer.count("chars_read", len(raw))
+        if args.strip_markdown:
+            with tracer.span("strip_markdown"):
+                raw = _strip_markdown_basic(raw, drop_code_blocks=args.drop_code_blocks)
+        if args.max_chars and args.max_chars > 0:
+            raw = raw[: args.max_chars]
+        with tracer.span("normalize"):
+            line = _normalize_one_line(raw)
+        if not line or (args.min_chars and len(line) < args.min_chars):
+            tracer.count("docs_skipped")
+            return
+        yield md_path, line
+    return prepare
+
+
+def generate_fn(generate: Callable[[str], str], tracer: Tracer) -> Callable[[tuple], Iterable[tuple]]:
+    def run(doc):
+        md_path, text = doc
+        with tracer.span("generate_alpaca", path=str(md_path), chars=len(text)):
+            response = generate(text) or ""
+        tracer.count("response_chars", len(response))
+        yield md_path, response
+    return run
+
+
+def clean_fn(tracer: Tracer) -> Callable[[tuple], Iterable[dict]]:
+    def clean_response(doc):
+        """Alpaca items from one LLM response (the per-object path of parse_messy_file)."""
+        md_path, response = doc
+        with tracer.span("extract_json_objects"):
+            objects = extract_json_objects(response)
+        for obj in objects:
+            try:
+                item = json.loads(obj)
+            except Exception:
+                tracer.count("sanitize_fallbacks")
+                with tracer.span("sanitize_json_text"):
+                    obj = sanitize_json_text(obj)
+                try:
+                    item = json.loads(obj)
+                except Exception:
+                    item = None
+            if isinstance(item, dict) and all(k in item for k in ("instruction", "input", "output")):
+                yield item
+            else:
+                tracer.count("objects_rejected")
+    return clean_response
+
+
+def run_pipeline(args, generate: Callable[[str], str], tracer: Optional[Tracer] = None,
+                 profiler: Optional[Profiler] = None) -> int:
+    tracer = tracer or Tracer()
+    if not args.root.exists():
+        print(f"Root path does not exist: {args.root}", file=sys.stderr)
+        return 1
+    qsize = max(1, args.queue_size)
+    paths_q: "queue.Queue" = queue.Queue(qsize)
+    docs_q: "queue.Queue" = queue.Queue(qsize)
+    resp_q: "queue.Queue" = queue.Queue(qsize)
+    items_q: "queue.Queue" = queue.Queue(qsize * 8)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    out_f = args.output.open("a" if args.append else "w", encoding="utf-8")
+
+    flt = filter_from_args(args) if getattr(args, "dedup", False) else None
+
+    held: list = []
+
+    def write_items(items) -> None:
+        with tracer.span("write"):
+            for item in items:
+                out_f.write(json.dumps(item, ensure_ascii=args.ensure_ascii) + "\n")
+
+    def flush_held() -> None:
+        with tracer.span("dedup", items=len(held)):
+            kept = flt.filter_batch(held)
+        held.clear()
+        write_items(kept)
+
+    def write(item):
+        if flt is None:
+            write_items((item,))
+        else:
+            held.append(item)
+            if len(held) >= DEDUP_BUFFER:
+                flush_held()
+        return ()
+
+    stages = [
+        Stage("prepare", prepare_fn(args, tracer), args.read_workers, paths_q, docs_q, profiler),
+        Stage("generate", generate_fn(generate, tracer), args.gen_workers, docs_q, resp_q, profiler),
+        Stage("clean", clean_fn(tracer), args.clean_workers, resp_q, items_q, profiler),
+        Stage("write", write, 1, items_q, None, profiler),
+    ]
+
+    scanned = 0
+
+    def scan():
+        nonlocal scanned
+        try:
+            md_paths = tracer.iter("iter_md_files", iter_md_files(args.root, follow_symlinks=args.follow_symlinks))
+            if getattr(args, "schedule", False):
+                with tracer.span("order_paths"):
+                    md_paths = order_paths(md_paths, args.root, lead=args.gen_workers)
+            for md_path in md_paths:
+                paths_q.put(md_path)
+                scanned += 1
+                if args.limit and scanned >= args.limit:
+                    break
+        finally:
+            paths_q.put(_DONE)
+
+    start = time.perf_counter()
+    for stage in stages:
+        stage.start()
+    scanner = threading.Thread(target=scan, name="scan", daemon=True)
+    scanner.start()
+
+    try:
+        while stages[-1].threads[0].is_alive():
+            stages[-1].threads[0].join(args.progress)
+            if stages[-1].threads[0].is_alive():
+                print(f"scanned={scanned} " + " ".join(f"{s.name}={s.items_in}" for s in stages)
+                      + " queues="
+                      + "/".join(str(q.qsize()) for q in (paths_q, docs_q, resp_q, items_q)))
+        if held:
+            flush_held()   # the write stage has seen _DONE; nothing else touches `held`
+    finally:
+        out_f.close()
+    for stage in stages:
+        stage.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{'stage':<10}{'workers':>8}{'in':>10}{'out':>10}{'errors':>8}{'wall_s':>10}{'in/s':>10}{'busy':>8}")
+    for stage in stages:
+        print(stage.summary())
+    if flt is not None:
+        print(f"filters: {flt.summary()}")
+    print(f"Done. documents={scanned} items={stages[-1].items_in} elapsed_s={elapsed:.1f} output={args.output}")
+    return 0 if not any(s.errors for s in stages) else 2
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Markdown -> LLM Q&A -> clean Alpaca JSONL in one streaming pass")
+    ap.add_argument("--root", type=Path, required=True, help="Root directory to scan for *.md")
+    ap.add_argument("--output", type=Path, required=True, help="Output JSONL (one Alpaca item per line)")
+    ap.add_argument("--append", action="store_true", help="Append to --output instead of overwriting")
+    ap.add_argument("--read-workers", type=int, default=2, help="Threads reading/cleaning Markdown")
+    ap.add_argument("--gen-workers", type=int, default=8, help="Concurrent generate_alpaca calls")
+    ap.add_argument("--clean-workers", type=int, default=1, help="Threads parsing LLM responses")
+    ap.add_argument("--queue-size", type=int, default=16, help="Max documents buffered between stages")
+    ap.add_argument("--limit", type=int, default=0, help="Stop after N Markdown files (0 = all)")
+    ap.add_argument("--max-chars", type=int, default=0, help="Truncate each document to N chars (0 = no truncation)")
+    ap.add_argument("--min-chars", type=int, default=0, help="Skip documents shorter than N chars after processing")
+    ap.add_argument("--strip-markdown", action="store_true", help="Apply basic markdown cleanup")
+    ap.add_argument("--drop-code-blocks", action="store_true", help="When stripping markdown, remove fenced code blocks")
+    ap.add_argument("--follow-symlinks", action="store_true", help="Include symlinked markdown files")
+    ap.add_argument("--ensure-ascii", action="store_true", help="Escape non-ASCII characters")
+    ap.add_argument("--schedule", action="store_true",
+                    help="Group documents for prefix-cache reuse (lists all files before starting)")
+    ap.add_argument("--dedup", action="store_true", help="Drop near-duplicate/low-quality items (alpaca_dedup.py)")
+    add_filter_args(ap)
+    ap.add_argument("--progress", type=float, default=10.0, help="Seconds between progress lines")
+    ap.add_argument("--trace", type=Path, help="Write a Chrome trace JSON and print a per-span summary")
+    ap.add_argument("--trace-summary", type=Path, help="Also write the per-span summary as JSON")
+    ap.add_argument("--profile", type=int, default=0, metavar="N",
+                    help="cProfile + tracemalloc every Nth item of each stage (0 = off)")
+    ap.add_argument("--profile-out", type=Path, help="Write merged cProfile stats here (for snakeviz/pstats)")
+    args = ap.parse_args()
+
+    from qagen import generate_alpaca   # needs openai; imported late so --help works without it
+
+    tracer = Tracer(enabled=bool(args.trace or args.trace_summary))
+    profiler = Profiler(every=args.profile)
+    rc = run_pipeline(args, generate_alpaca, tracer, profiler)
+    if tracer.enabled:
+        print(tracer.summary())
+        if args.trace:
+            tracer.write_chrome_trace(args.trace)
+            print(f"trace={args.trace}")
+        if args.trace_summary:
+            tracer.write_summary_json(args.trace_summary)
+    if args.profile:
+        print(profiler.report(out=args.profile_out))
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
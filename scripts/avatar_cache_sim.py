@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+avatar_cache_sim.py
+-------------------
+Replay emotion-thumbnails/{avatarId} access traces through candidate cache
+policies to size a cache in front of the avatar service.
+
+1. Build a trace: Zipf-distributed synthetic requests, or avatar ids pulled
+   from API access logs (--trace-log).
+2. Cost each avatar with a real mongo_query (thumbnail mode) so misses are
+   charged the measured Mongo latency and responses their real size.
+   --no-mongo falls back to --miss-ms / --entry-kb for offline runs.
+3. Replay the trace through LRU / LFU / TinyLFU / TTL at each size budget.
+4. Print hit rate, byte hit rate and the Mongo queries / time saved.
+
+Usage:
+    python3 avatar_cache_sim.py                                   # Zipf trace over the DB originals
+    python3 avatar_cache_sim.py --budgets 1MB,8MB,64MB --zipf 1.1
+    python3 avatar_cache_sim.py --trace-log api.log --policies lru,tinylfu
+    python3 avatar_cache_sim.py --no-mongo --keys 100000 --requests 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import hashlib
+import itertools
+import random
+import re
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from pymongo import DESCENDING, MongoClient
+
+from mongo_bench_all import load_settings, mongo_query
+
+_LOG_ID_RE = re.compile(r"/api/avatar/emotion-thumbnails/([0-9a-fA-F]{24})")
+_LOG_TS_RE = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?")
+_SIZE_RE = re.compile(r"^\s*([\d.]+)\s*([KMG]?B?)\s*$", re.IGNORECASE)
+
+
+# ---------------------------------------------------------------------------
+# Cache policies
+# ---------------------------------------------------------------------------
+
+class LRUCache:
+    """Byte-budgeted LRU."""
+
+    name = "lru"
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.used = 0
+        self.entries: OrderedDict[str, int] = OrderedDict()
+
+    def get(self, key: str, now: float) -> bool:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return True
+        return False
+
+    def put(self, key: str, size: int, now: float) -> None:
+        if size > self.budget:
+            return
+        while self.used + size > self.budget:
+            self._evict()
+        self.entries[key] = size
+        self.used += size
+
+    def _evict(self) -> None:
+        _, size = self.entries.popitem(last=False)
+        self.used -= size
+
+
+class TTLCache(LRUCache):
+    """LRU whose entries also expire `ttl` seconds after insertion."""
+
+    name = "ttl"
+
+    def __init__(self, budget: int, ttl: float):
+        super().__init__(budget)
+        self.ttl = ttl
+        self.expires: dict[str, float] = {}
+
+    def get(self, key: str, now: float) -> bool:
+        if key in self.entries and self.expires[key] <= now:
+            self.used -= self.entries.pop(key)
+            del self.expires[key]
+            return False
+        return super().get(key, now)
+
+    def put(self, key: str, size: int, now: float) -> None:
+        super().put(key, size, now)
+        if key in self.entries:
+            self.expires[key] = now + self.ttl
+
+    def _evict(self) -> None:
+        key, size = self.entries.popitem(last=False)
+        self.expires.pop(key, None)
+        self.used -= size
+
+
+class LFUCache:
+    """Byte-budgeted LFU with O(1) frequency buckets (LRU within a bucket)."""
+
+    name = "lfu"
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.used = 0
+        self.sizes: dict[str, int] = {}
+        self.freq: dict[str, int] = {}
+        self.buckets: defaultdict[int, OrderedDict[str, None]] = defaultdict(OrderedDict)
+        self.min_freq = 0
+
+    def _touch(self, key: str) -> None:
+        f = self.freq[key]
+        bucket = self.buckets[f]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[f]
+            if self.min_freq == f:
+                self.min_freq = f + 1
+        self.freq[key] = f + 1
+        self.buckets[f + 1][key] = None
+
+    def get(self, key: str, now: float) -> bool:
+        if key in self.sizes:
+            self._touch(key)
+            return True
+        return False
+
+    def put(self, key: str, size: int, now: float) -> None:
+        if size > self.budget:
+            return
+        while self.used + size > self.budget:
+            bucket = self.buckets[self.min_freq]
+            victim, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self.buckets[self.min_freq]
+                self.min_freq = min(self.buckets, default=0)
+            self.used -= self.sizes.pop(victim)
+            del self.freq[victim]
+        self.sizes[key] = size
+        self.freq[key] = 1
+        self.buckets[1][key] = None
+        self.min_freq = 1
+        self.used += size
+
+
+class CountMinSketch:
+    """4-row count-min sketch with periodic halving (the TinyLFU 'reset')."""
+
+    def __init__(self, width: int, sample_size: int):
+        self.width = max(64, width)
+        self.rows = [[0] * self.width for _ in range(4)]
+        self.sample_size = sample_size
+        self.additions = 0
+
+    def _indexes(self, key: str):
+        # One 16-byte blake2b digest, 4 bytes per row: stable across processes, unlike the salted hash().
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        return ((r, int.from_bytes(digest[4 * r:4 * r + 4], "little") % self.width) for r in range(4))
+
+    def add(self, key: str) -> None:
+        for r, i in self._indexes(key):
+            self.rows[r][i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [[c >> 1 for c in row] for row in self.rows]
+            self.additions //= 2
+
+    def estimate(self, key: str) -> int:
+        return min(self.rows[r][i] for r, i in self._indexes(key))
+
+
+class TinyLFUCache(LRUCache):
+    """LRU main cache behind a TinyLFU admission filter.
+
+    A new entry is only admitted if its sketch frequency beats the LRU victim's.
+    """
+
+    name = "tinylfu"
+
+    def __init__(self, budget: int, expected_entries: int):
+        super().__init__(budget)
+        self.sketch = CountMinSketch(width=expected_entries * 4, sample_size=expected_entries * 10)
+
+    def get(self, key: str, now: float) -> bool:
+        self.sketch.add(key)
+        return super().get(key, now)
+
+    def put(self, key: str, size: int, now: float) -> None:
+        if size > self.budget:
+            return
+        if self.used + size > self.budget and self.entries:
+            victim = next(iter(self.entries))
+            if self.sketch.estimate(key) <= self.sketch.estimate(victim):
+                return
+        super().put(key, size, now)
+
+
+def make_cache(policy: str, budget: int, args, expected_entries: int):
+    if policy == "lru":
+        return LRUCache(budget)
+    if policy == "lfu":
+        return LFUCache(budget)
+    if policy == "tinylfu":
+        return TinyLFUCache(budget, expected_entries)
+    if policy == "ttl":
+        return TTLCache(budget, args.ttl)
+    raise ValueError(f"Unknown policy: {policy}")
+
+
+# ---------------------------------------------------------------------------
+# Traces
+# ---------------------------------------------------------------------------
+
+def zipf_trace(keys: list[str], n: int, s: float, rps: float, seed: int) -> list[tuple[float, str]]:
+    """`n` requests over `keys` with Zipf(s) popularity and Poisson arrivals at `rps`."""
+    rng = random.Random(seed)
+    ranked = keys[:]
+    rng.shuffle(ranked)
+    cum = list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, len(ranked) + 1)))
+    total = cum[-1]
+
+    trace = []
+    now = 0.0
+    for _ in range(n):
+        now += rng.expovariate(rps)
+        trace.append((now, ranked[bisect.bisect_left(cum, rng.random() * total)]))
+    return trace
+
+
+def log_trace(path: Path, rps: float) -> list[tuple[float, str]]:
+    """Avatar ids from API log lines; timestamps are used when present."""
+    trace = []
+    first_ts = None
+    with path.open("r", encoding="utf-8", errors="replace") as fh:
+        for line in fh:
+            m = _LOG_ID_RE.search(line)
+            if not m:
+                continue
+            now = len(trace) / rps
+            ts_match = _LOG_TS_RE.search(line)
+            if ts_match:
+                try:
+                    ts = datetime.fromisoformat(ts_match.group(0).replace(" ", "T")).timestamp()
+                    first_ts = ts if first_ts is None else first_ts
+                    now = ts - first_ts
+                except ValueError:
+                    pass
+            trace.append((now, m.group(1)))
+    return trace
+
+
+def parse_size(text: str) -> int:
+    m = _SIZE_RE.match(text)
+    if not m:
+        raise ValueError(f"Bad size: {text!r}")
+    unit = m.group(2).upper().rstrip("B")
+    return int(float(m.group(1)) * {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[unit])
+
+
+# ---------------------------------------------------------------------------
+# Costing
+# ---------------------------------------------------------------------------
+
+def cost_keys(collection, keys: list[str], repeats: int) -> dict[str, tuple[float, int]]:
+    """Median mongo_query latency and thumbnail bytes per avatar id."""
+    costs = {}
+    for i, avatar_id in enumerate(keys, start=1):
+        runs = [mongo_query(collection, avatar_id, include_full=False) for _ in range(repeats)]
+        runs.sort(key=lambda r: r["elapsed_ms"])
+        mid = runs[len(runs) // 2]
+        costs[avatar_id] = (mid["elapsed_ms"], max(mid["thumb_bytes"], 256))
+        if i % 100 == 0:
+            print(f"  costed {i}/{len(keys)}")
+    return costs
+
+
+# ---------------------------------------------------------------------------
+# Simulation
+# ---------------------------------------------------------------------------
+
+def simulate(cache, trace: list[tuple[float, str]], costs: dict[str, tuple[float, int]]) -> dict:
+    hits = 0
+    hit_bytes = 0
+    total_bytes = 0
+    saved_ms = 0.0
+    total_ms = 0.0
+    for now, key in trace:
+        ms, size = costs[key]
+        total_bytes += size
+        total_ms += ms
+        if cache.get(key, now):
+            hits += 1
+            hit_bytes += size
+            saved_ms += ms
+        else:
+            cache.put(key, size, now)
+
+    n = len(trace)
+    duration = max(trace[-1][0] - trace[0][0], 1e-9) if trace else 1.0
+    return {
+        "policy": cache.name,
+        "budget_mb": round(cache.budget / 1024 ** 2, 2),
+        "hit_rate": round(hits / n, 4) if n else 0.0,
+        "byte_hit_rate": round(hit_bytes / total_bytes, 4) if total_bytes else 0.0,
+        "mongo_queries_saved": hits,
+        "mongo_qps_saved": round(hits / duration, 1),
+        "mongo_ms_saved": round(saved_ms, 1),
+        "mongo_load_saved": round(saved_ms / total_ms, 4) if total_ms else 0.0,
+    }
+
+
+def print_table(rows: list[dict]) -> None:
+    cols = [("policy", 8), ("budget_mb", 10), ("hit_rate", 9), ("byte_hit_rate", 14),
+            ("mongo_qps_saved", 16), ("mongo_ms_saved", 15), ("mongo_load_saved", 16)]
+    print("\n" + "=" * 100)
+    print("  ".join(name.ljust(w) for name, w in cols))
+    print("-" * 100)
+    for row in rows:
+        print("  ".join(str(row[name]).ljust(w) for name, w in cols))
+    print("=" * 100 + "\n")
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Simulate caches in front of emotion-thumbnails lookups")
+    parser.add_argument("--trace-log", type=Path, help="API log to extract emotion-thumbnails requests from")
+    parser.add_argument("--requests", type=int, default=200_000, help="Synthetic trace length")
+    parser.add_argument("--keys", type=int, default=0, help="Synthetic key count (default: DB originals); costed with --miss-ms/--entry-kb")
+    parser.add_argument("--zipf", type=float, default=0.9, help="Zipf exponent for synthetic traces")
+    parser.add_argument("--rps", type=float, default=50.0, help="Synthetic request rate (req/s)")
+    parser.add_argument("--policies", default="lru,lfu,tinylfu,ttl", help="Comma-separated cache policies")
+    parser.add_argument("--budgets", default="256KB,1MB,4MB,16MB,64MB", help="Comma-separated cache size budgets")
+    parser.add_argument("--ttl", type=float, default=300.0, help="TTL policy expiry in seconds")
+    parser.add_argument("--repeats", type=int, default=3, help="mongo_query runs per avatar for costing")
+    parser.add_argument("--no-mongo", action="store_true", help="Use --miss-ms/--entry-kb instead of Mongo timings")
+    parser.add_argument("--miss-ms", type=float, default=20.0, help="Miss cost when --no-mongo")
+    parser.add_argument("--entry-kb", type=float, default=100.0, help="Entry size when --no-mongo")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed for synthetic traces")
+    parser.add_argument("--mongo-uri", help="Override MongoDB connection string from appsettings.json")
+    parser.add_argument("--db", help="Override MongoDB database name from appsettings.json")
+    args = parser.parse_args()
+
+    collection = None
+    if not args.no_mongo:
+        mongo_cfg = load_settings()["MongoDB"]
+        client = MongoClient(args.mongo_uri or mongo_cfg["ConnectionString"])
+        collection = client[args.db or mongo_cfg["DatabaseName"]]["avatarImages"]
+
+    print("=== Step 1: Building trace ===")
+    synthetic = False
+    if args.trace_log:
+        trace = log_trace(args.trace_log, args.rps)
+    else:
+        synthetic = bool(args.keys) or collection is None
+        if synthetic:
+            keys = [f"{i:024x}" for i in range(args.keys or 10_000)]
+        else:
+            originals = collection.find(
+                {"imageType": "original", "emotion": None, "sourceAvatarId": None}, {"_id": 1}
+            ).sort("createdAt", DESCENDING)
+            keys = [str(doc["_id"]) for doc in originals]
+        if not keys:
+            print("No avatar ids to build a trace from.")
+            return 1
+        trace = zipf_trace(keys, args.requests, args.zipf, args.rps, args.seed)
+    if not trace:
+        print("Trace is empty.")
+        return 1
+    unique = sorted({key for _, key in trace})
+    print(f"  requests={len(trace)} uniqueAvatars={len(unique)}\n")
+
+    print("=== Step 2: Costing misses ===")
+    if collection is None or synthetic:
+        # Synthetic ids do not exist in Mongo; querying them would only time empty lookups.
+        costs = {key: (args.miss_ms, int(args.entry_kb * 1024)) for key in unique}
+        print(f"  Fixed cost: {args.miss_ms}ms / {args.entry_kb}KB per miss\n")
+    else:
+        costs = cost_keys(collection, unique, args.repeats)
+        working_set = sum(size for _, size in costs.values())
+        avg_ms = sum(ms for ms, _ in costs.values()) / len(costs)
+        print(f"  avgMissMs={avg_ms:.1f} workingSetMB={working_set / 1024 ** 2:.1f}\n")
+
+    print("=== Step 3: Simulating ===")
+    policies = [p.strip() for p in args.policies.split(",") if p.strip()]
+    budgets = [parse_size(b) for b in args.budgets.split(",") if b.strip()]
+    rows = []
+    for budget in budgets:
+        for policy in policies:
+            rows.append(simulate(make_cache(policy, budget, args, len(unique)), trace, costs))
+            print(f"  {policy:<8} {budget / 1024 ** 2:>8.2f}MB  hit={rows[-1]['hit_rate']}")
+    print_table(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
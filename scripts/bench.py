@@ -9,3 +9,7 @@ python3 -m sglang.bench_serving \
     --random-output 800 \
     --max-concurrency "${concurrency}"
 done
+
+# Prefix-cache reuse of the qagen.py prompts (rglob order vs prompt_schedule.py order);
+# start the server with --enable-cache-report to get cached-token counts.
+# python3 prompt_schedule.py --root Q:/src --bench --limit 200 --concurrency 16 --flush-cache
@@ -9,7 +9,12 @@ Strategy:
 - Try to load as JSON (optionally after sanitizing escapes/control chars).
 - If that fails, extract brace-balanced JSON objects and parse each individually.
 
-Writes a valid JSON array to the output path.
+Writes a valid JSON array to the output path, or, when the output ends in
+.parquet / .arrow, a columnar file with instruction/input/output columns
+(see columnar.py).
+
+--dedup additionally drops near-duplicate instructions and short/non-English
+items (see alpaca_dedup.py) and prints how many each filter removed.
 """
 
 from __future__ import annotations
@@ -20,6 +25,9 @@ import re
 from pathlib import Path
 from typing import Any, Iterable, List, Optional
 
+from alpaca_dedup import add_filter_args, filter_from_args
+from columnar import is_columnar, write_alpaca
+
 
 _CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
 
@@ -196,16 +204,31 @@ def parse_messy_file(text: str) -> List[dict]:
 def main() -> int:
     p = argparse.ArgumentParser(description="Clean/repair Alpaca JSON into a valid JSON array")
     p.add_argument("input", type=Path, help="Input file (messy JSON/JSONL/concatenated objects)")
-    p.add_argument("output", type=Path, help="Output file (valid JSON array)")
+    p.add_argument("output", type=Path, help="Output file (valid JSON array, or .parquet/.arrow)")
     p.add_argument("--ensure-ascii", action="store_true", help="Escape non-ASCII characters")
     p.add_argument("--indent", type=int, default=0, help="Pretty-print indent (0 for compact)")
+    p.add_argument("--row-group-size", type=int, default=10_000, help="Rows per Parquet row group / Arrow batch")
+    p.add_argument("--dedup", action="store_true", help="Apply the alpaca_dedup.py filters")
+    add_filter_args(p)
     args = p.parse_args()
 
     text = args.input.read_text(encoding="utf-8", errors="replace")
     items = parse_messy_file(text)
+    counts = f"parsed_items={len(items)}"
+    if args.dedup:
+        flt = filter_from_args(args)
+        items = list(flt.filter(items, args.dedup_batch))
+        print(f"filters: {flt.summary()}")
+        counts += f" kept_items={len(items)}"
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
 
+    if is_columnar(args.output):
+        writer = write_alpaca(args.output, items, args.row_group_size)
+        print(f"{counts} alpaca_items={writer.alpaca_items} "
+              f"row_groups={writer.groups} output={args.output}")
+        return 0
+
     if args.indent and args.indent > 0:
         json_text = json.dumps(items, ensure_ascii=args.ensure_ascii, indent=args.indent)
     else:
@@ -218,7 +241,7 @@ def main() -> int:
         if isinstance(it, dict) and all(k in it for k in ("instruction", "input", "output")):
             alpaca_like += 1
 
-    print(f"parsed_items={len(items)} alpaca_items={alpaca_like} output={args.output}")
+    print(f"{counts} alpaca_items={alpaca_like} output={args.output}")
     return 0
 
 
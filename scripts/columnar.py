@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Columnar (Parquet / Arrow IPC) output and random-access reader for the dataset scripts.
+
+clean_alpaca_json.py writes instruction/input/output (+ `extra`, a JSON
+string with any other keys, so nothing is lost) and mdtotext.py writes
+text/path. The format follows the file suffix: .parquet, or .arrow /
+.feather / .ipc for the Arrow IPC file format.
+
+Rows are buffered and written --row-group-size at a time (one Parquet row
+group or one IPC record batch each), so readers can fetch a single group.
+Row counts, including `alpaca_items` (rows where instruction, input and
+output are all present), go into the Parquet footer metadata, or a
+<file>.meta.json sidecar for Arrow IPC (whose schema is written first).
+
+ColumnarDataset reads through a memory map: Arrow IPC batches are zero-copy
+views, Parquet is read one row group and only the requested columns at a
+time. len(), count() and the metadata come from the footer without touching
+row data. Arrow IPC files are written uncompressed so that mapping them
+really is zero-copy; Parquet uses zstd.
+
+Usage:
+    python3 columnar.py data.parquet                    # rows, groups, metadata counts
+    python3 columnar.py data.parquet --count alpaca_items
+    python3 columnar.py data.arrow --take 0 17 123456 --columns instruction
+    python3 columnar.py data.parquet --sample 5 --seed 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for columnar output
+    pa = ipc = pq = None
+
+ALPACA_COLUMNS = ("instruction", "input", "output", "extra")
+TEXT_COLUMNS = ("text", "path")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+COLUMNAR_SUFFIXES = (".parquet",) + ARROW_SUFFIXES
+_ALPACA_KEYS = ("instruction", "input", "output")
+
+
+def is_columnar(path: Path) -> bool:
+    return Path(path).suffix.lower() in COLUMNAR_SUFFIXES
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise SystemExit("pyarrow is required for .parquet/.arrow output (pip install pyarrow)")
+
+
+def _as_text(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def alpaca_row(item: dict) -> dict:
+    """instruction/input/output columns plus the remaining keys as JSON in `extra`.
+
+    Keys missing from the item stay missing from the row (they are written as
+    nulls either way), so ColumnarWriter counts alpaca_items by key presence,
+    like the JSON output of clean_alpaca_json.py.
+    """
+    extra = {k: v for k, v in item.items() if k not in _ALPACA_KEYS}
+    row = {k: _as_text(item[k]) for k in _ALPACA_KEYS if k in item}
+    row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+    return row
+
+
+class ColumnarWriter:
+    def __init__(self, path: Path, columns: Sequence[str], *, row_group_size: int = 10_000,
+                 compression: str = "zstd"):
+        _require_pyarrow()
+        self.path = Path(path)
+        self.columns = tuple(columns)
+        self.row_group_size = max(1, row_group_size)
+        self.compression = compression
+        self.schema = pa.schema([(c, pa.string()) for c in self.columns])
+        self.buffer: Dict[str, list] = {c: [] for c in self.columns}
+        self.rows = 0
+        self.alpaca_items = 0
+        self.groups = 0
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self._sink = None
+        self._writer = None
+
+    def write(self, row: dict) -> None:
+        for c in self.columns:
+            self.buffer[c].append(row.get(c))
+        self.rows += 1
+        if all(k in row for k in _ALPACA_KEYS):
+            self.alpaca_items += 1
+        if len(self.buffer[self.columns[0]]) >= self.row_group_size:
+            self._flush()
+
+    def write_many(self, rows: Iterable[dict]) -> None:
+        for row in rows:
+            self.write(row)
+
+    def _flush(self) -> None:
+        if not self.buffer[self.columns[0]]:
+            return
+        batch = pa.record_batch([pa.array(self.buffer[c], type=pa.string()) for c in self.columns],
+                                schema=self.schema)
+        if self._writer is None:
+            self._open()
+        if isinstance(self._writer, pq.ParquetWriter):
+            self._writer.write_batch(batch, row_group_size=self.row_group_size)
+        else:
+            self._writer.write_batch(batch)
+        self.groups += 1
+        self.buffer = {c: [] for c in self.columns}
+
+    def _open(self) -> None:
+        if self.path.suffix.lower() == ".parquet":
+            self._writer = pq.ParquetWriter(self.tmp, self.schema, compression=self.compression)
+        else:
+            # Uncompressed, so memory-mapped batches are zero-copy.
+            self._sink = pa.OSFile(str(self.tmp), "wb")
+            self._writer = ipc.new_file(self._sink, self.schema)
+
+    def close(self) -> None:
+        self._flush()
+        if self._writer is None:
+            self._open()
+        metadata = {"rows": str(self.rows)}
+        if all(k in self.columns for k in _ALPACA_KEYS):
+            metadata["alpaca_items"] = str(self.alpaca_items)
+        if isinstance(self._writer, pq.ParquetWriter):
+            self._writer.add_key_value_metadata(metadata)
+            self._writer.close()
+        else:
+            self._writer.close()
+            self._sink.close()
+            # IPC schema metadata is written up front, before the counts are known.
+            self.path.with_name(self.path.name + ".meta.json").write_text(json.dumps(metadata) + "\n",
+                                                                          encoding="utf-8")
+        self.tmp.replace(self.path)
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        if self._writer is not None:
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+def write_alpaca(path: Path, items: Iterable[dict], row_group_size: int = 10_000) -> ColumnarWriter:
+    with ColumnarWriter(path, ALPACA_COLUMNS, row_group_size=row_group_size) as writer:
+        writer.write_many(alpaca_row(it) for it in items if isinstance(it, dict))
+    return writer
+
+
+class ColumnarDataset:
+    """Memory-mapped random access to a file written by ColumnarWriter (or any flat Parquet/IPC file)."""
+
+    def __init__(self, path: Path):
+        _require_pyarrow()
+        self.path = Path(path)
+        self.arrow = self.path.suffix.lower() in ARROW_SUFFIXES
+        if self.arrow:
+            self._source = pa.memory_map(str(self.path), "r")
+            self._reader = ipc.open_file(self._source)
+            self.schema = self._reader.schema
+            sizes = [self._reader.get_batch(i).num_rows for i in range(self._reader.num_record_batches)]
+            sidecar = self.path.with_name(self.path.name + ".meta.json")
+            self.metadata = json.loads(sidecar.read_text(encoding="utf-8")) if sidecar.exists() else {}
+        else:
+            self._reader = pq.ParquetFile(self.path, memory_map=True)
+            self.schema = self._reader.schema_arrow
+            meta = self._reader.metadata
+            sizes = [meta.row_group(i).num_rows for i in range(meta.num_row_groups)]
+            self.metadata = {k.decode(): v.decode() for k, v in (meta.metadata or {}).items()
+                             if not k.startswith(b"ARROW:")}
+        self.group_starts = [0]
+        for n in sizes:
+            self.group_starts.append(self.group_starts[-1] + n)
+        self.columns = list(self.schema.names)
+
+    def __len__(self) -> int:
+        return self.group_starts[-1]
+
+    @property
+    def num_groups(self) -> int:
+        return len(self.group_starts) - 1
+
+    def group(self, g: int, columns: Optional[Sequence[str]] = None):
+        """One row group / record batch as a pyarrow Table, projected to `columns`."""
+        if self.arrow:
+            batch = self._reader.get_batch(g)
+            if columns:
+                batch = batch.select(list(columns))
+            return pa.Table.from_batches([batch])
+        return self._reader.read_row_group(g, columns=list(columns) if columns else None)
+
+    def take(self, indices: Iterable[int], columns: Optional[Sequence[str]] = None) -> List[dict]:
+        """Rows by global index, in the order given; each touched group is read once."""
+        indices = list(indices)
+        by_group: Dict[int, List[int]] = {}
+        for i in indices:
+            if not 0 <= i < len(self):
+                raise IndexError(i)
+            by_group.setdefault(bisect_right(self.group_starts, i) - 1, []).append(i)
+        rows: Dict[int, dict] = {}
+        for g, members in by_group.items():
+            table = self.group(g, columns)
+            local = table.take(pa.array([i - self.group_starts[g] for i in members])).to_pylist()
+            rows.update(zip(members, local))
+        return [rows[i] for i in indices]
+
+    def __getitem__(self, i: int) -> dict:
+        return self.take([i])[0]
+
+    def sample(self, n: int, seed: Optional[int] = None, columns: Optional[Sequence[str]] = None) -> List[dict]:
+        indices = random.Random(seed).sample(range(len(self)), min(n, len(self)))
+        return self.take(sorted(indices), columns)
+
+    def iter_rows(self, columns: Optional[Sequence[str]] = None) -> Iterator[dict]:
+        for g in range(self.num_groups):
+            yield from self.group(g, columns).to_pylist()
+
+    def count(self, what: str = "rows") -> int:
+        """'rows' or 'alpaca_items': from metadata when present, else from validity bitmaps only."""
+        if what == "rows":
+            return len(self)
+        if what in self.metadata:
+            return int(self.metadata[what])
+        if what != "alpaca_items":
+            raise ValueError(f"unknown count {what!r}")
+        if not all(k in self.columns for k in _ALPACA_KEYS):
+            return 0
+        import pyarrow.compute as pc
+        total = 0
+        for g in range(self.num_groups):
+            table = self.group(g, _ALPACA_KEYS)
+            mask = pc.and_(pc.and_(pc.is_valid(table["instruction"]), pc.is_valid(table["input"])),
+                           pc.is_valid(table["output"]))
+            total += pc.sum(mask).as_py() or 0
+        return total
+
+    def close(self) -> None:
+        if self.arrow:
+            self._source.close()
+        else:
+            self._reader.close()
+
+    def __enter__(self) -> "ColumnarDataset":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Inspect, count and sample Parquet/Arrow dataset files")
+    p.add_argument("path", type=Path, help=".parquet or .arrow/.feather/.ipc file")
+    p.add_argument("--count", choices=("rows", "alpaca_items"), help="Print one count and exit")
+    p.add_argument("--take", type=int, nargs="*", help="Print rows at these indices")
+    p.add_argument("--sample", type=int, default=0, help="Print N random rows")
+    p.add_argument("--seed", type=int, help="Seed for --sample")
+    p.add_argument("--columns", nargs="*", help="Only these columns")
+    args = p.parse_args()
+
+    with ColumnarDataset(args.path) as ds:
+        if args.count:
+            print(ds.count(args.count))
+            return 0
+        rows = []
+        if args.take:
+            rows = ds.take(args.take, args.columns)
+        elif args.sample:
+            rows = ds.sample(args.sample, args.seed, args.columns)
+        if rows:
+            for row in rows:
+                print(json.dumps(row, ensure_ascii=False))
+        else:
+            print(f"rows={len(ds)} groups={ds.num_groups} columns={','.join(ds.columns)} "
+                  + " ".join(f"{k}={v}" for k, v in ds.metadata.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Persistent on-disk cache for Crawl_agent.py.
+
+Layout under the cache root:
+- index.sqlite: one row per URL (content hash, ETag/Last-Modified, outgoing
+  links) and one row per (content hash, extraction-schema hash) with the
+  extraction result.
+- blobs/ab/abcdef...gz: page content, content-addressed by SHA-256, so
+  identical pages reached from different URLs are stored once.
+
+A cached URL is revalidated with a conditional HEAD (If-None-Match /
+If-Modified-Since); a 304 reuses the stored content and links without
+rendering the page. HEAD keeps a changed page from being downloaded twice
+(once by the check, once by the crawler, which has to render it anyway).
+Extraction results are looked up by content hash plus schema hash, so an
+unchanged page never goes back to the LLM, while editing the schema or
+instruction invalidates only the extraction rows.
+
+Usage (inspection):
+    python3 crawl_cache.py .crawl_cache            # print cache stats
+    python3 crawl_cache.py .crawl_cache --prune    # drop unreferenced blobs
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, List, Optional
+
+USER_AGENT = "Mozilla/5.0 (compatible; Crawl_agent/1.0)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    input_format TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    links TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extractions (
+    content_hash TEXT NOT NULL,
+    schema_hash TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, schema_hash)
+);
+"""
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def schema_hash(*parts: Any) -> str:
+    """Stable hash of everything that changes what the extractor returns."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def header(headers: Optional[dict], name: str) -> Optional[str]:
+    if not headers:
+        return None
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CrawlCache:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.root / "index.sqlite")
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self.stats = {"revalidated": 0, "refetched": 0, "extraction_hits": 0, "extraction_misses": 0}
+
+    def close(self) -> None:
+        self.db.close()
+
+    # -- blobs --------------------------------------------------------------
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / f"{digest}.gz"
+
+    def load_content(self, digest: str) -> Optional[str]:
+        path = self._blob_path(digest)
+        if not path.exists():
+            return None
+        return gzip.decompress(path.read_bytes()).decode("utf-8")
+
+    def _store_content(self, text: str) -> str:
+        digest = content_hash(text)
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(gzip.compress(text.encode("utf-8"), compresslevel=6))
+            tmp.replace(path)
+        return digest
+
+    # -- pages --------------------------------------------------------------
+
+    def get_page(self, url: str, input_format: str) -> Optional[dict]:
+        row = self.db.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or row["input_format"] != input_format:
+            return None
+        page = dict(row)
+        page["links"] = json.loads(page["links"])
+        return page
+
+    def put_page(self, url: str, text: str, input_format: str, links: List[str],
+                 headers: Optional[dict] = None) -> str:
+        digest = self._store_content(text)
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages (url, content_hash, input_format, etag, last_modified, links, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, digest, input_format, header(headers, "etag"), header(headers, "last-modified"),
+             json.dumps(links, ensure_ascii=False), time.time()),
+        )
+        self.db.commit()
+        return digest
+
+    def revalidate(self, url: str, page: dict, timeout: float = 10.0, user_agent: str = USER_AGENT) -> bool:
+        """True if the server confirms (304) that the cached page is still current.
+
+        Pages without validators, network errors and 200 responses all count as
+        changed; the caller then renders the page again. Blocking: run it in a
+        thread, behind the same per-host limits as the crawler.
+        """
+        if not page.get("etag") and not page.get("last_modified"):
+            return False
+        req = urllib.request.Request(url, method="HEAD", headers={"User-Agent": user_agent})
+        if page.get("etag"):
+            req.add_header("If-None-Match", page["etag"])
+        if page.get("last_modified"):
+            req.add_header("If-Modified-Since", page["last_modified"])
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return resp.status == 304
+        except urllib.error.HTTPError as e:
+            return e.code == 304
+        except Exception:
+            return False
+
+    # -- extractions --------------------------------------------------------
+
+    def get_extraction(self, digest: str, schema: str) -> Optional[list]:
+        row = self.db.execute(
+            "SELECT result FROM extractions WHERE content_hash = ? AND schema_hash = ?", (digest, schema)
+        ).fetchone()
+        self.stats["extraction_hits" if row else "extraction_misses"] += 1
+        return json.loads(row["result"]) if row else None
+
+    def put_extraction(self, digest: str, schema: str, result: list) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO extractions (content_hash, schema_hash, result, created_at) VALUES (?, ?, ?, ?)",
+            (digest, schema, json.dumps(result, ensure_ascii=False), time.time()),
+        )
+        self.db.commit()
+
+    # -- maintenance --------------------------------------------------------
+
+    def prune(self) -> int:
+        """Delete blobs and extractions no longer referenced by any URL."""
+        live = {r[0] for r in self.db.execute("SELECT content_hash FROM pages")}
+        removed = 0
+        for path in (self.root / "blobs").glob("*/*.gz"):
+            if path.stem not in live:
+                path.unlink()
+                removed += 1
+        self.db.execute("DELETE FROM extractions WHERE content_hash NOT IN (SELECT content_hash FROM pages)")
+        self.db.commit()
+        return removed
+
+    def summary(self) -> dict:
+        blobs = list((self.root / "blobs").glob("*/*.gz"))
+        return {
+            "pages": self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0],
+            "extractions": self.db.execute("SELECT COUNT(*) FROM extractions").fetchone()[0],
+            "schemas": self.db.execute("SELECT COUNT(DISTINCT schema_hash) FROM extractions").fetchone()[0],
+            "blobs": len(blobs),
+            "blob_bytes": sum(p.stat().st_size for p in blobs),
+        }
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Inspect or prune a Crawl_agent.py page cache")
+    p.add_argument("root", type=Path, help="Cache directory (Crawl_agent.py --cache-dir)")
+    p.add_argument("--prune", action="store_true", help="Remove unreferenced blobs and extractions")
+    args = p.parse_args()
+
+    cache = CrawlCache(args.root)
+    if args.prune:
+        print(f"pruned_blobs={cache.prune()}")
+    print(" ".join(f"{k}={v}" for k, v in cache.summary().items()))
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""Incremental knowledge-graph store for Crawl_agent.py extractions.
+
+Entities are upserted by normalized name (NFKC, casefolded, whitespace
+collapsed) through a 64-bit name-hash index, so the same entity extracted
+from different pages and runs becomes one node. Relationship edges are
+merged on (source, target, relation type). Every node and edge remembers the
+URLs it came from; entity `mentions` and edge `weight` count distinct source
+URLs, so re-ingesting the same page on a later run does not inflate them.
+
+Usage:
+    python3 kg_store.py knowledge_graph.sqlite --import crawl_output.json
+    python3 kg_store.py knowledge_graph.sqlite --neighbors "Zhu Di" --depth 2
+    python3 kg_store.py knowledge_graph.sqlite --stats
+    python3 kg_store.py knowledge_graph.sqlite --export graph.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,
+    name_hash INTEGER NOT NULL,
+    norm_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    mentions INTEGER NOT NULL DEFAULT 0,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_entities_name ON entities (name_hash, norm_name);
+
+CREATE TABLE IF NOT EXISTS relationships (
+    id INTEGER PRIMARY KEY,
+    src INTEGER NOT NULL REFERENCES entities (id),
+    dst INTEGER NOT NULL REFERENCES entities (id),
+    relation_type TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    weight INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (src, dst, relation_type)
+);
+CREATE INDEX IF NOT EXISTS ix_relationships_dst ON relationships (dst);
+
+CREATE TABLE IF NOT EXISTS sources (
+    kind TEXT NOT NULL,          -- 'e' entity, 'r' relationship
+    ref_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (kind, ref_id, url)
+) WITHOUT ROWID;
+"""
+
+_WS_RE = re.compile(r"\s+")
+_EDGE_PUNCT = " \t\"'“”‘’「」『』《》()（）[]【】.,;:，。；：、"
+
+
+def normalize_name(name: str) -> str:
+    name = unicodedata.normalize("NFKC", name)
+    name = _WS_RE.sub(" ", name).strip(_EDGE_PUNCT)
+    return name.casefold()
+
+
+def name_hash(norm_name: str) -> int:
+    # Signed so it fits SQLite's 64-bit INTEGER.
+    return int.from_bytes(hashlib.blake2b(norm_name.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def iter_graphs(data: Any) -> Iterable[dict]:
+    """Yield KnowledgeGraph-shaped dicts from extraction output (dict, list of blocks, pages)."""
+    if isinstance(data, list):
+        for item in data:
+            yield from iter_graphs(item)
+    elif isinstance(data, dict):
+        if data.get("error"):
+            return
+        if "entities" in data or "relationships" in data:
+            yield data
+        elif "data" in data:          # Crawl_agent.py page record
+            yield from iter_graphs(data["data"])
+
+
+class KnowledgeGraphStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._ids: Dict[str, int] = {}   # norm_name -> id, avoids an index probe per mention
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+    # -- writes ---------------------------------------------------------------
+
+    def upsert_entity(self, name: str, description: str = "", url: Optional[str] = None) -> Optional[int]:
+        norm = normalize_name(name or "")
+        if not norm:
+            return None
+        now = time.time()
+        description = (description or "").strip()
+        entity_id = self._ids.get(norm)
+        if entity_id is None:
+            h = name_hash(norm)
+            row = self.db.execute(
+                "SELECT id FROM entities WHERE name_hash = ? AND norm_name = ?", (h, norm)
+            ).fetchone()
+            if row is None:
+                entity_id = self.db.execute(
+                    "INSERT INTO entities (name_hash, norm_name, name, description, mentions, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                    (h, norm, name.strip(), description, now, now),
+                ).lastrowid
+            else:
+                entity_id = row[0]
+            self._ids[norm] = entity_id
+
+        # Keep the most informative (longest) description seen so far.
+        self.db.execute(
+            "UPDATE entities SET mentions = mentions + ?, last_seen = ?, "
+            "description = CASE WHEN length(?) > length(description) THEN ? ELSE description END "
+            "WHERE id = ?",
+            (int(self._add_source("e", entity_id, url)), now, description, description, entity_id),
+        )
+        return entity_id
+
+    def add_relationship(self, entity1: dict, entity2: dict, relation_type: str,
+                         description: str = "", url: Optional[str] = None) -> Optional[int]:
+        src = self.upsert_entity(entity1.get("name", ""), entity1.get("description", ""), url)
+        dst = self.upsert_entity(entity2.get("name", ""), entity2.get("description", ""), url)
+        rel = _WS_RE.sub(" ", (relation_type or "related_to")).strip().casefold()
+        if src is None or dst is None:
+            return None
+        description = (description or "").strip()
+        self.db.execute(
+            "INSERT INTO relationships (src, dst, relation_type, description, weight) VALUES (?, ?, ?, ?, 0) "
+            "ON CONFLICT (src, dst, relation_type) DO UPDATE SET "
+            "description = CASE WHEN length(excluded.description) > length(description) "
+            "THEN excluded.description ELSE description END",
+            (src, dst, rel, description),
+        )
+        rel_id = self.db.execute(
+            "SELECT id FROM relationships WHERE src = ? AND dst = ? AND relation_type = ?", (src, dst, rel)
+        ).fetchone()[0]
+        if self._add_source("r", rel_id, url):
+            self.db.execute("UPDATE relationships SET weight = weight + 1 WHERE id = ?", (rel_id,))
+        return rel_id
+
+    def _add_source(self, kind: str, ref_id: int, url: Optional[str]) -> bool:
+        """Record provenance; True if this (node/edge, url) pair is new (always True without a url)."""
+        if not url:
+            return True
+        cur = self.db.execute("INSERT OR IGNORE INTO sources (kind, ref_id, url) VALUES (?, ?, ?)", (kind, ref_id, url))
+        return cur.rowcount == 1
+
+    def ingest(self, data: Any, url: Optional[str] = None) -> Tuple[int, int]:
+        """Merge extraction output into the graph in one transaction; returns (entities, relationships)."""
+        try:
+            with self.db:
+                return self._ingest(data, url)
+        except Exception:
+            self._ids.clear()   # ids of rolled-back inserts must not be reused
+            raise
+
+    def _ingest(self, data: Any, url: Optional[str]) -> Tuple[int, int]:
+        n_entities = n_relationships = 0
+        for graph in iter_graphs(data):
+            for ent in graph.get("entities") or []:
+                if isinstance(ent, dict) and self.upsert_entity(ent.get("name", ""), ent.get("description", ""), url):
+                    n_entities += 1
+            for rel in graph.get("relationships") or []:
+                if not isinstance(rel, dict):
+                    continue
+                if self.add_relationship(rel.get("entity1") or {}, rel.get("entity2") or {},
+                                         rel.get("relation_type", ""), rel.get("description", ""), url):
+                    n_relationships += 1
+        return n_entities, n_relationships
+
+    # -- reads ----------------------------------------------------------------
+
+    def find(self, name: str) -> Optional[dict]:
+        norm = normalize_name(name)
+        row = self.db.execute(
+            "SELECT id, name, description, mentions FROM entities WHERE name_hash = ? AND norm_name = ?",
+            (name_hash(norm), norm),
+        ).fetchone()
+        return None if row is None else {"id": row[0], "name": row[1], "description": row[2], "mentions": row[3]}
+
+    def neighbors(self, name: str, depth: int = 1, limit: int = 500) -> dict:
+        """Breadth-first neighborhood (both edge directions) up to `depth` hops."""
+        start = self.find(name)
+        if start is None:
+            return {"nodes": [], "edges": []}
+        frontier = {start["id"]}
+        seen = {start["id"]}
+        edges: Dict[int, tuple] = {}
+        for _ in range(depth):
+            if not frontier or len(seen) >= limit:
+                break
+            marks = ",".join("?" * len(frontier))
+            rows = self.db.execute(
+                f"SELECT id, src, dst, relation_type, description, weight FROM relationships "
+                f"WHERE src IN ({marks}) OR dst IN ({marks})",
+                (*frontier, *frontier),
+            ).fetchall()
+            nxt = set()
+            for row in rows:
+                edges[row[0]] = row
+                for node in (row[1], row[2]):
+                    if node not in seen and len(seen) < limit:
+                        seen.add(node)
+                        nxt.add(node)
+            frontier = nxt
+
+        marks = ",".join("?" * len(seen))
+        nodes = self.db.execute(
+            f"SELECT id, name, description, mentions FROM entities WHERE id IN ({marks})", tuple(seen)
+        ).fetchall()
+        return {
+            "nodes": [{"id": r[0], "name": r[1], "description": r[2], "mentions": r[3]} for r in nodes],
+            "edges": [
+                {"src": r[1], "dst": r[2], "relation_type": r[3], "description": r[4], "weight": r[5]}
+                for r in edges.values() if r[1] in seen and r[2] in seen
+            ],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "entities": self.db.execute("SELECT COUNT(*) FROM entities").fetchone()[0],
+            "relationships": self.db.execute("SELECT COUNT(*) FROM relationships").fetchone()[0],
+            "sources": self.db.execute("SELECT COUNT(DISTINCT url) FROM sources").fetchone()[0],
+        }
+
+    def export(self) -> dict:
+        return {
+            "entities": [
+                {"id": r[0], "name": r[1], "description": r[2], "mentions": r[3]}
+                for r in self.db.execute("SELECT id, name, description, mentions FROM entities ORDER BY id")
+            ],
+            "relationships": [
+                {"src": r[0], "dst": r[1], "relation_type": r[2], "description": r[3], "weight": r[4]}
+                for r in self.db.execute(
+                    "SELECT src, dst, relation_type, description, weight FROM relationships ORDER BY id")
+            ],
+        }
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Build and query the crawl knowledge graph")
+    p.add_argument("db", type=Path, help="Graph SQLite file")
+    p.add_argument("--import", dest="imports", type=Path, nargs="*", default=[], help="Crawl JSON files to merge")
+    p.add_argument("--neighbors", help="Print the neighborhood of this entity")
+    p.add_argument("--depth", type=int, default=1, help="Neighborhood depth")
+    p.add_argument("--export", type=Path, help="Write the whole graph as JSON")
+    p.add_argument("--stats", action="store_true", help="Print node/edge counts")
+    args = p.parse_args()
+
+    store = KnowledgeGraphStore(args.db)
+    for path in args.imports:
+        pages = json.loads(path.read_text(encoding="utf-8"))
+        for page in pages if isinstance(pages, list) else [pages]:
+            url = page.get("url") if isinstance(page, dict) else None
+            store.ingest(page, url or str(path))
+        print(f"imported {path}")
+
+    if args.neighbors:
+        print(json.dumps(store.neighbors(args.neighbors, args.depth), ensure_ascii=False, indent=2))
+    if args.export:
+        args.export.write_text(json.dumps(store.export(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"exported {args.export}")
+    if args.stats or not (args.neighbors or args.export):
+        print(" ".join(f"{k}={v}" for k, v in store.stats().items()))
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
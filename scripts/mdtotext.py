@@ -6,6 +6,16 @@ Default behavior:
 - Reads each file as UTF-8 (errors ignored)
 - Normalizes whitespace and writes ONE LINE per file to output .txt
 - Also writes a matching .paths.txt file: one source path per output line
+- --pack-tokens N instead packs documents into sequences of at most N tokens
+  (see seq_pack.py): short docs share a line, joined by --pack-separator,
+  long docs are split instead of truncated, and <prefix>.<block>.index.jsonl
+  records each line's byte offset, token count and source segments
+- --format parquet|arrow writes <prefix>.<block>.parquet / .arrow with
+  text/path columns instead of the .txt/.paths.txt pair (see columnar.py)
+- --trace FILE writes a Chrome trace of scan/read/strip/normalize/write spans
+  and prints a per-span summary (see pipeline_trace.py)
+- --profile N runs cProfile + tracemalloc on every Nth document and prints
+  the merged report (--profile-out also saves the pstats file)
 
 This matches the local dataset loader for .txt in LLaMA-Factory (HF datasets "text").
 """
@@ -18,6 +28,10 @@ import sys
 from pathlib import Path
 from typing import Iterable
 
+from columnar import TEXT_COLUMNS, ColumnarWriter
+from pipeline_trace import Profiler, Tracer
+from seq_pack import PackedWriter, SequencePacker, load_tokenizer
+
 
 _WS_RE = re.compile(r"\s+")
 
@@ -85,6 +99,12 @@ def open_block_files(output_prefix: Path, block: int):
     return txt_path, paths_path, txt_f, paths_f
 
 
+def open_block_columnar(output_prefix: Path, block: int, fmt: str, row_group_size: int):
+    out = output_prefix.with_suffix("")
+    path = out.parent / f"{out.name}.{block}.{fmt}"
+    return path, ColumnarWriter(path, TEXT_COLUMNS, row_group_size=row_group_size)
+
+
 def main(argv: list[str]) -> int:
     ap = argparse.ArgumentParser(description="Convert many .md files to one-line-per-doc .txt dataset.")
     ap.add_argument("--root", type=Path, required=True, help="Root directory to scan for *.md")
@@ -100,7 +120,24 @@ def main(argv: list[str]) -> int:
     ap.add_argument("--strip-markdown", action="store_true", help="Apply basic markdown cleanup")
     ap.add_argument("--drop-code-blocks", action="store_true", help="When stripping markdown, remove fenced code blocks")
     ap.add_argument("--follow-symlinks", action="store_true", help="Include symlinked markdown files")
+    ap.add_argument("--pack-tokens", type=int, default=0,
+                    help="Pack documents into sequences of N tokens (0 = one line per document)")
+    ap.add_argument("--tokenizer", default="whitespace",
+                    help="Tokenizer for --pack-tokens: whitespace, chars:N, hf:PATH or py:module.func")
+    ap.add_argument("--pack-separator", default=" <|endoftext|> ", help="Text between documents in a sequence")
+    ap.add_argument("--pack-open-bins", type=int, default=64, help="Partially filled sequences kept open while packing")
+    ap.add_argument("--format", choices=("txt", "parquet", "arrow"), default="txt",
+                    help="Output format (parquet/arrow need pyarrow; not combined with --pack-tokens)")
+    ap.add_argument("--row-group-size", type=int, default=10_000, help="Rows per Parquet row group / Arrow batch")
+    ap.add_argument("--trace", type=Path, help="Write a Chrome trace JSON and print a per-span summary")
+    ap.add_argument("--profile", type=int, default=0, metavar="N",
+                    help="cProfile + tracemalloc every Nth document (0 = off)")
+    ap.add_argument("--profile-out", type=Path, help="Write merged cProfile stats here (for snakeviz/pstats)")
     args = ap.parse_args(argv)
+    if args.pack_tokens and args.format != "txt":
+        ap.error("--pack-tokens writes text; use --format txt")
+    tracer = Tracer(enabled=args.trace is not None)
+    profiler = Profiler(every=args.profile)
 
     root: Path = args.root
     output_prefix: Path = args.output_prefix
@@ -112,56 +149,96 @@ def main(argv: list[str]) -> int:
     skipped = 0
     errors = 0
 
-    txt_path, paths_path, txt_f, paths_f = open_block_files(output_prefix, block)
+    packer = writer = col_f = None
+    if args.pack_tokens:
+        # --max-files-per-block counts packed sequences in this mode.
+        writer = PackedWriter(output_prefix, args.pack_separator, args.max_files_per_block)
+        packer = SequencePacker(args.pack_tokens, load_tokenizer(args.tokenizer), separator=args.pack_separator,
+                                open_bins=args.pack_open_bins, emit=writer.write)
+        txt_f = paths_f = None
+    elif args.format != "txt":
+        txt_path, col_f = open_block_columnar(output_prefix, block, args.format, args.row_group_size)
+        paths_path = txt_path
+        txt_f = paths_f = None
+    else:
+        txt_path, paths_path, txt_f, paths_f = open_block_files(output_prefix, block)
 
     try:
-        for md_path in iter_md_files(root, follow_symlinks=args.follow_symlinks):
-            try:
-                raw = md_path.read_text(encoding="utf-8", errors="ignore")
-
-                if args.strip_markdown:
-                    raw = _strip_markdown_basic(raw, drop_code_blocks=args.drop_code_blocks)
-
-                if args.max_chars and args.max_chars > 0:
-                    raw = raw[: args.max_chars]
-
-                line = _normalize_one_line(raw)
-
-                if args.min_chars and args.min_chars > 0 and len(line) < args.min_chars:
-                    skipped += 1
-                    continue
-
-                if not line:
-                    skipped += 1
-                    continue
-
-                txt_f.write(line)
-                if not line.endswith("\n"):
-                    txt_f.write("\n")
-
-                paths_f.write(str(md_path))
-                if not str(md_path).endswith("\n"):
-                    paths_f.write("\n")
-
-                processed += 1
-                files_in_block += 1
-
-                if args.max_files_per_block and args.max_files_per_block > 0:
-                    if files_in_block >= args.max_files_per_block:
-                        txt_f.close()
-                        paths_f.close()
-                        block += 1
-                        files_in_block = 0
-                        txt_path, paths_path, txt_f, paths_f = open_block_files(output_prefix, block)
-
-                if processed % 1000 == 0:
-                    print(f"processed={processed} skipped={skipped} errors={errors} (current={md_path})")
-
-            except Exception as e:  # noqa: BLE001
-                errors += 1
-                print(f"ERROR processing {md_path}: {e}", file=sys.stderr)
-
+        for md_path in tracer.iter("iter_md_files", iter_md_files(root, follow_symlinks=args.follow_symlinks)):
+            with profiler.sample("doc"):
+                try:
+                    with tracer.span("read"):
+                        raw = md_path.read_text(encoding="utf-8", errors="ignore")
+
+                    if args.strip_markdown:
+                        with tracer.span("strip_markdown"):
+                            raw = _strip_markdown_basic(raw, drop_code_blocks=args.drop_code_blocks)
+
+                    if args.max_chars and args.max_chars > 0:
+                        raw = raw[: args.max_chars]
+
+                    with tracer.span("normalize"):
+                        line = _normalize_one_line(raw)
+
+                    if args.min_chars and args.min_chars > 0 and len(line) < args.min_chars:
+                        skipped += 1
+                        continue
+
+                    if not line:
+                        skipped += 1
+                        continue
+
+                    if packer is not None:
+                        with tracer.span("pack"):
+                            packer.add(str(md_path), line)
+                        processed += 1
+                        if processed % 1000 == 0:
+                            print(f"processed={processed} skipped={skipped} errors={errors} (current={md_path})")
+                        continue
+
+                    with tracer.span("write"):
+                        if col_f is not None:
+                            col_f.write({"text": line, "path": str(md_path)})
+                        else:
+                            txt_f.write(line)
+                            if not line.endswith("\n"):
+                                txt_f.write("\n")
+
+                            paths_f.write(str(md_path))
+                            if not str(md_path).endswith("\n"):
+                                paths_f.write("\n")
+
+                    processed += 1
+                    files_in_block += 1
+
+                    if args.max_files_per_block and args.max_files_per_block > 0:
+                        if files_in_block >= args.max_files_per_block:
+                            block += 1
+                            files_in_block = 0
+                            if col_f is not None:
+                                col_f.close()
+                                txt_path, col_f = open_block_columnar(output_prefix, block, args.format,
+                                                                      args.row_group_size)
+                                paths_path = txt_path
+                            else:
+                                txt_f.close()
+                                paths_f.close()
+                                txt_path, paths_path, txt_f, paths_f = open_block_files(output_prefix, block)
+
+                    if processed % 1000 == 0:
+                        print(f"processed={processed} skipped={skipped} errors={errors} (current={md_path})")
+
+                except Exception as e:  # noqa: BLE001
+                    errors += 1
+                    print(f"ERROR processing {md_path}: {e}", file=sys.stderr)
+
+        if packer is not None:
+            packer.flush()
     finally:
+        if writer is not None:
+            writer.close()
+        if col_f is not None:
+            col_f.close()
         try:
             txt_f.close()
         except Exception:
@@ -171,10 +248,21 @@ def main(argv: list[str]) -> int:
         except Exception:
             pass
 
+    if writer is not None:
+        block, txt_path, paths_path = writer.block, writer.txt_path, writer.idx_path
+        fill = writer.tokens / (writer.sequences * args.pack_tokens) if writer.sequences else 0.0
+        print(f"Packed docs={packer.docs} doc_tokens={packer.doc_tokens} split_docs={packer.split_docs} "
+              f"sequences={writer.sequences} seq_len={args.pack_tokens} fill={fill:.1%}")
     print(
         f"Done. processed={processed} skipped={skipped} errors={errors}. Last block={block}.\n"
         f"Example outputs: {txt_path} and {paths_path}"
     )
+    if tracer.enabled:
+        print(tracer.summary())
+        tracer.write_chrome_trace(args.trace)
+        print(f"trace={args.trace}")
+    if args.profile:
+        print(profiler.report(out=args.profile_out))
     return 0 if errors == 0 else 2
 
 
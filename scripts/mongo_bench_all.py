@@ -11,6 +11,12 @@ Usage:
     python3 mongo_bench_all.py --login user pass       # Login then hit API too
     python3 mongo_bench_all.py --api-token <JWT>       # Supply token directly
     python3 mongo_bench_all.py --api-url http://...    # Override API base (default: http://localhost:5001)
+    python3 mongo_bench_all.py --cleanup-only --cleanup-dry-run     # Count duplicates, delete nothing
+    python3 mongo_bench_all.py --cleanup-only --cleanup-rate 500    # Throttled cleanup, no benchmark
+    python3 mongo_bench_all.py --mongo-uri mongodb://localhost:27017 --db KanKanDB_perf
+                                                       # Bench a seeded DB (see mongo_seed_avatars.py)
+
+For scheduled runs with regression alerts, see mongo_perf_monitor.py.
 """
 
 import argparse
@@ -19,7 +25,7 @@ import time
 from pathlib import Path
 
 import requests
-from pymongo import MongoClient, DESCENDING
+from pymongo import ASCENDING, DESCENDING, DeleteMany, MongoClient
 
 EMOTIONS = [
     "angry", "smile", "sad", "happy", "crying",
@@ -40,35 +46,116 @@ def load_settings() -> dict:
 # Cleanup
 # ---------------------------------------------------------------------------
 
-def cleanup_duplicates(collection) -> int:
-    """Delete duplicate emotion_generated docs, keeping only the latest per (sourceAvatarId, emotion)."""
+def cleanup_duplicates(
+    collection,
+    *,
+    batch_size: int = 500,
+    chunk_size: int = 1000,
+    max_docs_per_sec: float = 0,
+    dry_run: bool = False,
+    verbose: bool = False,
+) -> int:
+    """Delete duplicate emotion_generated docs, keeping only the latest per (sourceAvatarId, emotion).
+
+    Groups are streamed from an allowDiskUse aggregation cursor (no per-group id lists), and
+    deletes are issued as bulk_write chunks of roughly `chunk_size` docs, throttled to
+    `max_docs_per_sec` (0 = unthrottled). A group with more than `chunk_size` extras is
+    deleted `chunk_size` ids at a time, in ascending _id order. Docs without createdAt
+    count as older than the kept one. With `dry_run` nothing is deleted.
+    Returns the number of docs deleted (or that would be deleted).
+    """
     pipeline = [
         {"$match": {"imageType": "emotion_generated", "emotion": {"$in": EMOTIONS}}},
         {"$sort": {"createdAt": -1}},
         {"$group": {
             "_id": {"sourceAvatarId": "$sourceAvatarId", "emotion": "$emotion"},
             "keepId": {"$first": "$_id"},
-            "allIds": {"$push": "$_id"},
+            "keepCreatedAt": {"$first": "$createdAt"},
             "count": {"$sum": 1},
         }},
         {"$match": {"count": {"$gt": 1}}},
     ]
-    duplicates = list(collection.aggregate(pipeline))
-    if not duplicates:
+    cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+
+    start = time.perf_counter()
+    groups = 0
+    deleted = 0
+    pending: list[DeleteMany] = []
+    pending_docs = 0
+
+    def report() -> None:
+        elapsed = time.perf_counter() - start
+        if max_docs_per_sec > 0 and not dry_run:
+            # Sleep until the overall rate is back under the budget.
+            ahead = deleted / max_docs_per_sec - elapsed
+            if ahead > 0:
+                time.sleep(ahead)
+                elapsed += ahead
+        rate = deleted / elapsed if elapsed > 0 else 0.0
+        verb = "would delete" if dry_run else "deleted"
+        print(f"  Cleanup progress: groups={groups} {verb}={deleted} ({rate:.0f} docs/s)")
+
+    def flush() -> None:
+        nonlocal deleted, pending, pending_docs
+        if not pending:
+            return
+        if dry_run:
+            deleted += pending_docs
+        else:
+            deleted += collection.bulk_write(pending, ordered=False).deleted_count
+        pending, pending_docs = [], 0
+        report()
+
+    def delete_in_batches(filter_doc: dict, keep_id, extras: int) -> None:
+        nonlocal deleted
+        if dry_run:
+            deleted += extras
+            report()
+            return
+        last_id = None
+        while True:
+            page = dict(filter_doc, _id={"$ne": keep_id} if last_id is None else {"$ne": keep_id, "$gt": last_id})
+            ids = [doc["_id"] for doc in collection.find(page, {"_id": 1}).sort("_id", ASCENDING).limit(chunk_size)]
+            if not ids:
+                break
+            deleted += collection.delete_many({"_id": {"$in": ids}}).deleted_count
+            last_id = ids[-1]
+            report()
+
+    for group in cursor:
+        groups += 1
+        extras = group["count"] - 1
+        if verbose:
+            print(f"  Duplicate: sourceAvatarId={group['_id']['sourceAvatarId']} "
+                  f"emotion={group['_id']['emotion']} keeping={group['keepId']} "
+                  f"deleting {extras}")
+
+        # Never touch docs newer than the one we chose to keep (e.g. inserted mid-run);
+        # docs without createdAt sort last in the aggregation, so they are older.
+        filter_doc = {
+            "sourceAvatarId": group["_id"]["sourceAvatarId"],
+            "imageType": "emotion_generated",
+            "emotion": group["_id"]["emotion"],
+            "$or": [{"createdAt": {"$lte": group["keepCreatedAt"]}}, {"createdAt": None}],
+        }
+        if extras > chunk_size:
+            flush()
+            delete_in_batches(filter_doc, group["keepId"], extras)
+            continue
+        pending.append(DeleteMany(dict(filter_doc, _id={"$ne": group["keepId"]})))
+        pending_docs += extras
+        if pending_docs >= chunk_size:
+            flush()
+    flush()
+
+    if groups == 0:
         print("Cleanup: no duplicates found.")
         return 0
 
-    ids_to_delete = []
-    for group in duplicates:
-        extras = [oid for oid in group["allIds"] if oid != group["keepId"]]
-        ids_to_delete.extend(extras)
-        print(f"  Duplicate: sourceAvatarId={group['_id']['sourceAvatarId']} "
-              f"emotion={group['_id']['emotion']} keeping={group['keepId']} "
-              f"deleting {len(extras)}")
-
-    result = collection.delete_many({"_id": {"$in": ids_to_delete}})
-    print(f"Cleanup: deleted {result.deleted_count} duplicate docs.\n")
-    return result.deleted_count
+    verb = "would delete" if dry_run else "deleted"
+    print(f"Cleanup: {verb} {deleted} duplicate docs across {groups} groups "
+          f"in {time.perf_counter() - start:.1f}s.\n")
+    return deleted
 
 
 # ---------------------------------------------------------------------------
@@ -94,7 +181,13 @@ def mongo_query(collection, avatar_id: str, include_full: bool) -> dict:
     elapsed_ms = (time.perf_counter() - start) * 1000
 
     full_bytes = sum(len(item.get("imageData", b"")) for item in items) if include_full else 0
-    return {"count": len(items), "elapsed_ms": round(elapsed_ms, 1), "full_bytes": full_bytes}
+    thumb_bytes = sum(len(item.get("thumbnailData") or b"") for item in items)
+    return {
+        "count": len(items),
+        "elapsed_ms": round(elapsed_ms, 1),
+        "full_bytes": full_bytes,
+        "thumb_bytes": thumb_bytes,
+    }
 
 
 def bench_mongo(collection, original_ids: list[str]) -> list[dict]:
@@ -243,18 +336,37 @@ def main():
     parser.add_argument("--login", nargs=2, metavar=("EMAIL", "PASSWORD"), help="Login and benchmark API")
     parser.add_argument("--api-token", help="Supply JWT token directly for API benchmark")
     parser.add_argument("--skip-cleanup", action="store_true", help="Skip duplicate cleanup step")
+    parser.add_argument("--cleanup-only", action="store_true", help="Run the duplicate cleanup and exit")
+    parser.add_argument("--cleanup-dry-run", action="store_true", help="Report duplicates without deleting")
+    parser.add_argument("--cleanup-batch", type=int, default=500, help="Aggregation cursor batch size")
+    parser.add_argument("--cleanup-chunk", type=int, default=1000, help="Approx. docs deleted per bulk_write")
+    parser.add_argument("--cleanup-rate", type=float, default=0, help="Max docs deleted per second (0 = no limit)")
+    parser.add_argument("--verbose", action="store_true", help="Print every duplicate group")
+    parser.add_argument("--mongo-uri", help="Override MongoDB connection string from appsettings.json")
+    parser.add_argument("--db", help="Override MongoDB database name from appsettings.json")
     args = parser.parse_args()
+    if args.cleanup_chunk < 1:
+        parser.error("--cleanup-chunk must be at least 1")
 
     settings = load_settings()
     mongo_cfg = settings["MongoDB"]
-    client = MongoClient(mongo_cfg["ConnectionString"])
-    db = client[mongo_cfg["DatabaseName"]]
+    client = MongoClient(args.mongo_uri or mongo_cfg["ConnectionString"])
+    db = client[args.db or mongo_cfg["DatabaseName"]]
     collection = db["avatarImages"]
 
     # Step 1: Cleanup
     if not args.skip_cleanup:
         print("=== Step 1: Cleanup duplicate emotion_generated docs ===")
-        cleanup_duplicates(collection)
+        cleanup_duplicates(
+            collection,
+            batch_size=args.cleanup_batch,
+            chunk_size=args.cleanup_chunk,
+            max_docs_per_sec=args.cleanup_rate,
+            dry_run=args.cleanup_dry_run,
+            verbose=args.verbose,
+        )
+    if args.cleanup_only:
+        return
 
     # Step 2: Collect all original avatar IDs
     print("=== Step 2: Collecting all original avatars ===")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+mongo_payload_bench.py
+----------------------
+Measure how the avatarImages payloads (thumbnailData / imageData) would shrink
+under different storage formats, before changing anything in the server.
+
+1. Pull a random sample of docs ($sample) with their raw blobs.
+2. For every blob, re-encode as WebP / AVIF / JPEG at several quality levels
+   and wrap the original bytes with gzip / zstd (lossless).
+3. Record size, encode time and decode time per candidate.
+4. Project collection storage and the Mongo transfer time of the
+   emotion-thumbnails full query (measured read throughput x new size).
+
+Requires Pillow for image codecs. AVIF needs Pillow >= 11.2 (or the
+pillow-avif-plugin); zstd needs the `zstandard` package. Missing codecs are
+skipped with a note.
+
+Usage:
+    python3 mongo_payload_bench.py                          # 20 docs, default codecs
+    python3 mongo_payload_bench.py --sample 100 --json out.json
+    python3 mongo_payload_bench.py --formats webp,jpeg --qualities 60,80
+    python3 mongo_payload_bench.py --mongo-uri mongodb://localhost:27017 --db KanKanDB_perf
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import statistics
+import time
+from pathlib import Path
+
+from PIL import Image
+from pymongo import MongoClient
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+try:
+    import pillow_avif  # noqa: F401  (registers the AVIF plugin on older Pillow)
+except ImportError:
+    pass
+
+EMOTIONS = [
+    "angry", "smile", "sad", "happy", "crying",
+    "thinking", "surprised", "neutral", "excited",
+]
+
+PIL_FORMATS = {"webp": "WEBP", "avif": "AVIF", "jpeg": "JPEG"}
+FIELDS = ("thumbnailData", "imageData")
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+def load_settings() -> dict:
+    settings_path = Path(__file__).resolve().parents[1] / "KanKan" / "server" / "appsettings.json"
+    with settings_path.open("r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+# ---------------------------------------------------------------------------
+# Sampling
+# ---------------------------------------------------------------------------
+
+def sample_docs(collection, size: int) -> tuple[list[dict], dict]:
+    """Fetch `size` random docs and measure raw read throughput while doing it."""
+    pipeline = [
+        {"$match": {"imageData": {"$ne": None}}},
+        {"$sample": {"size": size}},
+        {"$project": {"_id": 1, "imageType": 1, "thumbnailData": 1, "imageData": 1}},
+    ]
+    start = time.perf_counter()
+    docs = list(collection.aggregate(pipeline, allowDiskUse=True))
+    elapsed = time.perf_counter() - start
+
+    fetched = sum(len(d.get(f) or b"") for d in docs for f in FIELDS)
+    return docs, {
+        "docs": len(docs),
+        "bytes": fetched,
+        "elapsed_s": elapsed,
+        "mb_per_s": fetched / 1_000_000 / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def collection_totals(collection) -> dict:
+    """Total payload bytes per field plus the average full-query size per avatar."""
+    group = {"_id": None, "docs": {"$sum": 1}}
+    for field in FIELDS:
+        group[field] = {"$sum": {"$cond": [{"$ifNull": [f"${field}", False]}, {"$binarySize": f"${field}"}, 0]}}
+    totals = next(collection.aggregate([{"$group": group}], allowDiskUse=True), None) or {}
+
+    per_avatar = next(collection.aggregate([
+        {"$match": {"imageType": "emotion_generated", "emotion": {"$in": EMOTIONS}}},
+        {"$group": {"_id": "$sourceAvatarId", "bytes": {"$sum": {"$binarySize": "$imageData"}}}},
+        {"$group": {"_id": None, "avg": {"$avg": "$bytes"}}},
+    ], allowDiskUse=True), None) or {}
+
+    return {
+        "docs": totals.get("docs", 0),
+        "thumbnailData": totals.get("thumbnailData", 0),
+        "imageData": totals.get("imageData", 0),
+        "avg_full_query_bytes": per_avatar.get("avg") or 0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Codecs
+# ---------------------------------------------------------------------------
+
+def available_formats(requested: list[str]) -> list[str]:
+    registered = set(Image.registered_extensions().values())
+    usable = []
+    for fmt in requested:
+        if PIL_FORMATS.get(fmt) in registered:
+            usable.append(fmt)
+        else:
+            print(f"  Skipping {fmt}: codec not available in this Pillow build")
+    return usable
+
+
+def bench_image(blob: bytes, fmt: str, quality: int) -> dict | None:
+    try:
+        img = Image.open(io.BytesIO(blob))
+        img.load()
+    except Exception:
+        return None
+    if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    buf = io.BytesIO()
+    start = time.perf_counter()
+    img.save(buf, format=PIL_FORMATS[fmt], quality=quality)
+    encode_ms = (time.perf_counter() - start) * 1000
+    encoded = buf.getvalue()
+
+    start = time.perf_counter()
+    Image.open(io.BytesIO(encoded)).load()
+    decode_ms = (time.perf_counter() - start) * 1000
+    return {"bytes": len(encoded), "encode_ms": encode_ms, "decode_ms": decode_ms}
+
+
+def bench_wrap(blob: bytes, wrapper: str, level: int) -> dict:
+    start = time.perf_counter()
+    if wrapper == "gzip":
+        packed = gzip.compress(blob, compresslevel=level)
+    else:
+        packed = zstandard.ZstdCompressor(level=level).compress(blob)
+    encode_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    if wrapper == "gzip":
+        gzip.decompress(packed)
+    else:
+        zstandard.ZstdDecompressor().decompress(packed)
+    decode_ms = (time.perf_counter() - start) * 1000
+    return {"bytes": len(packed), "encode_ms": encode_ms, "decode_ms": decode_ms}
+
+
+def candidates(formats: list[str], qualities: list[int], wrappers: list[str]) -> list[tuple[str, str, int]]:
+    out = [("image", fmt, q) for fmt in formats for q in qualities]
+    for wrapper in wrappers:
+        levels = (1, 6, 9) if wrapper == "gzip" else (3, 10, 19)
+        out += [("wrap", wrapper, lvl) for lvl in levels]
+    return out
+
+
+def run_bench(docs: list[dict], cands: list[tuple[str, str, int]]) -> list[dict]:
+    rows = []
+    for field in FIELDS:
+        blobs = [bytes(d[field]) for d in docs if d.get(field)]
+        if not blobs:
+            continue
+        raw_total = sum(len(b) for b in blobs)
+
+        for kind, name, level in cands:
+            results = []
+            for blob in blobs:
+                r = bench_image(blob, name, level) if kind == "image" else bench_wrap(blob, name, level)
+                if r is not None:
+                    results.append((len(blob), r))
+            if not results:
+                continue
+            raw = sum(size for size, _ in results)
+            new = sum(r["bytes"] for _, r in results)
+            rows.append({
+                "field": field,
+                "codec": f"{name}@{level}",
+                "blobs": len(results),
+                "raw_avg_kb": round(raw / len(results) / 1024, 1),
+                "new_avg_kb": round(new / len(results) / 1024, 1),
+                "ratio": round(new / raw, 3) if raw else 1.0,
+                "encode_ms_p50": round(statistics.median(r["encode_ms"] for _, r in results), 2),
+                "decode_ms_p50": round(statistics.median(r["decode_ms"] for _, r in results), 2),
+                "coverage": round(raw / raw_total, 3),
+            })
+            print(f"  {field:<14} {name}@{level:<3} ratio={rows[-1]['ratio']:<6} "
+                  f"enc={rows[-1]['encode_ms_p50']}ms dec={rows[-1]['decode_ms_p50']}ms")
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def add_projections(rows: list[dict], totals: dict, read: dict) -> None:
+    """Project storage and full-query transfer time for each candidate."""
+    mb_per_s = read["mb_per_s"] or 0.0
+    for row in rows:
+        field_bytes = totals.get(row["field"], 0)
+        row["projected_storage_mb"] = round(field_bytes * row["ratio"] / 1_000_000, 1)
+        row["saved_storage_mb"] = round(field_bytes * (1 - row["ratio"]) / 1_000_000, 1)
+        if row["field"] == "imageData" and mb_per_s > 0:
+            full = totals["avg_full_query_bytes"]
+            row["full_query_ms_now"] = round(full / 1_000_000 / mb_per_s * 1000, 1)
+            row["full_query_ms_new"] = round(full * row["ratio"] / 1_000_000 / mb_per_s * 1000, 1)
+
+
+def print_table(rows: list[dict]) -> None:
+    cols = [
+        ("field", 14), ("codec", 10), ("raw_avg_kb", 11), ("new_avg_kb", 11), ("ratio", 7),
+        ("encode_ms_p50", 14), ("decode_ms_p50", 14), ("projected_storage_mb", 21),
+        ("full_query_ms_new", 18),
+    ]
+    print("\n" + "=" * 130)
+    print("  ".join(name.ljust(w) for name, w in cols))
+    print("-" * 130)
+    for row in sorted(rows, key=lambda r: (r["field"], r["ratio"])):
+        print("  ".join(str(row.get(name, "-")).ljust(w) for name, w in cols))
+    print("=" * 130 + "\n")
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark avatar payload formats and compression")
+    parser.add_argument("--sample", type=int, default=20, help="Number of docs to sample")
+    parser.add_argument("--formats", default="webp,avif,jpeg", help="Comma-separated image formats")
+    parser.add_argument("--qualities", default="50,70,85", help="Comma-separated quality levels")
+    parser.add_argument("--wrappers", default="gzip,zstd", help="Comma-separated lossless wrappers")
+    parser.add_argument("--json", type=Path, help="Also write results as JSON to this path")
+    parser.add_argument("--mongo-uri", help="Override MongoDB connection string from appsettings.json")
+    parser.add_argument("--db", help="Override MongoDB database name from appsettings.json")
+    args = parser.parse_args()
+
+    settings = load_settings()
+    mongo_cfg = settings["MongoDB"]
+    client = MongoClient(args.mongo_uri or mongo_cfg["ConnectionString"])
+    collection = client[args.db or mongo_cfg["DatabaseName"]]["avatarImages"]
+
+    formats = available_formats([f.strip() for f in args.formats.split(",") if f.strip()])
+    qualities = [int(q) for q in args.qualities.split(",") if q.strip()]
+    wrappers = [w.strip() for w in args.wrappers.split(",") if w.strip()]
+    if "zstd" in wrappers and zstandard is None:
+        print("  Skipping zstd: `zstandard` package not installed")
+        wrappers.remove("zstd")
+
+    print("=== Step 1: Sampling payloads ===")
+    docs, read = sample_docs(collection, args.sample)
+    print(f"  Sampled {read['docs']} docs, {read['bytes'] / 1_000_000:.2f}MB "
+          f"in {read['elapsed_s']:.2f}s ({read['mb_per_s']:.1f} MB/s)\n")
+    if not docs:
+        print("No docs with imageData found.")
+        return 1
+
+    print("=== Step 2: Collection totals ===")
+    totals = collection_totals(collection)
+    print(f"  docs={totals['docs']} thumbnailMB={totals['thumbnailData'] / 1_000_000:.1f} "
+          f"imageMB={totals['imageData'] / 1_000_000:.1f} "
+          f"avgFullQueryMB={totals['avg_full_query_bytes'] / 1_000_000:.2f}\n")
+
+    print("=== Step 3: Encoding candidates ===")
+    rows = run_bench(docs, candidates(formats, qualities, wrappers))
+    add_projections(rows, totals, read)
+    print_table(rows)
+
+    if args.json:
+        args.json.write_text(json.dumps({"read": read, "totals": totals, "rows": rows}, indent=2) + "\n",
+                             encoding="utf-8")
+        print(f"Wrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
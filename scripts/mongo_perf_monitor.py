@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+mongo_perf_monitor.py
+---------------------
+Scheduled / daemon mode for the mongo_bench_all.py query shapes.
+
+Every --interval seconds:
+1. Time the same shapes mongo_bench_all.py benchmarks once:
+   - "originals": the original-avatar listing query
+   - "thumb" / "full": mongo_query per sampled original avatar
+2. Append p50 / p95 / max per shape to a local SQLite time series.
+3. Compare p95 with a rolling baseline (median p95 of the previous
+   --baseline-runs runs) and flag a regression when it is more than
+   --threshold above it.
+4. Export Prometheus text metrics (textfile-collector file and/or HTTP).
+
+Usage:
+    python3 mongo_perf_monitor.py --once                        # One sample, e.g. from cron
+    python3 mongo_perf_monitor.py --interval 300                # Daemon, every 5 minutes
+    python3 mongo_perf_monitor.py --metrics-port 9109           # Serve /metrics for Prometheus
+    python3 mongo_perf_monitor.py --metrics-file /var/lib/node_exporter/avatar.prom
+    python3 mongo_perf_monitor.py --report                      # Print recent history and exit
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from pymongo import DESCENDING, MongoClient
+
+from mongo_bench_all import load_settings, mongo_query
+
+SHAPES = ("originals", "thumb", "full")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    ts REAL NOT NULL,
+    shape TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    p50_ms REAL NOT NULL,
+    p95_ms REAL NOT NULL,
+    max_ms REAL NOT NULL,
+    docs REAL NOT NULL,
+    bytes REAL NOT NULL,
+    baseline_p95_ms REAL,
+    regression INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_runs_shape_ts ON runs (shape, ts);
+"""
+
+
+# ---------------------------------------------------------------------------
+# Sampling
+# ---------------------------------------------------------------------------
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def list_originals(collection) -> tuple[list[str], float]:
+    start = time.perf_counter()
+    originals = list(collection.find(
+        {"imageType": "original", "emotion": None, "sourceAvatarId": None},
+        {"_id": 1}
+    ).sort("createdAt", DESCENDING))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return [str(doc["_id"]) for doc in originals], elapsed_ms
+
+
+def sample_shapes(collection, avatars: int, repeats: int, rng: random.Random) -> dict[str, dict]:
+    """Time every shape and return {shape: {timings, docs, bytes}}."""
+    results = {shape: {"timings": [], "docs": [], "bytes": []} for shape in SHAPES}
+
+    original_ids = []
+    for _ in range(repeats):
+        original_ids, elapsed_ms = list_originals(collection)
+        results["originals"]["timings"].append(elapsed_ms)
+        results["originals"]["docs"].append(len(original_ids))
+        results["originals"]["bytes"].append(0)
+
+    picked = rng.sample(original_ids, min(avatars, len(original_ids))) if avatars else original_ids
+    for avatar_id in picked:
+        for shape, include_full in (("thumb", False), ("full", True)):
+            r = mongo_query(collection, avatar_id, include_full=include_full)
+            results[shape]["timings"].append(r["elapsed_ms"])
+            results[shape]["docs"].append(r["count"])
+            results[shape]["bytes"].append(r["full_bytes"] if include_full else r["thumb_bytes"])
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Storage / baseline
+# ---------------------------------------------------------------------------
+
+def open_store(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def rolling_baseline(conn: sqlite3.Connection, shape: str, runs: int, min_runs: int) -> float | None:
+    rows = conn.execute(
+        "SELECT p95_ms FROM runs WHERE shape = ? ORDER BY ts DESC LIMIT ?", (shape, runs)
+    ).fetchall()
+    if len(rows) < min_runs:
+        return None
+    return statistics.median(r[0] for r in rows)
+
+
+def record_run(conn: sqlite3.Connection, results: dict[str, dict], args) -> list[dict]:
+    ts = time.time()
+    summary = []
+    for shape in SHAPES:
+        timings = results[shape]["timings"]
+        if not timings:
+            continue
+        p95 = percentile(timings, 95)
+        baseline = rolling_baseline(conn, shape, args.baseline_runs, args.min_baseline_runs)
+        regression = baseline is not None and baseline > 0 and p95 > baseline * (1 + args.threshold)
+        row = {
+            "shape": shape,
+            "samples": len(timings),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(p95, 2),
+            "max_ms": round(max(timings), 2),
+            "docs": statistics.fmean(results[shape]["docs"]),
+            "bytes": statistics.fmean(results[shape]["bytes"]),
+            "baseline_p95_ms": round(baseline, 2) if baseline is not None else None,
+            "regression": int(regression),
+        }
+        conn.execute(
+            "INSERT INTO runs (ts, shape, samples, p50_ms, p95_ms, max_ms, docs, bytes, baseline_p95_ms, regression) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (ts, shape, row["samples"], row["p50_ms"], row["p95_ms"], row["max_ms"],
+             row["docs"], row["bytes"], row["baseline_p95_ms"], row["regression"]),
+        )
+        summary.append(row)
+
+    if args.retention_days > 0:
+        conn.execute("DELETE FROM runs WHERE ts < ?", (ts - args.retention_days * 86400,))
+    conn.commit()
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Prometheus export
+# ---------------------------------------------------------------------------
+
+def render_metrics(summary: list[dict], ts: float) -> str:
+    lines = [
+        "# HELP avatar_query_latency_ms Avatar query latency per shape from the last monitor run.",
+        "# TYPE avatar_query_latency_ms gauge",
+    ]
+    for row in summary:
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("1", "max_ms")):
+            lines.append(f'avatar_query_latency_ms{{shape="{row["shape"]}",quantile="{quantile}"}} {row[key]}')
+    lines += [
+        "# HELP avatar_query_baseline_p95_ms Rolling-baseline p95 latency per shape.",
+        "# TYPE avatar_query_baseline_p95_ms gauge",
+    ]
+    for row in summary:
+        if row["baseline_p95_ms"] is not None:
+            lines.append(f'avatar_query_baseline_p95_ms{{shape="{row["shape"]}"}} {row["baseline_p95_ms"]}')
+    lines += [
+        "# HELP avatar_query_regression 1 if p95 exceeded the baseline threshold in the last run.",
+        "# TYPE avatar_query_regression gauge",
+    ]
+    lines += [f'avatar_query_regression{{shape="{row["shape"]}"}} {row["regression"]}' for row in summary]
+    lines += [
+        "# HELP avatar_query_docs Average docs returned per query.",
+        "# TYPE avatar_query_docs gauge",
+    ]
+    lines += [f'avatar_query_docs{{shape="{row["shape"]}"}} {row["docs"]:.2f}' for row in summary]
+    lines += [
+        "# HELP avatar_query_bytes Average payload bytes returned per query.",
+        "# TYPE avatar_query_bytes gauge",
+    ]
+    lines += [f'avatar_query_bytes{{shape="{row["shape"]}"}} {row["bytes"]:.0f}' for row in summary]
+    lines += [
+        "# HELP avatar_monitor_last_run_timestamp_seconds Unix time of the last monitor run.",
+        "# TYPE avatar_monitor_last_run_timestamp_seconds gauge",
+        f"avatar_monitor_last_run_timestamp_seconds {ts:.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: Path, text: str) -> None:
+    # Write-then-rename so the textfile collector never reads a partial file.
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def serve_metrics(port: int, state: dict) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = state.get("metrics", "").encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def print_summary(summary: list[dict]) -> None:
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    for row in summary:
+        baseline = f"{row['baseline_p95_ms']}ms" if row["baseline_p95_ms"] is not None else "n/a"
+        flag = "  << REGRESSION" if row["regression"] else ""
+        print(f"[{stamp}] {row['shape']:<9} n={row['samples']:<4} p50={row['p50_ms']}ms "
+              f"p95={row['p95_ms']}ms max={row['max_ms']}ms baseline_p95={baseline}{flag}")
+
+
+def print_history(conn: sqlite3.Connection, limit: int) -> None:
+    rows = conn.execute(
+        "SELECT ts, shape, p50_ms, p95_ms, baseline_p95_ms, regression FROM runs ORDER BY ts DESC LIMIT ?",
+        (limit,),
+    ).fetchall()
+    for ts, shape, p50, p95, baseline, regression in reversed(rows):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+        flag = "  << REGRESSION" if regression else ""
+        print(f"{stamp}  {shape:<9} p50={p50}ms p95={p95}ms baseline_p95={baseline}{flag}")
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Continuous avatar query regression monitor")
+    parser.add_argument("--interval", type=float, default=300.0, help="Seconds between runs")
+    parser.add_argument("--once", action="store_true", help="Run a single sample and exit")
+    parser.add_argument("--report", action="store_true", help="Print stored history and exit")
+    parser.add_argument("--avatars", type=int, default=10, help="Original avatars sampled per run (0 = all)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timings of the originals query per run")
+    parser.add_argument("--store", type=Path, default=Path("mongo_perf_history.sqlite"), help="SQLite store")
+    parser.add_argument("--baseline-runs", type=int, default=20, help="Previous runs in the rolling baseline")
+    parser.add_argument("--min-baseline-runs", type=int, default=5, help="Runs needed before flagging")
+    parser.add_argument("--threshold", type=float, default=0.30, help="Regression when p95 > baseline*(1+x)")
+    parser.add_argument("--retention-days", type=float, default=30.0, help="Prune older runs (0 = keep all)")
+    parser.add_argument("--metrics-file", type=Path, help="Write Prometheus text metrics to this file")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve /metrics on this port (0 = off)")
+    parser.add_argument("--seed", type=int, help="RNG seed for avatar sampling")
+    parser.add_argument("--mongo-uri", help="Override MongoDB connection string from appsettings.json")
+    parser.add_argument("--db", help="Override MongoDB database name from appsettings.json")
+    args = parser.parse_args()
+
+    conn = open_store(args.store)
+    if args.report:
+        print_history(conn, 50)
+        return 0
+
+    mongo_cfg = load_settings()["MongoDB"]
+    client = MongoClient(args.mongo_uri or mongo_cfg["ConnectionString"])
+    collection = client[args.db or mongo_cfg["DatabaseName"]]["avatarImages"]
+
+    state: dict = {}
+    if args.metrics_port:
+        serve_metrics(args.metrics_port, state)
+        print(f"Serving metrics on :{args.metrics_port}/metrics")
+
+    rng = random.Random(args.seed)
+    regressions = 0
+    while True:
+        started = time.time()
+        try:
+            results = sample_shapes(collection, args.avatars, args.repeats, rng)
+            summary = record_run(conn, results, args)
+            print_summary(summary)
+            regressions = sum(row["regression"] for row in summary)
+
+            state["metrics"] = render_metrics(summary, started)
+            if args.metrics_file:
+                write_metrics_file(args.metrics_file, state["metrics"])
+        except Exception as e:
+            if args.once:
+                raise
+            print(f"Monitor run failed: {e}")
+
+        if args.once:
+            return 1 if regressions else 0
+        time.sleep(max(0.0, args.interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+mongo_seed_avatars.py
+---------------------
+Fill a local MongoDB `avatarImages` collection with synthetic documents so the
+avatar benchmarks (mongo_perf_test.py / mongo_bench_all.py) can run at
+1x / 10x / 100x the size of the dev database.
+
+Each synthetic original avatar gets:
+- an "original" doc (imageData + thumbnailData payloads)
+- "emotion_generated" variants for a random subset of EMOTIONS
+- optional duplicate variants (older createdAt) at --duplicate-rate, so
+  cleanup_duplicates has something realistic to chew on
+
+Payloads are real images (PNG originals, WebP thumbnails) drawn with PIL:
+a colour gradient with a noise patch, sized so the encoded file lands near
+a log-normal target around --full-kb / --thumb-kb. Gradients compress and
+noise does not, so gzip/zstd and re-encoding benchmarks see image-like data.
+Documents (ids, payloads, createdAt relative to the seeding time) are
+deterministic for a given --seed; they are inserted as parallel unordered
+insert_many batches. Seeding again without --drop (e.g. 1x, then 10x) keeps
+the docs that are already there and only adds the missing ones.
+
+Usage:
+    python3 mongo_seed_avatars.py --scale 1 --drop                 # 26 originals
+    python3 mongo_seed_avatars.py --scale 100 --workers 8          # 2600 originals
+    python3 mongo_seed_avatars.py --full-kb 200 --thumb-kb 8       # lighter payloads
+    python3 mongo_bench_all.py --mongo-uri mongodb://localhost:27017 --db KanKanDB_perf
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from PIL import Image
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import BulkWriteError
+
+EMOTIONS = [
+    "angry", "smile", "sad", "happy", "crying",
+    "thinking", "surprised", "neutral", "excited",
+]
+
+BASE_ORIGINALS = 26  # originals in the dev database today
+
+_PIL_FORMATS = {"image/png": "PNG", "image/jpeg": "JPEG", "image/webp": "WEBP"}
+
+
+# ---------------------------------------------------------------------------
+# Document generation
+# ---------------------------------------------------------------------------
+
+def _draw(rng: random.Random, side: int, noise_px: int) -> Image.Image:
+    """side x side gradient between two random colours with a square noise patch of ~noise_px pixels."""
+    ramp = Image.linear_gradient("L").resize((side, side))
+    start = Image.new("RGB", (side, side), tuple(rng.randrange(256) for _ in range(3)))
+    end = Image.new("RGB", (side, side), tuple(rng.randrange(256) for _ in range(3)))
+    img = Image.composite(end, start, ramp)
+    patch = min(side, max(1, int(math.sqrt(noise_px))))
+    img.paste(Image.frombytes("RGB", (patch, patch), rng.randbytes(patch * patch * 3)),
+              (rng.randrange(side - patch + 1), rng.randrange(side - patch + 1)))
+    return img
+
+
+def _encode(img: Image.Image, content_type: str) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=_PIL_FORMATS[content_type], quality=80)
+    return buf.getvalue()
+
+
+def _payload(rng: random.Random, median_kb: float, sigma: float, content_type: str) -> bytes:
+    """An encoded image whose size is close to a log-normal draw around median_kb."""
+    target = max(1024, int(rng.lognormvariate(math.log(median_kb * 1024), sigma)))
+    # Noise costs about 3 bytes/pixel in PNG; start there, then rescale once from the measured size.
+    noise_px = target // 3
+    seed = rng.randbytes(8)
+    data = b""
+    for _ in range(2):
+        side = max(32, int(math.sqrt(noise_px * 1.5)))
+        data = _encode(_draw(random.Random(seed), side, noise_px), content_type)
+        scale = target / max(1, len(data))
+        if 0.8 < scale < 1.25:
+            break
+        noise_px = max(1, int(noise_px * scale))
+    return data
+
+
+def _image_doc(rng: random.Random, args, *, user_id: str, created_at: datetime,
+               image_type: str, emotion: str | None, source_id: str | None) -> dict:
+    image_data = _payload(rng, args.full_kb, args.size_sigma, "image/png")
+    thumb_data = _payload(rng, args.thumb_kb, args.size_sigma, "image/webp")
+    oid = ObjectId(rng.randbytes(12))
+    suffix = f"_{emotion}" if emotion else ""
+    return {
+        "_id": oid,
+        "userId": user_id,
+        "imageType": image_type,
+        "emotion": emotion,
+        "imageData": image_data,
+        "thumbnailData": thumb_data,
+        "thumbnailContentType": "image/webp",
+        "contentType": "image/png",
+        "fileName": f"avatar_{oid}{suffix}.png",
+        "fileSize": len(image_data),
+        "sourceAvatarId": source_id,
+        "generationPrompt": f"make the person look {emotion}" if emotion else None,
+        "createdAt": created_at,
+        "updatedAt": created_at,
+    }
+
+
+def build_batch(batch_index: int, originals: int, args) -> list[dict]:
+    """Build the docs for `originals` original avatars (plus their variants)."""
+    rng = random.Random(f"{args.seed}:{batch_index}")
+    now = datetime.now(timezone.utc)
+    docs: list[dict] = []
+
+    for i in range(originals):
+        global_index = batch_index * args.batch_size + i
+        user_id = f"seed_user_{global_index // args.avatars_per_user:07d}"
+        created_at = now - timedelta(days=rng.uniform(1, 365))
+        original = _image_doc(rng, args, user_id=user_id, created_at=created_at,
+                              image_type="original", emotion=None, source_id=None)
+        docs.append(original)
+
+        if rng.random() >= args.generated_ratio:
+            continue
+
+        source_id = str(original["_id"])
+        emotions = rng.sample(EMOTIONS, rng.randint(args.min_emotions, len(EMOTIONS)))
+        for emotion in emotions:
+            gen_at = created_at + timedelta(minutes=rng.uniform(1, 60 * 24 * 30))
+            docs.append(_image_doc(rng, args, user_id=user_id, created_at=gen_at,
+                                   image_type="emotion_generated", emotion=emotion,
+                                   source_id=source_id))
+            # Duplicates are older regenerations of the same (sourceAvatarId, emotion).
+            while rng.random() < args.duplicate_rate:
+                gen_at -= timedelta(minutes=rng.uniform(1, 600))
+                docs.append(_image_doc(rng, args, user_id=user_id, created_at=gen_at,
+                                       image_type="emotion_generated", emotion=emotion,
+                                       source_id=source_id))
+    return docs
+
+
+def _insert(collection, chunk: list[dict]) -> int:
+    """insert_many that skips docs already present (same seed, no --drop); returns how many were skipped."""
+    try:
+        collection.insert_many(chunk, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors) or e.details.get("writeConcernErrors"):
+            raise
+        return len(errors)
+    return 0
+
+
+def insert_batch(collection, batch_index: int, originals: int, args) -> dict:
+    docs = build_batch(batch_index, originals, args)
+    payload_bytes = sum(len(d["imageData"]) + len(d["thumbnailData"]) for d in docs)
+    generated = sum(1 for d in docs if d["imageType"] == "emotion_generated")
+
+    # Keep each insert_many well under the 48 MB wire message limit.
+    chunk: list[dict] = []
+    chunk_bytes = 0
+    existing = 0
+    for doc in docs:
+        doc_bytes = len(doc["imageData"]) + len(doc["thumbnailData"])
+        if chunk and (len(chunk) >= args.insert_chunk or chunk_bytes + doc_bytes > args.max_chunk_mb * 1_000_000):
+            existing += _insert(collection, chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append(doc)
+        chunk_bytes += doc_bytes
+    if chunk:
+        existing += _insert(collection, chunk)
+
+    return {"docs": len(docs), "originals": originals, "generated": generated, "bytes": payload_bytes,
+            "existing": existing}
+
+
+# ---------------------------------------------------------------------------
+# Indexes (mirror KanKan/server/Storage/MongoDbInitializer.cs)
+# ---------------------------------------------------------------------------
+
+def ensure_indexes(collection) -> None:
+    collection.create_index([("userId", ASCENDING), ("imageType", ASCENDING), ("emotion", ASCENDING)])
+    collection.create_index([("sourceAvatarId", ASCENDING), ("imageType", ASCENDING), ("emotion", ASCENDING)])
+    collection.create_index([("userId", ASCENDING), ("fileName", ASCENDING), ("imageType", ASCENDING)])
+    collection.create_index([
+        ("imageType", ASCENDING), ("emotion", ASCENDING), ("sourceAvatarId", ASCENDING),
+        ("userId", ASCENDING), ("fileName", ASCENDING), ("createdAt", DESCENDING),
+    ])
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Seed a local avatarImages collection with synthetic data")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017", help="Target MongoDB connection string")
+    parser.add_argument("--db", default="KanKanDB_perf", help="Target database name")
+    parser.add_argument("--collection", default="avatarImages", help="Target collection name")
+    parser.add_argument("--scale", type=float, default=1.0, help=f"Multiplier over the {BASE_ORIGINALS} dev originals")
+    parser.add_argument("--originals", type=int, default=0, help="Exact number of originals (overrides --scale)")
+    parser.add_argument("--avatars-per-user", type=int, default=2, help="Originals owned by each synthetic user")
+    parser.add_argument("--generated-ratio", type=float, default=0.5, help="Fraction of originals with emotion variants")
+    parser.add_argument("--min-emotions", type=int, default=3, help="Minimum emotions generated per avatar")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="Chance of an extra duplicate per variant")
+    parser.add_argument("--thumb-kb", type=float, default=12.0, help="Median thumbnail payload size (KB)")
+    parser.add_argument("--full-kb", type=float, default=1500.0, help="Median full image payload size (KB)")
+    parser.add_argument("--size-sigma", type=float, default=0.35, help="Log-normal sigma for payload sizes")
+    parser.add_argument("--batch-size", type=int, default=50, help="Originals generated per worker batch")
+    parser.add_argument("--insert-chunk", type=int, default=100, help="Max docs per insert_many call")
+    parser.add_argument("--max-chunk-mb", type=float, default=32.0, help="Max payload MB per insert_many call")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel insert workers")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed for reproducible datasets")
+    parser.add_argument("--drop", action="store_true", help="Drop the target collection before seeding")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow a non-localhost --mongo-uri")
+    args = parser.parse_args()
+
+    if not args.allow_remote and not any(h in args.mongo_uri for h in ("localhost", "127.0.0.1")):
+        print(f"Refusing to seed non-local MongoDB {args.mongo_uri!r} (pass --allow-remote to override).")
+        return 1
+    if not 0 <= args.duplicate_rate < 1:
+        print("--duplicate-rate must be in [0, 1).")
+        return 1
+
+    total_originals = args.originals or max(1, round(BASE_ORIGINALS * args.scale))
+    args.min_emotions = max(1, min(args.min_emotions, len(EMOTIONS)))
+
+    client = MongoClient(args.mongo_uri)
+    collection = client[args.db][args.collection]
+
+    if args.drop:
+        print(f"Dropping {args.db}.{args.collection}")
+        collection.drop()
+    ensure_indexes(collection)
+
+    batches = []
+    remaining = total_originals
+    while remaining > 0:
+        size = min(args.batch_size, remaining)
+        batches.append(size)
+        remaining -= size
+
+    print(f"Seeding {total_originals} originals into {args.db}.{args.collection} "
+          f"({len(batches)} batches, {args.workers} workers)")
+
+    totals = {"docs": 0, "originals": 0, "generated": 0, "bytes": 0, "existing": 0}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(insert_batch, collection, i, size, args) for i, size in enumerate(batches)]
+        for done, future in enumerate(as_completed(futures), start=1):
+            stats = future.result()
+            for key in totals:
+                totals[key] += stats[key]
+            elapsed = time.perf_counter() - start
+            print(f"  batch {done}/{len(batches)}  docs={totals['docs']}  "
+                  f"MB={totals['bytes'] / 1_000_000:.1f}  docs/s={totals['docs'] / elapsed:.0f}")
+
+    elapsed = time.perf_counter() - start
+    print(f"\nDone in {elapsed:.1f}s: originals={totals['originals']} generated={totals['generated']} "
+          f"docs={totals['docs']} alreadyPresent={totals['existing']} payloadMB={totals['bytes'] / 1_000_000:.1f} "
+          f"collectionCount={collection.estimated_document_count()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks and memory regression checks for the dataset scripts' hot functions.
+
+Cases (each runs on synthetic, seeded fixtures):
+
+    sanitize_json_text      whole messy Alpaca file            clean_alpaca_json.py
+    extract_json_objects    whole messy Alpaca file            clean_alpaca_json.py
+    parse_messy_file        whole messy Alpaca file            clean_alpaca_json.py
+    strip_markdown_basic    every document of the Markdown tree, drop_code_blocks=True
+    normalize_one_line      every document of the Markdown tree
+    iter_md_files           full scan of the Markdown tree     mdtotext.py
+    level_order_traversal   TreeNode tree                      Family/a.py
+
+Tiers pick the fixture sizes:
+
+    small    1 MB messy Alpaca,    1k Markdown files,   100k tree nodes   (default, seconds)
+    medium   100 MB,             100k files,              1M nodes
+    large    1 GB,               100k files,              5M nodes        (needs tens of GB of RAM)
+
+Fixtures are written once under --fixtures and reused. Each case is timed
+--repeat times (the best run counts), then run once more under tracemalloc
+for its peak Python allocation, which only counts memory allocated by the
+call itself (fixture setup is excluded) and does not depend on the machine.
+
+Results are compared with --baseline (perf_baseline.json next to this
+script). A case regresses when it is more than --time-tolerance slower or
+uses more than --mem-tolerance more peak memory than its baseline; the
+script then exits with status 1. Timings depend on the machine, so record a
+baseline on the machine that runs the check (--update-baseline) and commit
+it together with the change that moved the numbers.
+
+Usage:
+    python3 perf_suite.py                                  # small tier, check against the baseline
+    python3 perf_suite.py --tier medium --cases parse_messy_file iter_md_files
+    python3 perf_suite.py --tier small --update-baseline
+    python3 perf_suite.py --json results.json --no-check
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Family"))
+
+from a import TreeNode, level_order_traversal   # noqa: E402
+from clean_alpaca_json import extract_json_objects, parse_messy_file, sanitize_json_text   # noqa: E402
+from mdtotext import _normalize_one_line, _strip_markdown_basic, iter_md_files   # noqa: E402
+
+TIERS = {
+    "small": {"alpaca_mb": 1, "md_files": 1_000, "tree_nodes": 100_000},
+    "medium": {"alpaca_mb": 100, "md_files": 100_000, "tree_nodes": 1_000_000},
+    "large": {"alpaca_mb": 1024, "md_files": 100_000, "tree_nodes": 5_000_000},
+}
+DEFAULT_BASELINE = Path(__file__).resolve().with_name("perf_baseline.json")
+DEFAULT_FIXTURES = Path(tempfile.gettempdir()) / "dataset_perf_fixtures"
+
+_WORDS = ("pacing budget bidder auction shard replica latency throughput index cache eviction "
+          "timeout retry backoff quorum leader follower partition rebalance checkpoint snapshot "
+          "serving model feature pipeline flight experiment rollout rollback alert dashboard").split()
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _messy_response(rng: random.Random) -> str:
+    """One LLM response the way qagen.py gets them: prose, a code fence, broken JSON lines."""
+    lines = ["Here are the Q&A pairs:", "```json"]
+    for _ in range(rng.randint(5, 20)):
+        output = "\n".join(_sentence(rng, rng.randint(8, 30)) for _ in range(rng.randint(1, 4)))
+        roll = rng.random()
+        if roll < 0.15:
+            output += r" Check C:\Users\svc\logs and \q flags."           # invalid escapes
+        elif roll < 0.25:
+            output += " Raw \x0b control \x01 chars."
+        elif roll < 0.35:
+            output += ' Braces {"inside": [1, 2]} a string.'
+        text = json.dumps({"instruction": _sentence(rng, rng.randint(6, 16)).rstrip(".") + "?",
+                           "input": "", "output": output}, ensure_ascii=False)
+        if roll < 0.15:
+            text = text.replace("\\\\", "\\")
+        elif roll < 0.25:
+            text = text.replace("\\u000b", "\x0b").replace("\\u0001", "\x01")
+        lines.append(text)
+    lines.append("```")
+    if rng.random() < 0.3:
+        lines.append("Let me know if you need more questions.")
+    return "\n".join(lines) + "\n"
+
+
+def make_messy_alpaca(path: Path, size_mb: int, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    tmp = path.with_name(path.name + ".tmp")
+    written = 0
+    with tmp.open("w", encoding="utf-8") as f:
+        while written < target:
+            chunk = _messy_response(rng)
+            f.write(chunk)
+            written += len(chunk.encode("utf-8"))
+    tmp.replace(path)
+
+
+def _markdown_doc(rng: random.Random, i: int) -> str:
+    parts = []
+    if rng.random() < 0.3:
+        parts.append(f"---\ntitle: doc {i}\nowner: team-{rng.randint(1, 40)}\n---\n")
+    parts.append(f"# {_sentence(rng, rng.randint(2, 6)).rstrip('.')}\n")
+    for _ in range(rng.randint(2, 8)):
+        roll = rng.random()
+        if roll < 0.15:
+            parts.append(f"```bash\nkubectl get pods -n {rng.choice(_WORDS)}\n{_sentence(rng, 6)}\n```\n")
+        elif roll < 0.35:
+            parts.append("\n".join(f"- {_sentence(rng, rng.randint(3, 10))}" for _ in range(rng.randint(2, 6))) + "\n")
+        elif roll < 0.45:
+            parts.append(f"> {_sentence(rng, 12)}\n")
+        elif roll < 0.55:
+            parts.append(f"## {_sentence(rng, 3).rstrip('.')}\n\nSee [the runbook](https://wiki/{i}) and "
+                         f"`{rng.choice(_WORDS)}_{rng.choice(_WORDS)}` <b>now</b>.\n")
+        else:
+            parts.append(" ".join(_sentence(rng, rng.randint(8, 25)) for _ in range(rng.randint(2, 6))) + "\n")
+    return "\n".join(parts)
+
+
+def make_markdown_tree(root: Path, files: int, seed: int = 1, per_dir: int = 100) -> None:
+    """`files` Markdown files, `per_dir` per directory, two directory levels, plus some non-Markdown files."""
+    rng = random.Random(seed)
+    for i in range(files):
+        d = i // per_dir
+        folder = root / f"area{d // 100:03d}" / f"svc{d % 100:02d}"
+        if i % per_dir == 0:
+            folder.mkdir(parents=True, exist_ok=True)
+            (folder / "config.yaml").write_text("name: svc\n", encoding="utf-8")
+        (folder / f"doc{i:06d}.md").write_text(_markdown_doc(rng, i), encoding="utf-8")
+    (root / ".complete").write_text(str(files), encoding="utf-8")
+
+
+def make_tree(nodes: int, seed: int = 1) -> TreeNode:
+    """Random tree where node i hangs under a node in [i/4, i/2], so levels grow roughly geometrically."""
+    rng = random.Random(seed)
+    all_nodes = [TreeNode(0)]
+    for i in range(1, nodes):
+        node = TreeNode(i)
+        all_nodes[rng.randint(i // 4, (i - 1) // 2)].children.append(node)
+        all_nodes.append(node)
+    return all_nodes[0]
+
+
+class Fixtures:
+    """Fixture files for one tier, created on first use."""
+
+    def __init__(self, directory: Path, tier: str):
+        self.dir = directory
+        self.sizes = TIERS[tier]
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._text: Optional[str] = None
+        self._docs: Optional[List[str]] = None
+
+    def alpaca_path(self) -> Path:
+        path = self.dir / f"messy_alpaca_{self.sizes['alpaca_mb']}mb.txt"
+        if not path.exists():
+            print(f"writing {path} ...", file=sys.stderr)
+            make_messy_alpaca(path, self.sizes["alpaca_mb"])
+        return path
+
+    def alpaca_text(self) -> str:
+        if self._text is None:
+            self._text = self.alpaca_path().read_text(encoding="utf-8")
+        return self._text
+
+    def md_root(self) -> Path:
+        root = self.dir / f"markdown_{self.sizes['md_files']}"
+        if not (root / ".complete").exists():
+            print(f"writing {root} ...", file=sys.stderr)
+            make_markdown_tree(root, self.sizes["md_files"])
+        return root
+
+    def md_docs(self) -> List[str]:
+        if self._docs is None:
+            self._docs = [p.read_text(encoding="utf-8") for p in sorted(self.md_root().rglob("*.md"))]
+        return self._docs
+
+
+# ---------------------------------------------------------------------------
+# Cases
+# ---------------------------------------------------------------------------
+
+def _strip_all(docs: List[str]) -> int:
+    return sum(len(_strip_markdown_basic(d, drop_code_blocks=True)) for d in docs)
+
+
+def _normalize_all(docs: List[str]) -> int:
+    return sum(len(_normalize_one_line(d)) for d in docs)
+
+
+# name -> setup(fixtures) returning a zero-argument callable to measure
+CASES: Dict[str, Callable[[Fixtures], Callable[[], object]]] = {
+    "sanitize_json_text": lambda fx: (lambda text=fx.alpaca_text(): sanitize_json_text(text)),
+    "extract_json_objects": lambda fx: (lambda text=fx.alpaca_text(): extract_json_objects(text)),
+    "parse_messy_file": lambda fx: (lambda text=fx.alpaca_text(): parse_messy_file(text)),
+    "strip_markdown_basic": lambda fx: (lambda docs=fx.md_docs(): _strip_all(docs)),
+    "normalize_one_line": lambda fx: (lambda docs=fx.md_docs(): _normalize_all(docs)),
+    "iter_md_files": lambda fx: (lambda root=fx.md_root(): list(iter_md_files(root, follow_symlinks=False))),
+    "level_order_traversal": lambda fx: (lambda root=make_tree(fx.sizes["tree_nodes"]): level_order_traversal(root)),
+}
+
+
+def measure(fn: Callable[[], object], repeat: int, memory: bool = True) -> Tuple[float, Optional[float]]:
+    """(best wall time in seconds, peak traced allocation in MB or None)."""
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        gc.disable()   # as timeit does; collections triggered by fixture objects are noise
+        try:
+            start = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+        del result
+    if not memory:
+        return best, None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+# ---------------------------------------------------------------------------
+# Baseline
+# ---------------------------------------------------------------------------
+
+def load_baseline(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def compare(result: dict, base: Optional[dict], time_tol: float, mem_tol: float,
+            min_time_s: float, min_mem_mb: float) -> List[str]:
+    """Regression messages for one case (empty when within tolerance or without a baseline)."""
+    if not base:
+        return []
+    problems = []
+    t, bt = result["time_s"], base.get("time_s")
+    if bt is not None and t > bt * (1 + time_tol) and t - bt > min_time_s:
+        problems.append(f"time {t:.3f}s vs baseline {bt:.3f}s (+{t / bt - 1:.0%})")
+    m, bm = result.get("peak_mb"), base.get("peak_mb")
+    if m is not None and bm is not None and m > bm * (1 + mem_tol) and m - bm > min_mem_mb:
+        problems.append(f"peak {m:.1f} MB vs baseline {bm:.1f} MB (+{m / bm - 1:.0%})")
+    return problems
+
+
+def _fmt(value: Optional[float], digits: int) -> str:
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def _delta(value: Optional[float], base: Optional[float]) -> str:
+    if value is None or not base:
+        return "-"
+    return f"{value / base - 1:+.0%}"
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Benchmark the dataset scripts' hot functions against a stored baseline")
+    p.add_argument("--tier", choices=sorted(TIERS), default="small", help="Fixture sizes (see module docstring)")
+    p.add_argument("--cases", nargs="*", choices=sorted(CASES), help="Only these cases (default: all)")
+    p.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES, help="Directory for generated fixtures")
+    p.add_argument("--repeat", type=int, default=5, help="Timed runs per case (best counts)")
+    p.add_argument("--no-memory", dest="memory", action="store_false", help="Skip the tracemalloc run")
+    p.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON")
+    p.add_argument("--update-baseline", action="store_true", help="Store these results as the tier's baseline")
+    p.add_argument("--no-check", dest="check", action="store_false", help="Report only, never fail")
+    p.add_argument("--time-tolerance", type=float, default=0.30, help="Allowed slowdown (0.30 = 30%%)")
+    p.add_argument("--mem-tolerance", type=float, default=0.10, help="Allowed peak memory growth (0.10 = 10%%)")
+    p.add_argument("--min-time-delta", type=float, default=0.005,
+                   help="Ignore slowdowns smaller than this many seconds (timer noise)")
+    p.add_argument("--min-mem-delta", type=float, default=0.5, help="Ignore peak growth below this many MB")
+    p.add_argument("--json", type=Path, help="Also write the results as JSON")
+    args = p.parse_args()
+
+    fixtures = Fixtures(args.fixtures / args.tier, args.tier)
+    baseline = load_baseline(args.baseline)
+    tier_base = baseline.get(args.tier, {})
+    names = args.cases or list(CASES)
+
+    print(f"tier={args.tier} " + " ".join(f"{k}={v}" for k, v in fixtures.sizes.items())
+          + f" python={platform.python_version()}")
+    print(f"{'case':<24}{'time_s':>10}{'base_s':>10}{'dt':>7}{'peak_mb':>10}{'base_mb':>10}{'dm':>7}  status")
+    results: Dict[str, dict] = {}
+    failures = []
+    for name in names:
+        fn = CASES[name](fixtures)
+        t, peak = measure(fn, args.repeat, args.memory)
+        del fn
+        result = {"time_s": round(t, 6), "peak_mb": None if peak is None else round(peak, 3)}
+        results[name] = result
+        base = tier_base.get(name)
+        problems = compare(result, base, args.time_tolerance, args.mem_tolerance,
+                           args.min_time_delta, args.min_mem_delta)
+        status = "REGRESSED" if problems else ("ok" if base else "no baseline")
+        failures.extend(f"{name}: {msg}" for msg in problems)
+        bt = base.get("time_s") if base else None
+        bm = base.get("peak_mb") if base else None
+        print(f"{name:<24}{_fmt(t, 4):>10}{_fmt(bt, 4):>10}{_delta(t, bt):>7}"
+              f"{_fmt(peak, 2):>10}{_fmt(bm, 2):>10}{_delta(peak, bm):>7}  {status}")
+
+    if args.json:
+        args.json.write_text(json.dumps({"tier": args.tier, "results": results}, indent=2) + "\n", encoding="utf-8")
+    if args.update_baseline:
+        merged = dict(tier_base)
+        for name, result in results.items():
+            if result["peak_mb"] is None and name in merged:
+                result = dict(result, peak_mb=merged[name].get("peak_mb"))
+            merged[name] = result
+        baseline[args.tier] = merged
+        baseline.setdefault("_machine", {})[args.tier] = {"python": platform.python_version(),
+                                                          "platform": platform.platform()}
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"baseline updated: {args.baseline} [{args.tier}]")
+        return 0
+    if failures and args.check:
+        print("\n".join(["regressions:"] + [f"  {f}" for f in failures]))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Lightweight spans, counters and sampled profiling for the dataset scripts.
+
+    tracer = Tracer(enabled=bool(args.trace))
+    with tracer.span("strip_markdown", path=str(p)):
+        ...
+    tracer.count("bytes_read", len(raw))
+    tracer.write_chrome_trace("trace.json")   # open in chrome://tracing or Perfetto
+    print(tracer.summary())
+
+When disabled, span() returns one shared no-op context manager and count()
+returns immediately, so instrumented code pays an attribute check and a
+method call per span. Spans are thread-safe and carry the thread id, so the
+pipeline's worker pools show up as separate tracks in the trace viewer.
+
+Profiler runs cProfile (per thread, as cProfile only sees the thread that
+enabled it) and tracemalloc around every Nth item of each stage, then merges
+the samples into one pstats report and one allocation-site report.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False, max_events: int = 1_000_000):
+        self.enabled = enabled
+        self.max_events = max_events
+        self.lock = threading.Lock()
+        self.events: List[tuple] = []      # (name, start_ns, dur_ns, tid, args)
+        self.dropped = 0
+        self.totals: Dict[str, List[int]] = defaultdict(list)   # name -> durations (ns)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name: str, n: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += n
+
+    def iter(self, name: str, iterable: Iterable) -> Iterator:
+        """Yield from `iterable`, timing each step (e.g. the directory walk between files)."""
+        if not self.enabled:
+            yield from iterable
+            return
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter_ns()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self._record(name, start, time.perf_counter_ns() - start, None)
+            yield item
+
+    def _record(self, name: str, start: int, dur: int, args: Optional[dict]) -> None:
+        tid = threading.get_ident()
+        with self.lock:
+            self.totals[name].append(dur)
+            if len(self.events) < self.max_events:
+                self.events.append((name, start, dur, tid, args))
+            else:
+                self.dropped += 1
+
+    # -- export ---------------------------------------------------------------
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Chrome trace event format (complete "X" events plus final counter values)."""
+        pid = os.getpid()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        with self.lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        trace = []
+        for tid in {e[3] for e in events}:
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                          "args": {"name": names.get(tid, str(tid))}})
+        for name, start, dur, tid, args in events:
+            event = {"name": name, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": (start - self.origin) / 1000, "dur": dur / 1000}
+            if args:
+                event["args"] = args
+            trace.append(event)
+        end = max((e[1] + e[2] for e in events), default=self.origin)
+        for name, value in counters.items():
+            trace.append({"name": name, "ph": "C", "pid": pid, "ts": (end - self.origin) / 1000,
+                          "args": {name: value}})
+        Path(path).write_text(json.dumps({"traceEvents": trace, "displayTimeUnit": "ms"}) + "\n",
+                              encoding="utf-8")
+
+    def summary_rows(self) -> List[dict]:
+        rows = []
+        with self.lock:
+            totals = {k: sorted(v) for k, v in self.totals.items()}
+        for name, durs in totals.items():
+            n = len(durs)
+            rows.append({
+                "span": name,
+                "count": n,
+                "total_s": sum(durs) / 1e9,
+                "mean_ms": sum(durs) / n / 1e6,
+                "p50_ms": durs[n // 2] / 1e6,
+                "p95_ms": durs[min(n - 1, int(n * 0.95))] / 1e6,
+                "max_ms": durs[-1] / 1e6,
+            })
+        rows.sort(key=lambda r: r["total_s"], reverse=True)
+        return rows
+
+    def summary(self) -> str:
+        lines = [f"{'span':<24}{'count':>9}{'total_s':>10}{'mean_ms':>10}{'p50_ms':>10}{'p95_ms':>10}{'max_ms':>10}"]
+        for r in self.summary_rows():
+            lines.append(f"{r['span']:<24}{r['count']:>9}{r['total_s']:>10.3f}{r['mean_ms']:>10.3f}"
+                         f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['max_ms']:>10.3f}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"counter {name}={value}")
+        if self.dropped:
+            lines.append(f"({self.dropped} events over max_events kept only in the summary)")
+        return "\n".join(lines)
+
+    def write_summary_json(self, path: Path) -> None:
+        Path(path).write_text(json.dumps({"spans": self.summary_rows(), "counters": dict(self.counters)},
+                                         indent=2) + "\n", encoding="utf-8")
+
+
+class Profiler:
+    """cProfile + tracemalloc around every `every`-th sample() call per key.
+
+    Only one sample runs at a time (Python 3.12+ refuses concurrent cProfile
+    instances); a due sample that finds another one active is skipped.
+    tracemalloc only runs during a sample, so unsampled items are not slowed
+    down by allocation tracing.
+    """
+
+    def __init__(self, every: int = 0, frames: int = 1):
+        self.every = every
+        self.frames = frames
+        self.lock = threading.Lock()
+        self.seen: Dict[str, int] = defaultdict(int)
+        self.profiles: List[cProfile.Profile] = []
+        self.samples = 0
+        self.active = False
+        self.peak = 0
+        self.retained: Dict[str, int] = defaultdict(int)   # "file:line" -> bytes still alive after a sample
+
+    def sample(self, key: str):
+        if not self.every:
+            return _NULL_SPAN
+        with self.lock:
+            self.seen[key] += 1
+            if (self.seen[key] - 1) % self.every or self.active:
+                return _NULL_SPAN
+            self.active = True
+            self.samples += 1
+        return self._profile()
+
+    @contextmanager
+    def _profile(self):
+        tracemalloc.start(self.frames)
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ))
+            _, peak = tracemalloc.get_traced_memory()
+            with self.lock:
+                self.profiles.append(prof)
+                self.peak = max(self.peak, peak)
+                for stat in snapshot.statistics("lineno")[:50]:
+                    frame = stat.traceback[0]
+                    self.retained[f"{frame.filename}:{frame.lineno}"] += stat.size
+            tracemalloc.stop()
+            self.active = False
+
+    def report(self, top: int = 20, out: Optional[Path] = None) -> str:
+        if not self.profiles:
+            return "profile: no samples"
+        stats = pstats.Stats(self.profiles[0], stream=io.StringIO())
+        for prof in self.profiles[1:]:
+            stats.add(prof)
+        if out is not None:
+            stats.dump_stats(str(out))
+        buf = io.StringIO()
+        stats.stream = buf
+        stats.sort_stats("cumulative").print_stats(top)
+        text = [f"profile: {self.samples} sampled items", buf.getvalue().rstrip(),
+                f"tracemalloc: peak={self.peak / 1e6:.1f} MB while sampling (includes other threads); "
+                f"top retained allocation sites:"]
+        for site, size in sorted(self.retained.items(), key=lambda kv: kv[1], reverse=True)[:10]:
+            text.append(f"  {size / 1024:>10.1f} KiB  {site}")
+        return "\n".join(text)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Prefix-cache-friendly ordering of generate_alpaca requests, and a benchmark.
+
+Every qagen.generate_alpaca call sends the same system prompt and instruction
+block. qagen.build_messages puts that shared template first and the source
+text last, so a server with a prefix cache (sglang RadixAttention) only
+prefills the template once. order_paths then orders the documents so that
+requests with shared content run back to back:
+
+    1. by directory (sibling documents usually share boilerplate, templates
+       and vocabulary, and whole directories stay together)
+    2. by the first Markdown heading, case-folded, inside a directory
+    3. by file name
+
+With N requests in flight, the first N requests of a group would all be
+sent before any of them has put the group's shared content into the cache,
+so the first document of every group is sent N places early (--no-lead
+turns this off).
+
+Only the first --head-bytes of each file are read for the heading, so
+ordering a large tree costs one small read per file.
+
+--simulate estimates the prefix-cache hit rate offline (no server): prompts
+are tokenized (seq_pack.load_tokenizer), cut into --page-size token pages and
+looked up in an LRU cache of chained page hashes holding --cache-tokens
+tokens, the way paged prefix caches match prefixes. A request only sees pages
+of requests that finished before it, i.e. --concurrency requests earlier.
+
+--bench sends the real requests (streaming, --max-tokens output tokens, so
+it measures prefill) for the same documents in three variants and reports
+TTFT and the cache hit rate from usage.prompt_tokens_details.cached_tokens
+(start sglang with --enable-cache-report):
+
+    rglob   original layout, rglob order   (what qagen.py used to do)
+    prefix  shared-prefix layout, rglob order
+    sched   shared-prefix layout, order_paths order
+
+--flush-cache calls the server's /flush_cache between variants so each one
+starts cold. bench.py drives sglang.bench_serving for raw throughput; this
+measures what the generation scripts themselves send.
+
+Usage:
+    python3 prompt_schedule.py --root Q:/src --simulate --limit 2000
+    python3 prompt_schedule.py --root Q:/src --bench --limit 200 --concurrency 16 --flush-cache
+    python3 prompt_schedule.py --root Q:/src --print-order | head
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+import statistics
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+_HEADING_RE = re.compile(r"(?m)^\s{0,3}#{1,6}\s+(.+?)\s*#*\s*$")
+
+
+def first_heading(path: Path, head_bytes: int = 4096) -> str:
+    """First ATX heading within the first head_bytes of a Markdown file ('' if none)."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(head_bytes).decode("utf-8", errors="ignore")
+    except OSError:
+        return ""
+    m = _HEADING_RE.search(head)
+    return m.group(1).casefold() if m else ""
+
+
+def schedule_key(path: Path, root: Optional[Path] = None, head_bytes: int = 4096) -> Tuple:
+    rel = path.relative_to(root) if root is not None else path
+    return rel.parent.parts, first_heading(path, head_bytes), path.name.casefold()
+
+
+def order_paths(paths: Iterable[Path], root: Optional[Path] = None, head_bytes: int = 4096,
+                lead: int = 0) -> List[Path]:
+    """Documents grouped by directory, then by first heading (see module docstring).
+
+    With `lead` (the request concurrency), the first document of each group
+    is moved up to `lead` places earlier, into the previous group. Otherwise
+    the first `lead` requests of a group are all in flight before any of them
+    has filled the cache, and all of them prefill the group's shared content.
+    """
+    keyed = sorted(((schedule_key(p, root, head_bytes), p) for p in paths), key=lambda kp: kp[0])
+    order = [p for _, p in keyed]
+    if lead <= 0:
+        return order
+    starts = [i for i in range(1, len(keyed)) if keyed[i][0][:2] != keyed[i - 1][0][:2]]
+    prev = 0
+    for s in starts:
+        target = max(prev + 1, s - lead)
+        order.insert(target, order.pop(s))
+        prev = s
+    return order
+
+
+def render_prompt(messages: Sequence[dict]) -> str:
+    """Flat text of a chat request; close enough to the chat template for prefix matching."""
+    return "".join(f"<|{m['role']}|>\n{m['content']}\n" for m in messages)
+
+
+# ---------------------------------------------------------------------------
+# Offline estimate
+# ---------------------------------------------------------------------------
+
+class PrefixCacheSim:
+    """LRU cache of chained page hashes; a hit is the run of leading pages already cached."""
+
+    def __init__(self, capacity_tokens: int, page_size: int = 16):
+        self.page_size = page_size
+        self.capacity = max(1, capacity_tokens // page_size)
+        self.pages: "OrderedDict[bytes, None]" = OrderedDict()
+
+    def page_hashes(self, tokens: Sequence[str]) -> List[bytes]:
+        hashes = []
+        h = b""
+        for i in range(0, len(tokens) - self.page_size + 1, self.page_size):
+            h = hashlib.blake2b(h + "\x00".join(tokens[i:i + self.page_size]).encode("utf-8"),
+                                digest_size=16).digest()
+            hashes.append(h)
+        return hashes
+
+    def lookup(self, hashes: Sequence[bytes]) -> int:
+        """Cached tokens at the start of the prompt."""
+        hit = 0
+        for h in hashes:
+            if h not in self.pages:
+                break
+            self.pages.move_to_end(h)
+            hit += 1
+        return hit * self.page_size
+
+    def insert(self, hashes: Sequence[bytes]) -> None:
+        for h in hashes:
+            self.pages[h] = None
+            self.pages.move_to_end(h)
+        while len(self.pages) > self.capacity:
+            self.pages.popitem(last=False)
+
+
+def simulate(prompts: Iterable[str], tokenize: Callable[[str], List[str]], *, cache_tokens: int,
+             page_size: int = 16, concurrency: int = 1) -> Tuple[int, int]:
+    """(cached prompt tokens, total prompt tokens) for prompts sent in this order."""
+    cache = PrefixCacheSim(cache_tokens, page_size)
+    in_flight: List[List[bytes]] = []
+    hit = total = 0
+    for prompt in prompts:
+        tokens = tokenize(prompt)
+        hashes = cache.page_hashes(tokens)
+        if len(in_flight) >= max(1, concurrency):
+            cache.insert(in_flight.pop(0))
+        hit += cache.lookup(hashes)
+        total += len(tokens)
+        in_flight.append(hashes)
+    return hit, total
+
+
+# ---------------------------------------------------------------------------
+# Live benchmark
+# ---------------------------------------------------------------------------
+
+def timed_request(client, messages: List[dict], max_tokens: int) -> Tuple[float, int, Optional[int]]:
+    """(TTFT seconds, prompt tokens, cached prompt tokens or None) for one streaming request."""
+    start = time.perf_counter()
+    ttft = None
+    prompt_tokens, cached = 0, None
+    stream = client.chat.completions.create(model="default", temperature=0.9, max_tokens=max_tokens,
+                                            messages=messages, stream=True,
+                                            stream_options={"include_usage": True})
+    for chunk in stream:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - start
+        if chunk.usage is not None:
+            prompt_tokens = chunk.usage.prompt_tokens
+            details = getattr(chunk.usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", None) if details is not None else None
+    return (ttft if ttft is not None else time.perf_counter() - start), prompt_tokens, cached
+
+
+def run_variant(client, requests: List[List[dict]], *, concurrency: int, max_tokens: int) -> List[tuple]:
+    """Send requests in order, at most `concurrency` in flight; results in request order."""
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(timed_request, client, messages, max_tokens) for messages in requests]
+        return [f.result() for f in futures]
+
+
+def flush_cache(base_url: str) -> None:
+    server = base_url.rstrip("/")
+    if server.endswith("/v1"):
+        server = server[:-3]
+    urllib.request.urlopen(urllib.request.Request(f"{server}/flush_cache", method="POST"), timeout=30).read()
+
+
+def _report(name: str, results: List[tuple], elapsed: float) -> str:
+    ttfts = sorted(r[0] for r in results)
+    prompt = sum(r[1] for r in results)
+    cached = [r[2] for r in results if r[2] is not None]
+    rate = f"{sum(cached) / prompt:.1%}" if cached and prompt else "n/a"
+    p95 = ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))]
+    return (f"{name:<8}{len(results):>8}{prompt:>12}{rate:>10}{statistics.mean(ttfts) * 1000:>11.0f}"
+            f"{ttfts[len(ttfts) // 2] * 1000:>10.0f}{p95 * 1000:>10.0f}{elapsed:>10.1f}")
+
+
+def main() -> int:
+    from mdtotext import _normalize_one_line, iter_md_files
+    from seq_pack import load_tokenizer
+
+    p = argparse.ArgumentParser(description="Order generate_alpaca requests for prefix-cache reuse and measure it")
+    p.add_argument("--root", type=Path, required=True, help="Root directory to scan for *.md")
+    p.add_argument("--limit", type=int, default=0, help="Use the first N files in rglob order (0 = all)")
+    p.add_argument("--max-chars", type=int, default=8000, help="Truncate each document to N chars (0 = no truncation)")
+    p.add_argument("--head-bytes", type=int, default=4096, help="Bytes read per file to find its first heading")
+    p.add_argument("--no-lead", dest="lead", action="store_false",
+                   help="Do not send each group's first document --concurrency places early")
+    p.add_argument("--print-order", action="store_true", help="Print the scheduled order and exit")
+    p.add_argument("--simulate", action="store_true", help="Estimate cache hit rates offline")
+    p.add_argument("--tokenizer", default="chars:4", help="Tokenizer spec for --simulate (see seq_pack.py)")
+    p.add_argument("--cache-tokens", type=int, default=1_000_000, help="Simulated prefix cache size in tokens")
+    p.add_argument("--page-size", type=int, default=16, help="Simulated cache page size in tokens")
+    p.add_argument("--bench", action="store_true", help="Send the requests and measure TTFT / cached tokens")
+    p.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    p.add_argument("--max-tokens", type=int, default=16, help="Output tokens per benchmark request")
+    p.add_argument("--flush-cache", action="store_true", help="POST /flush_cache before each variant")
+    args = p.parse_args()
+
+    paths = []
+    for path in iter_md_files(args.root, follow_symlinks=False):
+        paths.append(path)
+        if args.limit and len(paths) >= args.limit:
+            break
+    start = time.perf_counter()
+    scheduled = order_paths(paths, args.root, args.head_bytes, lead=args.concurrency if args.lead else 0)
+    print(f"files={len(paths)} order_s={time.perf_counter() - start:.2f}")
+    if args.print_order:
+        for path in scheduled:
+            print(path)
+        return 0
+
+    def text(path: Path) -> str:
+        raw = path.read_text(encoding="utf-8", errors="ignore")
+        return _normalize_one_line(raw[: args.max_chars] if args.max_chars else raw)
+
+    texts = {path: text(path) for path in paths}
+    from qagen import build_messages   # needs openai
+    variants = [
+        ("rglob", [build_messages(texts[p], prefix_first=False) for p in paths]),
+        ("prefix", [build_messages(texts[p]) for p in paths]),
+        ("sched", [build_messages(texts[p]) for p in scheduled]),
+    ]
+
+    if args.simulate:
+        tokenize = load_tokenizer(args.tokenizer)
+        print(f"simulated prefix cache: {args.cache_tokens} tokens, page={args.page_size}, "
+              f"concurrency={args.concurrency}")
+        for name, requests in variants:
+            hit, total = simulate((render_prompt(m) for m in requests), tokenize, cache_tokens=args.cache_tokens,
+                                  page_size=args.page_size, concurrency=args.concurrency)
+            print(f"{name:<8} prompt_tokens={total} cached={hit} hit_rate={hit / total if total else 0:.1%}")
+
+    if args.bench:
+        from qagen import client
+        print(f"{'variant':<8}{'requests':>8}{'prompt_tok':>12}{'cached':>10}{'ttft_ms':>11}{'p50_ms':>10}"
+              f"{'p95_ms':>10}{'wall_s':>10}")
+        for name, requests in variants:
+            if args.flush_cache:
+                flush_cache(str(client.base_url))
+            start = time.perf_counter()
+            results = run_variant(client, requests, concurrency=args.concurrency, max_tokens=args.max_tokens)
+            print(_report(name, results, time.perf_counter() - start))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
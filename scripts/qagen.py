@@ -1,19 +1,27 @@
 
-import openai
 from pathlib import Path
 
+from prompt_schedule import order_paths
+
+try:
+    import openai
+except ImportError:  # build_messages works without it; generating needs it
+    openai = None
+
 client = openai.Client(
     base_url="http://52.171.138.19:8001/v1",
     api_key="123",
+) if openai is not None else None
+
+SYSTEM_PROMPT = (
+    "You are a senior Ads infrastructure engineer.\n"
+    "You may reason internally, but you must NOT reveal chain-of-thought.\n"
+    "Do NOT emit <think>, analysis, or reasoning traces.\n"
+    "Provide only final answers with depth and technical precision.\n"
+    "Answers should read like production TSG documentation."
 )
 
-def generate_alpaca(chunk_text):
-    prompt = f"""
-
-You are generating expert-level troubleshooting and architecture Q&A.
-
-Source text:
-{chunk_text}
+INSTRUCTIONS = """You are generating expert-level troubleshooting and architecture Q&A.
 
 Instructions:
 - English only
@@ -22,7 +30,7 @@ Instructions:
 - Focus on mechanisms, tradeoffs, failure modes, and recovery
 - Avoid surface-level or definition-only answers
 - input must be ""
-- Output ONLY Alpaca JSON, one QA will be in one single line like {{"instruction:":... "input":"", "output":"..."}}
+- Output ONLY Alpaca JSON, one QA will be in one single line like {"instruction:":... "input":"", "output":"..."}
 - Output should have "instruction", "input" and "output", input should be always ""
 - Each Q&A must be ONE valid JSON object per line
 - Generate between 5 and 20 Q&A pairs (quality over quantity), overlap is not a concern
@@ -30,22 +38,33 @@ Instructions:
 """
 
 
+def build_messages(chunk_text, prefix_first=True):
+    """Chat messages for one document.
+
+    With prefix_first the system prompt and the instruction block form an
+    identical prefix for every request and the source text comes last, so the
+    server's prefix cache (sglang RadixAttention) can reuse it. prefix_first=False
+    is the original layout with the source text between heading and instructions.
+    """
+    if prefix_first:
+        prompt = f"{INSTRUCTIONS}\nSource text:\n{chunk_text}\n"
+    else:
+        heading, rest = INSTRUCTIONS.split("\n\n", 1)
+        prompt = f"\n\n{heading}\n\nSource text:\n{chunk_text}\n\n{rest}"
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def generate_alpaca(chunk_text, prefix_first=True):
+    if client is None:
+        raise SystemExit("generate_alpaca needs openai (pip install openai)")
     resp = client.chat.completions.create(
         model="default",
         temperature=0.9,
         max_tokens=120000,
-        messages=[
-            {"role": "system", 
-             "content": (
-                    "You are a senior Ads infrastructure engineer.\n"
-                    "You may reason internally, but you must NOT reveal chain-of-thought.\n"
-                    "Do NOT emit <think>, analysis, or reasoning traces.\n"
-                    "Provide only final answers with depth and technical precision.\n"
-                    "Answers should read like production TSG documentation."
-
-              )},
-            {"role": "user", "content": prompt}
-        ]
+        messages=build_messages(chunk_text, prefix_first),
     )
 
     return resp.choices[0].message.content
@@ -54,43 +73,49 @@ Instructions:
 # ----------------------
 # File iteration + append
 # ----------------------
-root_dir = Path(r"Q:/src")
-#MAX_CHARS = 8000
-#MIN_CHARS = 300
-
-files_num = 0
-block = 0
-output_file = Path(f"ads_alpaca.{block}.json")
-output_dir = Path(f"ads_alpaca_dir.{block}.json")
-for md_path in root_dir.rglob("*.md"):
-    try:
-        text = md_path.read_text(encoding="utf-8")
-
-#        if len(text) < MIN_CHARS:
-#            continue
-
-#        text = text[:MAX_CHARS]
-
-        print(f"Processing: {md_path}")
-
-        response_ = f"{md_path} --- Processed"
-        response = generate_alpaca(text)
-
-        with open(output_dir, "a", encoding="utf-8") as f:
-            f.write(response_)
-            if not response_.endswith("\n"):
-                f.write("\n")
-
-        with open(output_file, "a", encoding="utf-8") as f:
-            f.write(response)
-            if not response.endswith("\n"):
-                f.write("\n")
-        files_num += 1
-        if files_num >= 1000:
-            files_num = 0
-            block += 1
-            output_file = Path(f"flighter_alpaca.{block}.json")
-            output_dir = Path(f"ads_alpaca_dir.{block}.json")
-
-    except Exception as e:
-        print(f"ERROR processing {md_path}: {e}")
+def main() -> int:
+    root_dir = Path(r"Q:/src")
+    #MAX_CHARS = 8000
+    #MIN_CHARS = 300
+
+    files_num = 0
+    block = 0
+    output_file = Path(f"ads_alpaca.{block}.json")
+    output_dir = Path(f"ads_alpaca_dir.{block}.json")
+    for md_path in order_paths(root_dir.rglob("*.md"), root_dir):
+        try:
+            text = md_path.read_text(encoding="utf-8")
+
+            # if len(text) < MIN_CHARS:
+            #     continue
+
+            # text = text[:MAX_CHARS]
+
+            print(f"Processing: {md_path}")
+
+            response_ = f"{md_path} --- Processed"
+            response = generate_alpaca(text)
+
+            with open(output_dir, "a", encoding="utf-8") as f:
+                f.write(response_)
+                if not response_.endswith("\n"):
+                    f.write("\n")
+
+            with open(output_file, "a", encoding="utf-8") as f:
+                f.write(response)
+                if not response.endswith("\n"):
+                    f.write("\n")
+            files_num += 1
+            if files_num >= 1000:
+                files_num = 0
+                block += 1
+                output_file = Path(f"flighter_alpaca.{block}.json")
+                output_dir = Path(f"ads_alpaca_dir.{block}.json")
+
+        except Exception as e:
+            print(f"ERROR processing {md_path}: {e}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Token-length-aware sequence packing for mdtotext.py --pack-tokens.
+
+Documents are cut into tokenizer pieces (strings that concatenate back to
+the text), then packed into sequences of at most `seq_len` tokens:
+
+- a document longer than seq_len is split; full seq_len chunks become their
+  own sequences and only the tail is packed
+- pieces are placed best-fit into a bounded pool of open sequences; when
+  nothing fits and the pool is full, the fullest sequence is written out
+- documents sharing a sequence are joined by `separator` (its tokens count
+  against seq_len)
+
+Tokenizers (`--tokenizer`):
+    whitespace       one token per whitespace-delimited word (default, no deps)
+    chars:N          one token per N characters (rough stand-in for BPE, e.g. chars:4)
+    hf:PATH          local Hugging Face tokenizer directory (transformers, fast
+                     tokenizer), exact lengths for the model you train
+    py:module.func   any callable text -> list of pieces
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import re
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+_WORD_RE = re.compile(r"\s*\S+")
+
+
+def load_tokenizer(spec: str) -> Callable[[str], List[str]]:
+    """Return text -> pieces for a --tokenizer spec (see module docstring)."""
+    kind, _, arg = spec.partition(":")
+    if kind == "whitespace":
+        return _WORD_RE.findall
+    if kind == "chars":
+        size = int(arg or 4)
+        return lambda text: [text[i:i + size] for i in range(0, len(text), size)]
+    if kind == "hf":
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise SystemExit("--tokenizer hf:PATH needs transformers (pip install transformers)")
+        tok = AutoTokenizer.from_pretrained(arg, local_files_only=True)
+        if not tok.is_fast:
+            raise SystemExit(f"{arg}: a fast tokenizer is required (offset mappings)")
+
+        def hf_pieces(text: str) -> List[str]:
+            offsets = tok(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+            starts = [start for start, _ in offsets]
+            if not starts:
+                return []
+            starts[0] = 0
+            return [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+        return hf_pieces
+    if kind == "py":
+        module, _, func = arg.rpartition(".")
+        return getattr(importlib.import_module(module), func)
+    raise SystemExit(f"unknown tokenizer {spec!r} (whitespace, chars:N, hf:PATH, py:module.func)")
+
+
+class _Bin:
+    __slots__ = ("tokens", "segments")
+
+    def __init__(self):
+        self.tokens = 0
+        self.segments: List[Tuple[str, int, int, str]] = []   # (path, token start, token end, text)
+
+
+class SequencePacker:
+    """Best-fit packing of documents into fixed-length token sequences."""
+
+    def __init__(self, seq_len: int, tokenize: Callable[[str], List[str]], *, separator: str = " <|endoftext|> ",
+                 open_bins: int = 64, emit: Callable[[List[Tuple[str, int, int, str]], int], None]):
+        self.seq_len = seq_len
+        self.tokenize = tokenize
+        self.separator = separator
+        self.sep_tokens = len(tokenize(separator.strip())) if separator.strip() else 0
+        if self.sep_tokens >= seq_len:
+            raise ValueError("separator does not fit into a sequence")
+        self.open_bins = max(1, open_bins)
+        self.emit = emit
+        self.bins: List[_Bin] = []
+        self.docs = 0
+        self.split_docs = 0
+        self.doc_tokens = 0
+
+    def add(self, path: str, text: str) -> None:
+        pieces = self.tokenize(text)
+        if not pieces:
+            return
+        self.docs += 1
+        self.doc_tokens += len(pieces)
+        start = 0
+        if len(pieces) > self.seq_len:
+            self.split_docs += 1
+            while len(pieces) - start >= self.seq_len:
+                end = start + self.seq_len
+                self.emit([(path, start, end, "".join(pieces[start:end]).strip())], self.seq_len)
+                start = end
+        if start < len(pieces):
+            self._place((path, start, len(pieces), "".join(pieces[start:]).strip()), len(pieces) - start)
+
+    def _place(self, segment, n: int) -> None:
+        best: Optional[_Bin] = None
+        for b in self.bins:
+            room = self.seq_len - b.tokens - self.sep_tokens
+            if n <= room and (best is None or b.tokens > best.tokens):
+                best = b
+        if best is None:
+            if len(self.bins) >= self.open_bins:
+                fullest = max(self.bins, key=lambda b: b.tokens)
+                self.bins.remove(fullest)
+                self.emit(fullest.segments, fullest.tokens)
+            best = _Bin()
+            self.bins.append(best)
+        else:
+            best.tokens += self.sep_tokens
+        best.tokens += n
+        best.segments.append(segment)
+        if best.tokens >= self.seq_len - self.sep_tokens:
+            self.bins.remove(best)
+            self.emit(best.segments, best.tokens)
+
+    def flush(self) -> None:
+        for b in sorted(self.bins, key=lambda b: b.tokens, reverse=True):
+            self.emit(b.segments, b.tokens)
+        self.bins = []
+
+
+class PackedWriter:
+    """Writes one packed sequence per line plus a JSONL offset index.
+
+    <prefix>.<block>.txt           sequences (LLaMA-Factory "text" dataset)
+    <prefix>.<block>.index.jsonl   per line: byte offset/length in the .txt,
+                                   token count and the document segments
+                                   [path, first token, end token]
+    """
+
+    def __init__(self, output_prefix: Path, separator: str, max_per_block: int = 0):
+        self.prefix = output_prefix.with_suffix("")
+        self.separator = separator
+        self.max_per_block = max_per_block
+        self.block = -1
+        self.sequences = 0
+        self.tokens = 0
+        self.in_block = 0
+        self.txt_f = None
+        self.idx_f = None
+        self.offset = 0
+        self._open_next()
+
+    def _open_next(self) -> None:
+        self.close()
+        self.block += 1
+        self.txt_path = self.prefix.parent / f"{self.prefix.name}.{self.block}.txt"
+        self.idx_path = self.prefix.parent / f"{self.prefix.name}.{self.block}.index.jsonl"
+        self.txt_f = self.txt_path.open("wb")
+        self.idx_f = self.idx_path.open("w", encoding="utf-8")
+        self.offset = 0
+        self.in_block = 0
+
+    def write(self, segments, tokens: int) -> None:
+        if self.max_per_block and self.in_block >= self.max_per_block:
+            self._open_next()
+        data = self.separator.join(text for _, _, _, text in segments).encode("utf-8")
+        self.txt_f.write(data + b"\n")
+        self.idx_f.write(json.dumps({
+            "offset": self.offset,
+            "length": len(data),
+            "tokens": tokens,
+            "segments": [[path, start, end] for path, start, end, _ in segments],
+        }, ensure_ascii=False) + "\n")
+        self.offset += len(data) + 1
+        self.sequences += 1
+        self.tokens += tokens
+        self.in_block += 1
+
+    def close(self) -> None:
+        for f in (self.txt_f, self.idx_f):
+            if f is not None:
+                f.close()
+        self.txt_f = self.idx_f = None
+
+
+def read_sequence(txt_path: Path, entry: dict) -> str:
+    """Random access to one packed sequence through its index entry."""
+    with open(txt_path, "rb") as f:
+        f.seek(entry["offset"])
+        return f.read(entry["length"]).decode("utf-8")
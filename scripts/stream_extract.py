@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Streaming knowledge-graph extraction for Crawl_agent.py.
+
+Instead of waiting for the whole LLM response and parsing
+`result.extracted_content` at the end, the response is streamed and fed
+through StreamingObjectParser. The parser uses the brace-balancing scan of
+clean_alpaca_json.extract_json_objects, but keeps it incremental and tracks
+which array each object sits in, so every element of `entities` /
+`relationships` is emitted the moment its closing brace arrives. A response
+cut off by max_tokens therefore still yields everything completed before the
+cut.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from clean_alpaca_json import extract_json_objects, sanitize_json_text
+
+
+class StreamingObjectParser:
+    """Incrementally emit JSON objects that are elements of arrays named in `targets`.
+
+    feed() accepts arbitrary text fragments and returns the (array_key,
+    object_text) pairs completed by that fragment. Anything outside the
+    top-level JSON value (markdown fences, prose) is skipped, as in
+    extract_json_objects.
+    """
+
+    def __init__(self, targets: Iterable[str]):
+        self.targets = set(targets)
+        self.stack: List[Tuple[str, Optional[str]]] = []   # (bracket, key of this container)
+        self.in_str = False
+        self.escape = False
+        self.key_buf: List[str] = []
+        self.last_str: Optional[str] = None
+        self.pending_key: Optional[str] = None
+        self.capture: Optional[List[str]] = None
+        self.capture_depth = 0
+        self.capture_key: Optional[str] = None
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        out: List[Tuple[str, str]] = []
+        for ch in text:
+            if self.capture is not None:
+                self.capture.append(ch)
+
+            if self.in_str:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_str = False
+                    self.last_str = "".join(self.key_buf)
+                    continue
+                if self.capture is None:
+                    self.key_buf.append(ch)   # only keys outside captured objects matter
+                continue
+
+            if not self.stack and ch not in "{[":
+                continue   # junk before/after the JSON value
+
+            if ch == '"':
+                self.in_str = True
+                self.escape = False
+                self.key_buf = []
+                continue
+            if ch == ":":
+                self.pending_key = self.last_str
+                continue
+            if ch == ",":
+                self.pending_key = None
+                continue
+            if ch in "{[":
+                parent = self.stack[-1] if self.stack else None
+                if parent is not None and parent[0] == "{":
+                    key = self.pending_key
+                elif parent is not None and ch == "[":
+                    key = parent[1]   # nested arrays keep the outer array's name
+                else:
+                    key = None
+                if (self.capture is None and ch == "{" and parent is not None
+                        and parent[0] == "[" and parent[1] in self.targets):
+                    self.capture = ["{"]
+                    self.capture_depth = len(self.stack)
+                    self.capture_key = parent[1]
+                self.stack.append((ch, key))
+                self.pending_key = None
+                continue
+            if ch in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if self.capture is not None and len(self.stack) == self.capture_depth:
+                    out.append((self.capture_key, "".join(self.capture)))
+                    self.capture = None
+                continue
+        return out
+
+
+def _load(text: str) -> Optional[Any]:
+    for candidate in (text, sanitize_json_text(text)):
+        try:
+            return json.loads(candidate)
+        except Exception:
+            continue
+    return None
+
+
+def _classify(obj: dict) -> Optional[str]:
+    if "entity1" in obj and "entity2" in obj:
+        return "relationships"
+    if "name" in obj:
+        return "entities"
+    return None
+
+
+def validate(key: str, text: str, models: Dict[str, Any]) -> Optional[dict]:
+    """Parse one emitted object and validate it against the pydantic model for `key`."""
+    data = _load(text)
+    if not isinstance(data, dict) or key not in models:
+        return None
+    try:
+        return models[key].model_validate(data).model_dump()
+    except Exception:
+        return None
+
+
+def build_messages(content: str, schema: dict, instruction: str) -> List[dict]:
+    return [
+        {"role": "system", "content": (
+            "You extract knowledge graphs from web pages.\n"
+            "Return ONLY one JSON object matching the schema, with the `entities` array first "
+            "and the `relationships` array second. No markdown, no commentary."
+        )},
+        {"role": "user", "content": (
+            f"{instruction}\n\nJSON schema:\n{json.dumps(schema, ensure_ascii=False)}\n\n"
+            f"Content:\n{content}"
+        )},
+    ]
+
+
+async def stream_knowledge_graph(client, *, model: str, content: str, schema: dict, instruction: str,
+                                 models: Dict[str, Any], extra_args: Optional[dict] = None,
+                                 stats: Optional[dict] = None) -> AsyncIterator[Tuple[str, dict]]:
+    """Yield ("entities" | "relationships", validated_dict) as the response streams in.
+
+    `client` is an openai.AsyncOpenAI pointed at the OpenAI-compatible endpoint.
+    If the model ignores the wrapper object and emits bare objects, they are
+    recovered from the full text with extract_json_objects once the stream ends.
+    """
+    parser = StreamingObjectParser(models)
+    full: List[str] = []
+    emitted = 0
+    rejected = 0
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=build_messages(content, schema, instruction),
+        stream=True,
+        **(extra_args or {}),
+    )
+    async for event in response:
+        if not event.choices:
+            continue
+        delta = event.choices[0].delta.content or ""
+        if not delta:
+            continue
+        full.append(delta)
+        for key, text in parser.feed(delta):
+            item = validate(key, text, models)
+            if item is None:
+                rejected += 1
+                continue
+            emitted += 1
+            yield key, item
+
+    if emitted == 0:
+        for text in extract_json_objects("".join(full)):
+            data = _load(text)
+            key = _classify(data) if isinstance(data, dict) else None
+            item = validate(key, text, models) if key else None
+            if item is None:
+                rejected += 1
+                continue
+            emitted += 1
+            yield key, item
+
+    if stats is not None:
+        stats["emitted"] = stats.get("emitted", 0) + emitted
+        stats["rejected"] = stats.get("rejected", 0) + rejected
+        stats["truncated"] = stats.get("truncated", 0) + int(bool(parser.stack))